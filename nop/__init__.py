@@ -1,19 +1,27 @@
 import pkgutil
 import inspect
+import importlib
 from nop.extractor.extractor import NopExtractor
+import nop.extractor as _extractor_pkg
 
 
 # load classes subclass of NopExtractor
+# README: only walk the `nop.extractor` package and import the modules by their
+# fully qualified name, otherwise every module under `nop` is executed(twice)
+# at import time and its heavy dependencies come along
 platforms = []
-for loader, name, is_pkg in pkgutil.walk_packages(__path__):
-    # if not name.endswith("_orderbook_extractor"):
-    #     continue
-    module = loader.find_module(name).load_module(name)  # type: ignore
+for _, name, is_pkg in pkgutil.iter_modules(
+    _extractor_pkg.__path__, _extractor_pkg.__name__ + "."
+):
+    if is_pkg or not name.endswith("_orderbook_extractor"):
+        continue
+    module = importlib.import_module(name)
     for name, value in inspect.getmembers(module):
         if (
             inspect.isclass(value)
             and issubclass(value, NopExtractor)
             and value is not NopExtractor
+            and value not in platforms
             and not getattr(value, "ignore", False)
         ):
             globals()[name] = value
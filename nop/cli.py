@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+import nop
+from nop.extractor.context import BatchContext
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# the uint256 columns of the raw and normalized inputs, kept as python ints
+INT256_COLUMNS = [
+    "value",
+    "id",
+    "token_id",
+    "price",
+    "x_token_id",
+    "s_token_id",
+    "s_token_value",
+]
+
+
+def _ext(path: str) -> str:
+    return os.path.splitext(path)[1].lower()
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """Stream the records of a JSONL, JSON(array), CSV or Parquet file."""
+    ext = _ext(path)
+    if ext in (".jsonl", ".ndjson"):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif ext == ".json":
+        with open(path) as f:
+            yield from json.load(f)
+    elif ext == ".csv":
+        import csv
+
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+
+        # memory-mapped, and converted batch by batch
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches():
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"unsupported file: {path}")
+
+
+def _as_int(value):
+    if isinstance(value, str) and value != "":
+        return int(value, 16) if value.startswith("0x") else int(value)
+    return value
+
+
+def read_frame(path: Optional[str]) -> Optional["pd.DataFrame"]:
+    import pandas as pd
+
+    if path is None:
+        return None
+    if _ext(path) == ".parquet":
+        df = pd.read_parquet(path, memory_map=True)
+    elif _ext(path) == ".csv":
+        df = pd.read_csv(path, dtype={c: str for c in INT256_COLUMNS})
+    else:
+        df = pd.DataFrame(iter_records(path))
+    for column in INT256_COLUMNS:
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].map(_as_int)
+    return df
+
+
+def normalize_log(log: Dict) -> Dict:
+    # blockchain-etl's CSV export joins the topics with comma
+    topics = log.get("topics")
+    if isinstance(topics, str):
+        log["topics"] = topics.split(",") if topics else []
+    elif topics is not None and not isinstance(topics, list):
+        log["topics"] = list(topics)
+    for column in ("log_index", "transaction_index", "block_number"):
+        if isinstance(log.get(column), str):
+            log[column] = int(log[column])
+    if isinstance(log.get("block_timestamp"), str):
+        log["block_timestamp"] = int(log["block_timestamp"])
+    return log
+
+
+def _json_default(value):
+    # numpy scalars, NaN stays as is
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def write_frame(df: "pd.DataFrame", path: str):
+    ext = _ext(path)
+    if ext == ".csv":
+        df.to_csv(path, index=False)
+    elif ext in (".jsonl", ".ndjson"):
+        with open(path, "w") as f:
+            for record in df.to_dict("records"):
+                f.write(json.dumps(record, default=_json_default) + "\n")
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+
+        from nop.storage.parquet import to_table
+
+        pq.write_table(to_table(df), path)
+    else:
+        raise ValueError(f"unsupported file: {path}")
+
+
+def log_platforms() -> Dict[str, type]:
+    # the trace platforms read their inputs from the database
+    return {p.platform(): p for p in nop.platforms if p.extract_via_log() is True}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="nop",
+        description="Extract and calculate the NFT orderbooks from local files, "
+        "JSONL/JSON/CSV/Parquet are supported",
+    )
+    parser.add_argument("--logs", help="the logs file")
+    parser.add_argument(
+        "--orderbooks",
+        help="the already extracted orderbooks file, instead of --logs, "
+        "with exactly one platform",
+    )
+    parser.add_argument("--txs", required=True, help="the transactions file")
+    parser.add_argument("--token-xfers", required=True, help="the token transfers")
+    parser.add_argument("--erc1155-xfers", help="the ERC1155 transfers file")
+    parser.add_argument(
+        "-p",
+        "--platforms",
+        default=",".join(sorted(log_platforms())),
+        help="comma separated platforms, default: %(default)s",
+    )
+    parser.add_argument("-o", "--output", help="the output file(.csv/.jsonl/.parquet)")
+    parser.add_argument(
+        "--memory-budget", type=int, help="calculate in chunks under this bytes"
+    )
+
+    args = parser.parse_args(argv)
+    platforms = log_platforms()
+    args.platforms = [p.strip() for p in args.platforms.split(",") if p.strip()]
+    unknown = set(args.platforms) - set(platforms)
+    if len(unknown) > 0:
+        parser.error(f"unknown platforms: {sorted(unknown)}")
+    if (args.logs is None) == (args.orderbooks is None):
+        parser.error("exactly one of --logs and --orderbooks is required")
+    if args.orderbooks is not None and len(args.platforms) != 1:
+        parser.error("--orderbooks requires exactly one platform")
+    return args
+
+
+def run(args: argparse.Namespace, out=sys.stdout) -> "pd.DataFrame":
+    import pandas as pd
+
+    platforms = log_platforms()
+    extractors = [platforms[p]() for p in args.platforms]
+
+    timing = dict()
+    st = perf_counter()
+    ctx = BatchContext(
+        read_frame(args.txs),
+        read_frame(args.token_xfers),
+        read_frame(args.erc1155_xfers),
+    )
+    timing["load"] = perf_counter() - st
+
+    # stream the logs once, through every selected extractor
+    st = perf_counter()
+    n_logs = 0
+    orderbooks = {e.platform(): [] for e in extractors}
+    if args.orderbooks is not None:
+        orderbooks[args.platforms[0]] = read_frame(args.orderbooks)
+    else:
+        for log in iter_records(args.logs):
+            n_logs += 1
+            log = normalize_log(log)
+            for extractor in extractors:
+                orderbook = extractor.extract_orderbook_from_log(log)
+                if isinstance(orderbook, dict):
+                    orderbooks[extractor.platform()].append(orderbook)
+                elif isinstance(orderbook, list):
+                    orderbooks[extractor.platform()].extend(orderbook)
+    timing["extract"] = perf_counter() - st
+
+    dfs = []
+    print(f"{'platform':<12}{'orders':>10}{'results':>10}{'calculate':>12}", file=out)
+    for extractor in extractors:
+        ob_df = pd.DataFrame(orderbooks[extractor.platform()])
+        st = perf_counter()
+        df = extractor.calculate_batch(ctx, ob_df, args.memory_budget)
+        elapsed = perf_counter() - st
+        timing["calculate"] = timing.get("calculate", 0) + elapsed
+        print(
+            f"{extractor.platform():<12}{len(ob_df):>10}{len(df):>10}{elapsed:>11.3f}s",
+            file=out,
+        )
+        if not df.empty:
+            dfs.append(df)
+
+    result = pd.concat(dfs, ignore_index=True) if len(dfs) > 0 else pd.DataFrame()
+    if args.output is not None:
+        st = perf_counter()
+        write_frame(result, args.output)
+        timing["write"] = perf_counter() - st
+
+    total = sum(timing.values())
+    print(
+        "load: {:.3f}s, extract: {:.3f}s({} logs, {:.0f} logs/s), "
+        "calculate: {:.3f}s, write: {:.3f}s, total: {:.3f}s".format(
+            timing["load"],
+            timing["extract"],
+            n_logs,
+            n_logs / timing["extract"] if timing["extract"] > 0 else 0,
+            timing.get("calculate", 0),
+            timing.get("write", 0),
+            total,
+        ),
+        file=out,
+    )
+    return result
+
+
+def main(argv: Optional[List[str]] = None):
+    run(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,21 @@ ORDERBOOK_COLUMNS = [
     "fee_value",
 ]
 
+ORDERBOOK_INT_COLUMNS = [
+    "_st",
+    "blknum",
+    "txpos",
+    "xfer_logpos",
+    "order_logpos",
+    "pack_index",
+    "pack_count",
+]
+
+ORDERBOOK_UINT256_COLUMNS = ["token_id", "token_value", "price", "value", "fee_value"]
+
+# one orderbook row per (order log, transfer log, packed item) in a transaction
+ORDERBOOK_UNIQUE_COLUMNS = ["txhash", "order_logpos", "xfer_logpos", "pack_index"]
+
 TF_COLUMNS = [
     "_st",
     "blknum",
@@ -59,3 +74,19 @@ EF_COLUMNS = [
 ]
 
 TX_COLUMNS = ["_st", "blknum", "ether", "tx_to", "txhash", "txpos"]
+
+# TF_COLUMNS and EF_COLUMNS stacked into one table, the ERC1155 rows are
+# renamed into the x_* names and told apart by `standard`
+XFER_COLUMNS = [
+    "_st",
+    "blknum",
+    "txhash",
+    "txpos",
+    "standard",
+    "x_from_address",
+    "x_to_address",
+    "x_token_address",
+    "x_token_id",
+    "x_token_value",
+    "xfer_logpos",
+]
@@ -1,5 +1,7 @@
-from typing import List, Dict, Tuple
-from eth_abi.abi import decode_abi, decode_single
+from typing import Callable, List, Dict, NamedTuple, Sequence, Tuple, Union
+from eth_abi.abi import decode_abi
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_abi.registry import registry
 from eth_utils.abi import collapse_if_tuple
 
 
@@ -38,30 +40,83 @@ def collapse_if_tuple_with_name(abi: Dict) -> str:
     return collapsed
 
 
-def zip_if_tuple(abi: Dict, value) -> Dict:
+# README: the decoded values are flattened by a function generated from the ABI
+# once, instead of walking the value tree and inspecting every node per call
+def _abi_key(abi: Dict) -> Tuple:
+    return (
+        abi.get("name"),
+        abi["type"],
+        tuple(_abi_key(c) for c in abi.get("components", [])),
+    )
+
+
+def _unpack_expr(abi: Dict, var: str, depth: int) -> str:
     typ = abi["type"]
-    name = abi["name"]
+    if typ.endswith("]"):
+        # array of the type without the last dimension
+        item = dict(abi, type=typ[: typ.rindex("[")])
+        item_var = f"_x{depth}"
+        item_expr = _unpack_expr(item, item_var, depth + 1)
+        if item_expr == item_var:
+            return var
+        return f"[{item_expr} for {item_var} in {var}]"
     if typ.startswith("byte"):
-        return {name: value.hex()}
-    if not typ.startswith("tuple"):
-        return {name: value}
-
-    is_array = len(typ) > len("tuple")
-
-    subabi = abi["components"]
-    if not is_array:
-        subvalue = {}
-        for idx, sa in enumerate(subabi):
-            subvalue.update(zip_if_tuple(sa, value[idx]))
-        return {name: subvalue}
+        return f"{var}.hex()"
+    if typ.startswith("tuple"):
+        return _unpack_dict_expr(abi["components"], var, depth)
+    return var
+
+
+def _unpack_dict_expr(inputs: List[Dict], var: str, depth: int) -> str:
+    return "{{{}}}".format(
+        ", ".join(
+            "{!r}: {}".format(
+                i.get("name") or f"_{idx}", _unpack_expr(i, f"{var}[{idx}]", depth)
+            )
+            for idx, i in enumerate(inputs)
+        )
+    )
+
+
+def _compile_unpacker(inputs: List[Dict], columns: bool) -> Callable:
+    if columns:
+        body = "{{{}}}".format(
+            ", ".join(
+                "{!r}: [{} for _v in values]".format(
+                    i.get("name") or f"_{idx}", _unpack_expr(i, f"_v[{idx}]", 0)
+                )
+                for idx, i in enumerate(inputs)
+            )
+        )
     else:
-        subvalues = []
-        for sv in value:
-            subvalue = {}
-            for idx, sa in enumerate(subabi):
-                subvalue.update(zip_if_tuple(sa, sv[idx]))
-            subvalues.append(subvalue)
-        return {name: subvalues}
+        body = _unpack_dict_expr(inputs, "values", 0)
+    return eval(compile(f"lambda values: {body}", "<unpacker>", "eval"))
+
+
+_UNPACKERS: Dict[Tuple, Callable] = {}
+
+
+def compile_unpacker(inputs: List[Dict], columns: bool = False) -> Callable:
+    """Compile the ABI inputs into a function flattening the decoded values.
+
+    The function takes the decoded tuple and returns a dict keyed by the input
+    names, nested tuples become dicts and bytes become hex strings, e.g.
+
+    >>> compile_unpacker(abi["inputs"])(decode_single(func_sign, data))
+    {'swapList': [{'pair': '0x...', 'nftIds': (1377,)}], 'deadline': 1659488792}
+
+    With `columns=True`, it takes a list of decoded tuples and returns a dict
+    of columns instead. The compiled functions are cached per ABI.
+    """
+    key = (tuple(_abi_key(i) for i in inputs), columns)
+    unpacker = _UNPACKERS.get(key)
+    if unpacker is None:
+        unpacker = _UNPACKERS[key] = _compile_unpacker(inputs, columns)
+    return unpacker
+
+
+def zip_if_tuple(abi: Dict, value) -> Dict:
+    return compile_unpacker([abi])((value,))
 
 
 def eth_decode_log(event_abi: Dict, topics: List[str], data):
@@ -84,17 +139,70 @@ def eth_decode_log(event_abi: Dict, topics: List[str], data):
     return indexed_values, data_values
 
 
+class _InputDecoder(NamedTuple):
+    func_text: str
+    decoder: Callable
+    unpack: Callable
+    unpack_columns: Callable
+
+
+# README: keyed by the 4-bytes selector of the call data and the ABI, the signature
+# and the decoder are built once, instead of re-parsing the type string on every call.
+# The ABI objects seen are also kept by id, so the same ABI dict is a single lookup
+# without walking its tree for the key(the object is held, its id is never reused)
+_INPUT_DECODERS: Dict[Tuple, _InputDecoder] = {}
+_INPUT_DECODERS_BY_ID: Dict[Tuple[str, int], Tuple[Dict, _InputDecoder]] = {}
+_MAX_ABIS_BY_ID = 1024
+
+
+def _input_decoder(func_abi: Dict, selector: str) -> _InputDecoder:
+    seen = _INPUT_DECODERS_BY_ID.get((selector, id(func_abi)))
+    if seen is not None and seen[0] is func_abi:
+        return seen[1]
+
+    inputs = func_abi.get("inputs", [])
+    key = (selector, func_abi["name"], tuple(_abi_key(i) for i in inputs))
+    cached = _INPUT_DECODERS.get(key)
+    if cached is None:
+        func_sign = "({})".format(",".join(collapse_if_tuple(i) for i in inputs))
+        cached = _INPUT_DECODERS[key] = _InputDecoder(
+            func_text="{}{}".format(func_abi["name"], func_sign),
+            decoder=registry.get_decoder(func_sign),
+            unpack=compile_unpacker(inputs),
+            unpack_columns=compile_unpacker(inputs, columns=True),
+        )
+
+    # a new ABI dict per call(e.g. parsed from json) mustn't grow it forever
+    if len(_INPUT_DECODERS_BY_ID) >= _MAX_ABIS_BY_ID:
+        _INPUT_DECODERS_BY_ID.clear()
+    _INPUT_DECODERS_BY_ID[(selector, id(func_abi))] = (func_abi, cached)
+    return cached
+
+
 def eth_decode_input(func_abi: Dict, data) -> Tuple:
     if "name" not in func_abi:
         return None, None
 
-    inputs = func_abi.get("inputs", [])
-    func_sign = "({})".format(",".join(collapse_if_tuple(i) for i in inputs))
-    func_text = "{}{}".format(func_abi["name"], func_sign)
+    decoder = _input_decoder(func_abi, data[:10])
+    decoded = decoder.decoder(ContextFramesBytesIO(bytes.fromhex(data[10:])))
+    return decoder.func_text, decoder.unpack(decoded)
 
-    decoded = decode_single(func_sign, bytes(bytearray.fromhex(data[10:])))
-    parameter = {}
-    for idx, value in enumerate(decoded):
-        parameter.update(zip_if_tuple(inputs[idx], value))
 
-    return func_text, parameter
+def decode_inputs(
+    func_abi: Dict, inputs: Sequence[str], columns: bool = False
+) -> Union[List[Dict], Dict[str, List]]:
+    """Decode the call data of the same function in one pass.
+
+    Returns the named parameters of each input, as `eth_decode_input` does,
+    or a dict of columns with `columns=True`.
+    """
+    if len(inputs) == 0:
+        inputs_abi = func_abi.get("inputs", [])
+        return compile_unpacker(inputs_abi, columns=True)([]) if columns else []
+
+    decoder = _input_decoder(func_abi, inputs[0][:10])
+    decode = decoder.decoder
+    decoded = [decode(ContextFramesBytesIO(bytes.fromhex(x[10:]))) for x in inputs]
+    if columns:
+        return decoder.unpack_columns(decoded)
+    return [decoder.unpack(x) for x in decoded]
@@ -1,4 +1,5 @@
 from .extractor import NopExtractor  # noqa: F401
+from .context import BatchContext  # noqa: F401
 from .looksrare_orderbook_extractor import LooksrareOrderbookExtractor  # noqa: F401
 from .opensea_orderbook_extractor import OpenseaOrderbookExtractor  # noqa: F401
 from .x2y2_orderbook_extractor import X2Y2OrderbookExtractor  # noqa: F401
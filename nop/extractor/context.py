@@ -0,0 +1,285 @@
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from nop.columns import TX_COLUMNS, TF_COLUMNS, EF_COLUMNS, XFER_COLUMNS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+TX_RENAMES = {
+    "value": "ether",
+    "to_address": "tx_to",
+}
+
+TF_RENAMES = {
+    "logpos": "xfer_logpos",
+    "token_address": "x_token_address",
+    "from_address": "x_from_address",
+    "to_address": "x_to_address",
+    "value": "x_token_id",
+}
+
+EF_RENAMES = {
+    "logpos": "sfer_logpos",
+    "token_address": "s_token_address",
+    "from_address": "s_from_address",
+    "to_address": "s_to_address",
+    "id": "s_token_id",
+    "value": "s_token_value",
+}
+
+EF_DROPS = ["operator", "xfer_type", "id_pos", "id_cnt"]
+
+SFER_RENAMES = {
+    "sfer_logpos": "xfer_logpos",
+    "s_token_address": "x_token_address",
+    "s_from_address": "x_from_address",
+    "s_to_address": "x_to_address",
+    "s_token_id": "x_token_id",
+    "s_token_value": "x_token_value",
+}
+
+# README: the ERC20 and ERC721 `Transfer` events share the same table, both are
+# tagged as erc721, the same as the token_type of the orderbooks matched on them
+STANDARD_ERC721 = "erc721"
+STANDARD_ERC1155 = "erc1155"
+
+INT_COLUMNS = ["blknum", "txpos", "xfer_logpos", "sfer_logpos"]
+
+
+def _normalize(
+    df: "pd.DataFrame",
+    renames: Dict[str, str],
+    columns: List[str],
+    drops: Optional[List[str]] = None,
+    defaults: Optional[Dict] = None,
+) -> "pd.DataFrame":
+    import pandas as pd
+
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columns)
+
+    # README: never touch the caller's frame, rename/drop/assign all return new ones
+    df = df.rename(columns=renames)
+    if drops:
+        df = df.drop(columns=drops, errors="ignore")
+    if defaults:
+        df = df.assign(**{k: v for k, v in defaults.items() if k not in df.columns})
+
+    return df.astype({c: "int64" for c in INT_COLUMNS if c in df.columns})
+
+
+def _index_by_txhash(df: "pd.DataFrame", sort_by: List[str]) -> "pd.DataFrame":
+    import pandas as pd
+
+    df = df.sort_values(by=sort_by, kind="stable")
+    # index by txhash, but keep it unnamed: merges on the `txhash` column
+    # would be ambiguous if the index level shared the same name
+    df.index = pd.Index(df["txhash"].values)
+    return df
+
+
+def normalize_transactions(tx_df: "pd.DataFrame") -> "pd.DataFrame":
+    if tx_df is not None and not tx_df.empty:
+        tx_df = tx_df.rename(columns=TX_RENAMES)[TX_COLUMNS]
+    return _normalize(tx_df, {}, TX_COLUMNS)
+
+
+def normalize_token_xfers(tf_df: "pd.DataFrame") -> "pd.DataFrame":
+    return _normalize(tf_df, TF_RENAMES, TF_COLUMNS, defaults={"x_token_value": 1})
+
+
+def normalize_erc1155_xfers(ef_df: "pd.DataFrame") -> "pd.DataFrame":
+    return _normalize(ef_df, EF_RENAMES, EF_COLUMNS, drops=EF_DROPS)
+
+
+def stack_transfers(tf_df: "pd.DataFrame", ef_df: "pd.DataFrame") -> "pd.DataFrame":
+    """Stack the TF_COLUMNS and EF_COLUMNS tables into one XFER_COLUMNS table."""
+    import pandas as pd
+
+    tf_df = tf_df.assign(standard=STANDARD_ERC721)
+    ef_df = ef_df.rename(columns=SFER_RENAMES).assign(standard=STANDARD_ERC1155)
+    dfs = [df[XFER_COLUMNS] for df in (tf_df, ef_df) if not df.empty]
+    if len(dfs) == 0:
+        return pd.DataFrame(columns=XFER_COLUMNS)
+
+    xf_df = pd.concat(dfs, ignore_index=True)
+    return _index_by_txhash(xf_df, ["blknum", "txpos", "xfer_logpos"])
+
+
+class BatchContext(object):
+    """Transactions and transfers of one block batch, normalized once.
+
+    `tx_df` is in the `TX_COLUMNS` schema, the token and ERC1155 transfers are
+    stacked into `xf_df` in the `XFER_COLUMNS` schema. Both are sorted by
+    (blknum, txpos, logpos) and indexed by txhash. They are shared by every
+    platform's `calculate`, and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        tx_df: "pd.DataFrame",  # transaction
+        tf_df: "pd.DataFrame",  # token transfer
+        ef_df: "pd.DataFrame",  # erc1155 transfer
+    ):
+        self.tx_df = _index_by_txhash(
+            normalize_transactions(tx_df), ["blknum", "txpos"]
+        )
+        self.xf_df = stack_transfers(
+            normalize_token_xfers(tf_df), normalize_erc1155_xfers(ef_df)
+        )
+
+    @property
+    def empty(self) -> bool:
+        return self.tx_df.empty or self.xf_df.empty
+
+    def select(self, txhashes: Iterable[str]) -> "BatchContext":
+        """A context of the given transactions only, without re-normalizing."""
+        txhashes = set(txhashes)
+        ctx = object.__new__(BatchContext)
+        ctx.tx_df = self.tx_df[self.tx_df.index.isin(txhashes)]
+        ctx.xf_df = self.xf_df[self.xf_df.index.isin(txhashes)]
+        return ctx
+
+
+def _row_bytes(df: "pd.DataFrame") -> float:
+    if len(df) == 0:
+        return 0.0
+    return df.memory_usage(index=True, deep=True).sum() / len(df)
+
+
+def tx_costs(ctx: BatchContext, ob_df: "pd.DataFrame") -> "pd.Series":
+    """The estimated bytes to calculate each transaction's orderbooks.
+
+    The cost of a transaction is estimated as its order and transfer rows, plus
+    the order x transfer rows the calculators' merges could produce.
+    """
+    ob_rows = ob_df.groupby("txhash", sort=False).size()
+    xf_rows = ctx.xf_df.groupby(level=0, sort=False).size()
+    xf_rows = xf_rows.reindex(ob_rows.index, fill_value=0)
+
+    ob_bytes, xf_bytes = _row_bytes(ob_df), _row_bytes(ctx.xf_df)
+    return (
+        ob_rows * ob_bytes
+        + xf_rows * xf_bytes
+        + ob_rows * xf_rows * (ob_bytes + xf_bytes)
+    )
+
+
+def split_by_tx(
+    ctx: BatchContext, ob_df: "pd.DataFrame", memory_budget: int
+) -> List[List[str]]:
+    """Split the transactions of the orderbooks into chunks under a memory budget.
+
+    The cost of a transaction is estimated by `tx_costs`. The transactions are
+    taken in (blknum, txpos) order and never split, so a transaction over the
+    budget makes a chunk alone.
+    """
+    if ob_df.empty:
+        return []
+
+    cost = tx_costs(ctx, ob_df)
+    order = (
+        ob_df[["blknum", "txpos", "txhash"]]
+        .drop_duplicates(subset=["txhash"])
+        .sort_values(by=["blknum", "txpos"], kind="stable")["txhash"]
+    )
+    cost = cost.reindex(order.values).values
+
+    chunks, chunk, used = [], [], 0.0
+    for txhash, tx_cost in zip(order.values, cost):
+        if len(chunk) > 0 and used + tx_cost > memory_budget:
+            chunks.append(chunk)
+            chunk, used = [], 0.0
+        chunk.append(txhash)
+        used += tx_cost
+    if len(chunk) > 0:
+        chunks.append(chunk)
+    return chunks
+
+
+ORDER_WINDOW_COLUMNS = [
+    "prev_order_logpos",
+    "next_order_logpos",
+    "tx_order_rank",
+    "tx_order_count",
+]
+
+
+def with_order_window(ob_df: "pd.DataFrame") -> "pd.DataFrame":
+    """Attach the bounds of each order log inside its transaction.
+
+    prev/next_order_logpos are the neighbour order logs(-1 and 2**32 at the
+    edges), tx_order_rank is the 0-based position of the order log and
+    tx_order_count the number of order logs in the transaction. The window is
+    computed over distinct (txhash, order_logpos), so the rows of a packed
+    order share the same bounds.
+    """
+    key = ["txhash", "order_logpos"]
+    od_df = (
+        ob_df[["blknum", "txpos"] + key]
+        .drop_duplicates(subset=key)
+        .sort_values(by=["blknum", "txpos", "order_logpos"], kind="stable")
+    )
+    grouped = od_df.groupby("txhash", sort=False)["order_logpos"]
+    od_df = od_df[key].assign(
+        prev_order_logpos=grouped.shift(1, fill_value=-1),
+        next_order_logpos=grouped.shift(-1, fill_value=2**32),
+        tx_order_rank=grouped.cumcount(),
+        tx_order_count=grouped.transform("size"),
+    )
+
+    ob_df = ob_df.drop(columns=ORDER_WINDOW_COLUMNS, errors="ignore")
+    return ob_df.merge(od_df, how="left", on=key)
+
+
+# README: the record counterparts of the frames above, for the per-block live
+# path where a handful of rows don't pay off the DataFrame overhead
+
+
+def _rename_record(record: Dict, renames: Dict[str, str]) -> Dict:
+    return {renames.get(k, k): v for k, v in record.items()}
+
+
+def group_transfer_records(
+    tf_records: Optional[Iterable[Dict]], ef_records: Optional[Iterable[Dict]]
+) -> Dict[str, List[Dict]]:
+    """Stack the token and ERC1155 transfer records, in the XFER_COLUMNS schema.
+
+    Returns the transfers grouped by txhash, each sorted by xfer_logpos.
+    """
+    xfers: Dict[str, List[Dict]] = {}
+    for record in tf_records or []:
+        xf = _rename_record(record, TF_RENAMES)
+        xf.setdefault("x_token_value", 1)
+        xf["standard"] = STANDARD_ERC721
+        xfers.setdefault(xf["txhash"], []).append(xf)
+    for record in ef_records or []:
+        xf = _rename_record(_rename_record(record, EF_RENAMES), SFER_RENAMES)
+        xf["standard"] = STANDARD_ERC1155
+        xfers.setdefault(xf["txhash"], []).append(xf)
+
+    for txhash, rows in xfers.items():
+        rows.sort(key=lambda xf: xf["xfer_logpos"])
+    return xfers
+
+
+def with_order_window_records(orders: List[Dict]) -> List[Dict]:
+    """`with_order_window` on order records, returns new records."""
+    logposes: Dict[str, List[int]] = {}
+    for od in orders:
+        logposes.setdefault(od["txhash"], []).append(od["order_logpos"])
+
+    windows = {}
+    for txhash, tx_logposes in logposes.items():
+        tx_logposes = sorted(set(tx_logposes))
+        for rank, logpos in enumerate(tx_logposes):
+            windows[(txhash, logpos)] = dict(
+                prev_order_logpos=tx_logposes[rank - 1] if rank > 0 else -1,
+                next_order_logpos=tx_logposes[rank + 1]
+                if rank + 1 < len(tx_logposes)
+                else 2**32,
+                tx_order_rank=rank,
+                tx_order_count=len(tx_logposes),
+            )
+    return [dict(od, **windows[(od["txhash"], od["order_logpos"])]) for od in orders]
@@ -1,18 +1,59 @@
-import pandas as pd
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from time import time
-from sqlalchemy.engine import Engine
-
-
-from typing import Dict, Set, List, Union, Optional
-from nop.columns import ORDERBOOK_COLUMNS, TF_COLUMNS, EF_COLUMNS, TX_COLUMNS
-from nop.utils import split_to_words, to_normalized_address, as_st_day
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Set, List, Union, Optional
+from typing import Tuple, TypeVar
+from nop.columns import ORDERBOOK_COLUMNS, TX_COLUMNS, XFER_COLUMNS
+from nop.extractor.context import (
+    BatchContext,
+    split_by_tx,
+    with_order_window,
+    with_order_window_records,
+)
+from nop.utils import split_to_words, to_normalized_address, as_st_day, hex_to_decs
+from nop.utils import project_columns
 from nop.misc.check_trace_ready_template import CHECK_TRACE_READY_TEMPLATE
 
+# README: pandas and SQLAlchemy are only needed by `calculate` and the trace path,
+# keep them out of the module load so that the log-only path stays lightweight
+if TYPE_CHECKING:
+    import pandas as pd
+    from sqlalchemy.engine import Engine
+
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+def split_trace_ranges(
+    block_range: List[Dict], split_blocks: Optional[int] = None
+) -> List[Tuple[int, int, str, str]]:
+    """Split the blocks into (st_blknum, et_blknum, st_day, et_day) sub-ranges.
+
+    The traces table is partitioned by `_st_day`, so there's one sub-range per
+    day, further split every `split_blocks` blocks if given. The sub-ranges are
+    sorted by block number.
+    """
+    days: Dict[str, List[int]] = {}
+    for b in block_range:
+        days.setdefault(as_st_day(b["timestamp"]), []).append(b["number"])
+
+    ranges = []
+    for day, numbers in days.items():
+        st_blknum, et_blknum = min(numbers), max(numbers)
+        step = split_blocks or et_blknum - st_blknum + 1
+        for st in range(st_blknum, et_blknum + 1, step):
+            ranges.append((st, min(st + step - 1, et_blknum), day, day))
+    return sorted(ranges)
+
 
 class NopExtractor(object):
+    # README: the trace queries are fanned out per day(and per
+    # `trace_split_blocks` blocks), `trace_concurrency` at a time, keep it
+    # under the engine's pool_size + max_overflow
+    trace_concurrency = 4
+    trace_split_blocks: Optional[int] = None
+
     @staticmethod
     def chain() -> str:
         return "ethereum"
@@ -29,7 +70,7 @@ class NopExtractor(object):
         self,
         logs: List[Dict],
         only_known_platform: bool = True,
-        db_engine: Optional[Engine] = None,
+        db_engine: Optional["Engine"] = None,
         block_range: Optional[List[Dict]] = None,
     ):
         if self.extract_via_log() is True:
@@ -112,27 +153,39 @@ class NopExtractor(object):
                 od.update(base)
         return orderbook
 
-    def extract_orderbook_from_traces(self, db_engine: Engine, block_range: List[Dict]):
-        st_blknum = min(b["number"] for b in block_range)
-        et_blknum = max(b["number"] for b in block_range)
-        st = min(b["timestamp"] for b in block_range)
+    def extract_orderbook_from_traces(
+        self, db_engine: "Engine", block_range: List[Dict]
+    ):
+        """Extract the orderbooks from the traces, one sub-query per day.
+
+        The sub-ranges(see `split_trace_ranges`) are queried `trace_concurrency`
+        at a time over the engine's connection pool, and the orderbooks are
+        returned in block order.
+        """
+        ranges = split_trace_ranges(block_range, self.trace_split_blocks)
+        st_blknum, et_blknum = ranges[0][0], ranges[-1][1]
         et = max(b["timestamp"] for b in block_range)
-        st_day = as_st_day(st)
-        et_day = as_st_day(et)
 
         # assume the old(<1.5day) traces were ready
         if et >= int(time()) - 1.5 * 86400:
-            check_sql = CHECK_TRACE_READY_TEMPLATE.format(
-                chain=self.chain(),
-                st_blknum=st_blknum,
-                et_blknum=et_blknum,
-                st_day=st_day,
-                et_day=et_day,
-            )
-            rows = db_engine.execute(check_sql).fetchall()
-            assert rows is not None
 
-            trace_blocks = set(e["blknum"] for e in rows)
+            def check(r):
+                check_sql = CHECK_TRACE_READY_TEMPLATE.format(
+                    chain=self.chain(),
+                    st_blknum=r[0],
+                    et_blknum=r[1],
+                    st_day=r[2],
+                    et_day=r[3],
+                )
+                rows = db_engine.execute(check_sql).fetchall()
+                assert rows is not None
+                return rows
+
+            trace_blocks = set(
+                e["blknum"]
+                for rows in self._map_trace_ranges(check, ranges)
+                for e in rows
+            )
             block_blocks = set(
                 b["number"] for b in block_range if b["transaction_count"] > 0
             )
@@ -142,82 +195,108 @@ class NopExtractor(object):
                     f"trace_blocks +: {trace_blocks - block_blocks} block_blocks +: {block_blocks - trace_blocks}"
                 )
 
-        return self._extract_orderbook_from_traces(
-            db_engine, st_blknum, et_blknum, st_day, et_day
-        )
+        orderbooks = []
+        for part in self._map_trace_ranges(
+            lambda r: self._extract_orderbook_from_traces(db_engine, *r), ranges
+        ):
+            orderbooks.extend(part)
+        return orderbooks
+
+    def _map_trace_ranges(
+        self, fn: Callable[[Tuple[int, int, str, str]], T], ranges: List[Tuple]
+    ) -> List[T]:
+        if self.trace_concurrency <= 1 or len(ranges) <= 1:
+            return [fn(r) for r in ranges]
+
+        workers = min(self.trace_concurrency, len(ranges))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(fn, ranges))
 
     def calculate(
         self,
-        tx_df: pd.DataFrame,  # transaction
-        ob_df: pd.DataFrame,  # orderbook
-        tf_df: pd.DataFrame,  # token transfer
-        ef_df: pd.DataFrame,  # erc1155 transfer
+        tx_df: "pd.DataFrame",  # transaction
+        ob_df: "pd.DataFrame",  # orderbook
+        tf_df: "pd.DataFrame",  # token transfer
+        ef_df: "pd.DataFrame",  # erc1155 transfer
+        memory_budget: Optional[int] = None,
     ):
-        if tx_df.empty or ob_df.empty or len(tf_df) + len(ef_df) == 0:
+        return self.calculate_batch(
+            BatchContext(tx_df, tf_df, ef_df), ob_df, memory_budget
+        )
+
+    def calculate_chunks(
+        self, ctx: BatchContext, ob_df: "pd.DataFrame", memory_budget: int
+    ) -> Iterator["pd.DataFrame"]:
+        """Calculate the orderbooks chunk by chunk, under a memory budget(bytes).
+
+        The chunks are split on transaction boundaries, the orders and
+        transfers of one transaction are always calculated together.
+        """
+        if ctx.empty or ob_df.empty:
+            return
+
+        for txhashes in split_by_tx(ctx, ob_df, memory_budget):
+            chunk_df = ob_df[ob_df["txhash"].isin(txhashes)]
+            yield self.calculate_batch(ctx.select(txhashes), chunk_df)
+
+    def calculate_batch(
+        self,
+        ctx: BatchContext,
+        ob_df: "pd.DataFrame",
+        memory_budget: Optional[int] = None,
+    ):
+        """Calculate the orderbooks against a shared BatchContext.
+
+        Build the context once per block batch and pass it to each platform,
+        neither `ctx` nor `ob_df` is modified. With a `memory_budget`, the
+        batch is calculated chunk by chunk, see `calculate_chunks`.
+        """
+        import pandas as pd
+
+        if ctx.empty or ob_df.empty:
             return pd.DataFrame(columns=ORDERBOOK_COLUMNS)
 
-        tx_df.rename(
-            columns={
-                "value": "ether",
-                "to_address": "tx_to",
-            },
-            inplace=True,
-        )
-        tx_df = tx_df[["blknum", "txpos", "txhash", "_st", "ether", "tx_to"]]
-        if tx_df.empty:
-            tx_df = pd.DataFrame(columns=TX_COLUMNS)
+        if memory_budget is not None:
+            dfs = list(self.calculate_chunks(ctx, ob_df, memory_budget))
+            return pd.concat(dfs, ignore_index=True)
 
-        if "order_logpos" in ob_df.columns:
-            ob_df["prev_order_logpos"] = (
-                ob_df.sort_values(by=["blknum", "txpos"], ascending=True)
-                .groupby(["txhash"])["order_logpos"]  # type: ignore
-                .shift(1, fill_value=-1)
-            )
-            ob_df["next_order_logpos"] = (
-                ob_df.sort_values(by=["blknum", "txpos"], ascending=True)
-                .groupby(["txhash"])["order_logpos"]  # type: ignore
-                .shift(-1, fill_value=2**32)
-            )
+        # only carry the columns _calculate reads into the merges
+        columns = self._required_columns()
+        tx_df = project_columns(ctx.tx_df, columns["tx"])
+        ob_df = project_columns(ob_df, columns["ob"])
+        xf_df = project_columns(ctx.xf_df, columns["xf"])
 
-        tf_df.rename(
-            columns={
-                "logpos": "xfer_logpos",
-                "token_address": "x_token_address",
-                "from_address": "x_from_address",
-                "to_address": "x_to_address",
-                "value": "x_token_id",
-            },
-            inplace=True,
-        )
-        tf_df["x_token_value"] = 1
-        if tf_df.empty:
-            tf_df = pd.DataFrame(columns=TF_COLUMNS)
-
-        ef_df.drop(
-            columns=["operator", "xfer_type", "id_pos", "id_cnt"],
-            inplace=True,
-            errors="ignore",
-        )
-        ef_df.rename(
-            columns={
-                "logpos": "sfer_logpos",
-                "token_address": "s_token_address",
-                "from_address": "s_from_address",
-                "to_address": "s_to_address",
-                "id": "s_token_id",
-                "value": "s_token_value",
-            },
-            inplace=True,
-        )
-        if ef_df.empty:
-            ef_df = pd.DataFrame(columns=EF_COLUMNS)
+        if "order_logpos" in ob_df.columns:
+            ob_df = with_order_window(ob_df)
 
-        df = self._calculate(tx_df, ob_df, tf_df, ef_df)
+        df = self._calculate(tx_df, ob_df, xf_df)
 
         # fill missing columns to None
         for c in set(ORDERBOOK_COLUMNS) - set(df.columns):
             df[c] = None
-        return df
+        return df[ORDERBOOK_COLUMNS]
+
+    def calculate_records(
+        self,
+        txs: Dict[str, Dict],  # transaction by txhash
+        orders: List[Dict],  # orderbook
+        xfers: Dict[str, List[Dict]],  # token and erc1155 transfers by txhash
+    ) -> Optional[List[Dict]]:
+        """Calculate a few orderbooks without pandas, e.g. those of one block.
+
+        `xfers` is built by `group_transfer_records`. Returns the orderbook
+        records in ORDERBOOK_COLUMNS, or None if the platform has no record
+        path and must go through `calculate`.
+        """
+        if len(orders) == 0:
+            return []
+        if orders[0].get("order_logpos") is not None:
+            orders = with_order_window_records(orders)
+
+        records = self._calculate_records(txs, orders, xfers)
+        if records is None:
+            return None
+        return [{c: r.get(c) for c in ORDERBOOK_COLUMNS} for r in records]
 
     def _allowed_orderbook_topics(self) -> Set[str]:
         raise NotImplementedError
@@ -231,21 +310,43 @@ class NopExtractor(object):
     def _extract_orderbook(self, **kwargs) -> Optional[Union[Dict, List[Dict]]]:
         raise NotImplementedError
 
+    def _decode_uints(self, words: List[str], txhash: str, logpos: int) -> List:
+        """Decode the uint words of a log, warn about the malformed ones."""
+        values, errors = hex_to_decs(words)
+        if errors > 0:
+            logger.warning(
+                f"{errors} malformed uint words in log {logpos} of transaction {txhash}"
+            )
+        return values
+
     def _check_topic_data_length(self) -> bool:
         return True
 
+    def _required_columns(self) -> Dict[str, List[str]]:
+        # input columns read by `_calculate`, keyed by tx/ob/xf,
+        # the order window columns are attached after the projection
+        return dict(tx=TX_COLUMNS, ob=ORDERBOOK_COLUMNS, xf=XFER_COLUMNS)
+
     def _calculate(
         self,
-        tx_df: pd.DataFrame,  # transaction
-        ob_df: pd.DataFrame,  # orderbook
-        tf_df: pd.DataFrame,  # token transfer
-        ef_df: pd.DataFrame,  # erc1155 transfer
-    ) -> pd.DataFrame:
+        tx_df: "pd.DataFrame",  # transaction
+        ob_df: "pd.DataFrame",  # orderbook
+        xf_df: "pd.DataFrame",  # token and erc1155 transfer
+    ) -> "pd.DataFrame":
         raise NotImplementedError
 
+    def _calculate_records(
+        self,
+        txs: Dict[str, Dict],
+        orders: List[Dict],
+        xfers: Dict[str, List[Dict]],
+    ) -> Optional[List[Dict]]:
+        # the record counterpart of `_calculate`, optional
+        return None
+
     def _extract_orderbook_from_traces(
         self,
-        db_engine: Engine,
+        db_engine: "Engine",
         st_blknum: int,
         et_blknum: int,
         st_day: str,
@@ -1,10 +1,14 @@
-from typing import Dict, List, Set
-import pandas as pd
+from typing import TYPE_CHECKING, Dict, List, Set
 
 from nop.extractor.extractor import NopExtractor
-from nop.utils import hex_to_dec, as_st_day, word_to_address
+from nop.utils import as_st_day, as_st_days, word_to_address
+from nop.utils import query_once
+from nop.columns import ORDERBOOK_COLUMNS
 from nop.constant import ZERO_ADDR
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 TAKER_BID_TOPIC = "0x95fb6205e23ff6bda16a2d1dba56b9ad7c783f67c96fa149785052f47696f2be"
 TAKER_ASK_TOPIC = "0x68cd251d4d267c6e2034ff0088b990352b97b2002c0476587d0c4da889c11330"
@@ -18,7 +22,6 @@ LooksRare_Apps = {
 
 class LooksrareOrderbookExtractor(NopExtractor):
     def _extract_orderbook(self, topics_with_data: List[str], **kwargs) -> Dict:
-        kwargs = kwargs
         # TakerAsk and TakerBid are in the same topic/data ABI encoding sequence, use TakerAsk for example:
         #  {
         #    "inputs": [
@@ -36,14 +39,17 @@ class LooksrareOrderbookExtractor(NopExtractor):
         #    "name": "TakerAsk",
         #    "type": "event"
         #  },
+        token_id, token_value, price = self._decode_uints(
+            topics_with_data[8:11], kwargs["txhash"], kwargs["logpos"]
+        )
         return dict(
             taker=word_to_address(topics_with_data[1]),
             maker=word_to_address(topics_with_data[2]),
             currency=word_to_address(topics_with_data[6]),
             token_address=word_to_address(topics_with_data[7]),
-            token_id=hex_to_dec(topics_with_data[8]),
-            token_value=hex_to_dec(topics_with_data[9]),
-            price=hex_to_dec(topics_with_data[10]),
+            token_id=token_id,
+            token_value=token_value,
+            price=price,
             # action similar to etherscan's style
             action="Bought" if topics_with_data[0] == TAKER_ASK_TOPIC else "Bid Won",
         )
@@ -57,14 +63,24 @@ class LooksrareOrderbookExtractor(NopExtractor):
     def _known_platform_apps(self) -> Dict[str, str]:
         return LooksRare_Apps
 
+    def _required_columns(self) -> Dict[str, List[str]]:
+        return dict(super()._required_columns(), tx=[])
+
     def _calculate(
         self,
-        tx_df: pd.DataFrame,  # transaction
-        ob_df: pd.DataFrame,  # orderbook
-        tf_df: pd.DataFrame,  # token transfer
-        ef_df: pd.DataFrame,  # erc1155 transfer
+        tx_df: "pd.DataFrame",  # transaction
+        ob_df: "pd.DataFrame",  # orderbook
+        xf_df: "pd.DataFrame",  # token and erc1155 transfer
     ):
-        return calculate_looksrare_orderbooks(tx_df, ob_df, tf_df, ef_df)
+        return calculate_looksrare_orderbooks(tx_df, ob_df, xf_df)
+
+    def _calculate_records(
+        self,
+        txs: Dict[str, Dict],
+        orders: List[Dict],
+        xfers: Dict[str, List[Dict]],
+    ) -> List[Dict]:
+        return calculate_looksrare_records(orders, xfers)
 
     @staticmethod
     def platform():
@@ -72,53 +88,39 @@ class LooksrareOrderbookExtractor(NopExtractor):
 
 
 def calculate_looksrare_orderbooks(
-    tx_df: pd.DataFrame,
-    ob_df: pd.DataFrame,
-    tf_df: pd.DataFrame,
-    ef_df: pd.DataFrame,
+    tx_df: "pd.DataFrame",
+    ob_df: "pd.DataFrame",
+    xf_df: "pd.DataFrame",
 ):
     tx_df = tx_df
 
     merge_key = ["blknum", "txpos", "txhash", "_st"]
 
-    erc721_df = (
-        ob_df.merge(tf_df, how="inner", on=merge_key)
-        .query("token_address == x_token_address")
-        .query("token_id == x_token_id")  # type: ignore
-        .query("token_value == x_token_value")
-        .query("order_logpos > xfer_logpos")
-        .query("prev_order_logpos < xfer_logpos")
-        .rename(
-            columns={
-                "x_from_address": "from_address",
-                "x_to_address": "to_address",
-            }
-        )
-    )
-    erc721_df["token_type"] = "erc721"
-
-    erc1155_df = (
-        ob_df.merge(ef_df, how="inner", on=merge_key)
-        .query("token_address == s_token_address")
-        .query("token_id == s_token_id")  # type: ignore
-        .query("token_value == s_token_value")
-        .query("order_logpos > sfer_logpos")
-        .query("prev_order_logpos < sfer_logpos")
-        .rename(
-            columns={
-                "s_from_address": "from_address",
-                "s_to_address": "to_address",
-                "sfer_logpos": "xfer_logpos",
-            }
-        )
+    renames = {
+        "x_from_address": "from_address",
+        "x_to_address": "to_address",
+    }
+    df = ob_df.merge(
+        xf_df,
+        how="inner",
+        left_on=merge_key + ["token_address"],
+        right_on=merge_key + ["x_token_address"],
     )
-    erc1155_df["token_type"] = "erc1155"
-
-    df = pd.concat([erc721_df, erc1155_df], ignore_index=True)
-
     # README: kick out the BRUN events
     # if the Order has only one BURN event, then this order is not included
-    df = df[df["to_address"] != ZERO_ADDR]
+    df = query_once(
+        df,
+        [
+            "token_id == x_token_id",
+            "token_value == x_token_value",
+            "order_logpos > xfer_logpos",
+            "prev_order_logpos < xfer_logpos",
+            f"x_to_address != '{ZERO_ADDR}'",
+        ],
+        columns=ORDERBOOK_COLUMNS + list(renames) + ["standard"],
+    ).rename(columns=renames)
+    df["token_type"] = df["standard"]
+
     merge_key = ["txhash", "order_logpos"]
     _df = (
         df.groupby(merge_key)["blknum"]
@@ -139,6 +141,43 @@ def calculate_looksrare_orderbooks(
 
     df["value"] = df["price"]
     df["pattern"] = df["action"].apply(str.lower)
-    df["_st_day"] = df["_st"].apply(as_st_day)
+    df["_st_day"] = as_st_days(df["_st"])
 
     return df
+
+
+def calculate_looksrare_records(
+    orders: List[Dict], xfers: Dict[str, List[Dict]]
+) -> List[Dict]:
+    """The record counterpart of `calculate_looksrare_orderbooks`."""
+    records = []
+    for od in orders:
+        matched = [
+            xf
+            for xf in xfers.get(od["txhash"], [])
+            if xf["x_token_address"] == od["token_address"]
+            and xf["x_token_id"] == od["token_id"]
+            and xf["x_token_value"] == od["token_value"]
+            and od["prev_order_logpos"] < xf["xfer_logpos"] < od["order_logpos"]
+            and xf["x_to_address"] != ZERO_ADDR
+        ]
+        if len(matched) == 0:
+            continue
+
+        # keep the last Transfer event, the transfers are sorted by logpos
+        xf = matched[-1]
+        records.append(
+            dict(
+                od,
+                xfer_logpos=xf["xfer_logpos"],
+                from_address=xf["x_from_address"],
+                to_address=xf["x_to_address"],
+                token_type=xf["standard"],
+                pack_index=len(matched) - 1,
+                pack_count=len(matched),
+                value=od["price"],
+                pattern=od["action"].lower(),
+                _st_day=as_st_day(od["_st"]),
+            )
+        )
+    return records
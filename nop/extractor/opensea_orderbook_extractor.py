@@ -1,11 +1,14 @@
 import logging
-from typing import Dict, List, Set
-import pandas as pd
+from typing import TYPE_CHECKING, Dict, List, Set
 
 from nop.extractor.extractor import NopExtractor
-from nop.utils import hex_to_dec, as_st_day, word_to_address
+from nop.utils import as_st_days, word_to_address, query_once
 from nop.constant import ZERO_ADDR, ZERO_HASH
 from nop.columns import ORDERBOOK_COLUMNS
+from nop.extractor.context import STANDARD_ERC721, STANDARD_ERC1155
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -36,11 +39,14 @@ class OpenseaOrderbookExtractor(NopExtractor):
         #     "type": "event"
         # }
 
+        (price,) = self._decode_uints(
+            topics_with_data[6:7], kwargs["txhash"], kwargs["logpos"]
+        )
         return dict(
             maker=word_to_address(topics_with_data[1]),
             taker=word_to_address(topics_with_data[2]),
             metadata=topics_with_data[3],
-            price=hex_to_dec(topics_with_data[6]),
+            price=price,
             action="Bid Win" if topics_with_data[4] != ZERO_HASH else "Bought",
         )
 
@@ -55,12 +61,11 @@ class OpenseaOrderbookExtractor(NopExtractor):
 
     def _calculate(
         self,
-        tx_df: pd.DataFrame,  # transaction
-        ob_df: pd.DataFrame,  # orderbook
-        tf_df: pd.DataFrame,  # token transfer
-        ef_df: pd.DataFrame,  # erc1155 transfer
+        tx_df: "pd.DataFrame",  # transaction
+        ob_df: "pd.DataFrame",  # orderbook
+        xf_df: "pd.DataFrame",  # token and erc1155 transfer
     ):
-        return calculate_opensea_orderbooks(tx_df, ob_df, tf_df, ef_df)
+        return calculate_opensea_orderbooks(tx_df, ob_df, xf_df)
 
     @staticmethod
     def platform():
@@ -68,89 +73,89 @@ class OpenseaOrderbookExtractor(NopExtractor):
 
 
 def calculate_opensea_orderbooks(
-    tx_df: pd.DataFrame,
-    ob_df: pd.DataFrame,
-    tf_df: pd.DataFrame,
-    ef_df: pd.DataFrame,
-) -> pd.DataFrame:
+    tx_df: "pd.DataFrame",
+    ob_df: "pd.DataFrame",
+    xf_df: "pd.DataFrame",
+) -> "pd.DataFrame":
+    import pandas as pd
+
     merge_key = ["blknum", "txpos", "txhash", "_st"]
 
-    od_df = (
-        ob_df.merge(tf_df, how="left", on=merge_key)
-        .merge(ef_df, how="left", on=merge_key)
-        .merge(tx_df, how="left", on=merge_key)
+    od_df = ob_df.merge(xf_df, how="inner", on=merge_key).merge(
+        tx_df, how="left", on=merge_key
     )
 
     od_df = od_df[
-        (
-            (od_df["order_logpos"] > od_df["xfer_logpos"])
-            & (od_df["prev_order_logpos"] < od_df["xfer_logpos"])
-        )
-        | (
-            (od_df["order_logpos"] > od_df["sfer_logpos"])
-            & (od_df["prev_order_logpos"] < od_df["sfer_logpos"])
-        )
+        (od_df["order_logpos"] > od_df["xfer_logpos"])
+        & (od_df["prev_order_logpos"] < od_df["xfer_logpos"])
     ]
+
+    # split the token/erc1155 transfers into their own columns for counting
+    is_xfer = od_df["standard"] == STANDARD_ERC721
     st_df = (
-        od_df.groupby(merge_key)
+        od_df.assign(
+            xfer_tokens=od_df["x_token_address"].where(is_xfer),
+            sfer_tokens=od_df["x_token_address"].where(~is_xfer),
+            xfer_count=od_df["xfer_logpos"].where(is_xfer),
+            sfer_count=od_df["xfer_logpos"].where(~is_xfer),
+        )
+        .groupby(merge_key)
         .agg(
             {
-                "x_token_address": "nunique",
-                "s_token_address": "nunique",
+                "xfer_tokens": "nunique",
+                "sfer_tokens": "nunique",
                 "order_logpos": "nunique",
-                "xfer_logpos": "nunique",
-                "sfer_logpos": "nunique",
-            }
-        )
-        .rename(
-            columns={
-                "x_token_address": "xfer_tokens",
-                "s_token_address": "sfer_tokens",
-                "order_logpos": "order_count",
-                "xfer_logpos": "xfer_count",
-                "sfer_logpos": "sfer_count",
+                "xfer_count": "nunique",
+                "sfer_count": "nunique",
             }
         )
+        .rename(columns={"order_logpos": "order_count"})
         .reset_index()
     )
 
     full_df = od_df.merge(st_df, how="left", on=merge_key)
 
     # 87%
-    e11nn_df = (
-        full_df.query("(order_count == xfer_count + sfer_count)")
-        .query("(xfer_count == 0 | sfer_count == 0)")
-        .copy()
-    )
+    e11nn_df = query_once(
+        full_df,
+        [
+            "(order_count == xfer_count + sfer_count)",
+            "(xfer_count == 0 | sfer_count == 0)",
+        ],
+    ).copy()
     e11nn_df = extract_e11nn_df(e11nn_df)
 
     # 5.5%
-    e1n1n_df = (
-        full_df.query("(order_count == 1)")
-        .query(
+    e1n1n_df = query_once(
+        full_df,
+        [
+            "(order_count == 1)",
             "  ( (xfer_count > 1) & (xfer_tokens == 1) & (sfer_count == 0) )"
             + " | "
-            + "( (sfer_count > 1) & (sfer_tokens == 1) & (xfer_count == 0) )"
-        )
-        .copy()
-    )
+            + "( (sfer_count > 1) & (sfer_tokens == 1) & (xfer_count == 0) )",
+        ],
+    ).copy()
     e1n1n_df = extract_e1n1n_df(e1n1n_df)
 
     # all: 7.5%
     # currency and fee in ERC20, NFT in ERC721
-    t1n20_df = (
-        full_df.query("(order_count == 1) & (ether == 0) & (tx_to == platform)")
-        .query("(xfer_count > 2) & (xfer_tokens == 2) & (sfer_count == 0)")
-        .copy()
-    )
+    t1n20_df = query_once(
+        full_df,
+        [
+            "(order_count == 1) & (ether == 0) & (tx_to == platform)",
+            "(xfer_count > 2) & (xfer_tokens == 2) & (sfer_count == 0)",
+        ],
+    ).copy()
     t1n20_df = extract_t1n20_df(t1n20_df)
 
     # currency and fee in ERC20, NFT in ERC1155
-    t121n_df = (
-        full_df.query("(order_count == 1) & (ether == 0) & (tx_to == platform)")
-        .query("(xfer_count == 2) & (xfer_tokens == 1) & (sfer_count > 0)")
-        .copy()
-    )
+    t121n_df = query_once(
+        full_df,
+        [
+            "(order_count == 1) & (ether == 0) & (tx_to == platform)",
+            "(xfer_count == 2) & (xfer_tokens == 1) & (sfer_count > 0)",
+        ],
+    ).copy()
     t121n_df = extract_t121n_df(t121n_df)
     dfs = []
 
@@ -170,11 +175,11 @@ def calculate_opensea_orderbooks(
     return df
 
 
-def extract_e11nn_df(e11nn_df: pd.DataFrame):
+def extract_e11nn_df(e11nn_df: "pd.DataFrame"):
     if len(e11nn_df) == 0:
         return None
 
-    apply_xfer_sfer_attributes(e11nn_df)
+    apply_xfer_attributes(e11nn_df)
     apply_ether_attributes(e11nn_df)
     e11nn_df["pack_index"] = 0
     e11nn_df["pack_count"] = 1
@@ -196,12 +201,12 @@ def extract_e11nn_df(e11nn_df: pd.DataFrame):
             return None
 
     e11nn_df["pattern"] = e11nn_df.apply(pattern_it, axis=1)
-    e11nn_df["_st_day"] = e11nn_df["_st"].apply(as_st_day)
+    e11nn_df["_st_day"] = as_st_days(e11nn_df["_st"])
     e11nn_df["trace_address"] = None
     return e11nn_df[ORDERBOOK_COLUMNS]
 
 
-def extract_e1n1n_df(e1n1n_df: pd.DataFrame):
+def extract_e1n1n_df(e1n1n_df: "pd.DataFrame"):
     if len(e1n1n_df) == 0:
         return None
 
@@ -211,7 +216,7 @@ def extract_e1n1n_df(e1n1n_df: pd.DataFrame):
         .groupby(merge_key)  # type: ignore
         .cumcount()
     )
-    _df: pd.DataFrame = (
+    _df: "pd.DataFrame" = (
         e1n1n_df.groupby(merge_key)["blknum"]
         .count()
         .reset_index()
@@ -219,7 +224,7 @@ def extract_e1n1n_df(e1n1n_df: pd.DataFrame):
     )
     e1n1n_df = e1n1n_df.merge(_df, how="left", on=merge_key)
 
-    apply_xfer_sfer_attributes(e1n1n_df)
+    apply_xfer_attributes(e1n1n_df)
     apply_ether_attributes(e1n1n_df)
 
     _vf = (
@@ -246,12 +251,12 @@ def extract_e1n1n_df(e1n1n_df: pd.DataFrame):
             return None
 
     e1n1n_df["pattern"] = e1n1n_df.apply(pattern_it, axis=1)
-    e1n1n_df["_st_day"] = e1n1n_df["_st"].apply(as_st_day)
+    e1n1n_df["_st_day"] = as_st_days(e1n1n_df["_st"])
     e1n1n_df["trace_address"] = None
     return e1n1n_df[ORDERBOOK_COLUMNS]
 
 
-def extract_t1n20_df(t1n20_df: pd.DataFrame):
+def extract_t1n20_df(t1n20_df: "pd.DataFrame"):
     if len(t1n20_df) == 0:
         return None
 
@@ -352,25 +357,26 @@ def extract_t1n20_df(t1n20_df: pd.DataFrame):
             return None
 
     t1n20_nft_df["pattern"] = t1n20_nft_df.apply(pattern_it, axis=1)
-    t1n20_nft_df["_st_day"] = t1n20_nft_df["_st"].apply(as_st_day)
+    t1n20_nft_df["_st_day"] = as_st_days(t1n20_nft_df["_st"])
     t1n20_nft_df["trace_address"] = None
     return t1n20_nft_df[ORDERBOOK_COLUMNS]
 
 
-def extract_t121n_df(t121n_df: pd.DataFrame):
+def extract_t121n_df(t121n_df: "pd.DataFrame"):
     if len(t121n_df) == 0:
         return None
 
     merge_key = ["txhash", "order_logpos"]
-    t121n_df["_row"] = (
-        t121n_df.sort_values(by=["xfer_logpos"], ascending=True)
+    t121n_erc20_df = t121n_df[t121n_df["standard"] == STANDARD_ERC721].copy()
+    t121n_erc20_df["_row"] = (
+        t121n_erc20_df.sort_values(by=["xfer_logpos"], ascending=True)
         .groupby(merge_key)  # type: ignore
         .cumcount()
         + 1  # row number starts with 1
     )
 
     # the first one is the currency row
-    t121n_cur_df = t121n_df.query("_row == 1").rename(  # type: ignore
+    t121n_cur_df = t121n_erc20_df.query("_row == 1").rename(  # type: ignore
         columns={
             "x_token_address": "currency",
             "x_from_address": "value_from",
@@ -380,7 +386,7 @@ def extract_t121n_df(t121n_df: pd.DataFrame):
     )[merge_key + ["currency", "value_from", "value_to", "value"]]
 
     # the second one is the fee(paid in currency)
-    t121n_fee_df = t121n_df.query("_row == 2").rename(  # type: ignore
+    t121n_fee_df = t121n_erc20_df.query("_row == 2").rename(  # type: ignore
         columns={
             "x_token_address": "fee_currency",
             "x_from_address": "fee_from",
@@ -390,28 +396,28 @@ def extract_t121n_df(t121n_df: pd.DataFrame):
     )[merge_key + ["fee_currency", "fee_from", "fee_to", "fee_value"]]
 
     # ERC1155 Transfers
-    t121n_df.drop_duplicates(subset=merge_key + ["sfer_logpos"], inplace=True)
+    t121n_df = t121n_df[t121n_df["standard"] == STANDARD_ERC1155].copy()
 
     t121n_df["pack_index"] = (
-        t121n_df.sort_values(by=["sfer_logpos"], ascending=True)
+        t121n_df.sort_values(by=["xfer_logpos"], ascending=True)
         .groupby(merge_key)  # type: ignore
         .cumcount()
     )
     _df = (
         t121n_df.groupby(merge_key)
-        .agg({"blknum": "count", "s_token_address": "nunique"})
-        .rename(columns={"blknum": "pack_count", "s_token_address": "nft_tokens"})
+        .agg({"blknum": "count", "x_token_address": "nunique"})
+        .rename(columns={"blknum": "pack_count", "x_token_address": "nft_tokens"})
         .reset_index()
     )
 
     t121n_df = (
         t121n_df.rename(
             columns={
-                "s_token_address": "token_address",
-                "s_from_address": "from_address",
-                "s_to_address": "to_address",
-                "s_token_id": "token_id",
-                "s_token_value": "token_value",
+                "x_token_address": "token_address",
+                "x_from_address": "from_address",
+                "x_to_address": "to_address",
+                "x_token_id": "token_id",
+                "x_token_value": "token_value",
             }
         )
         .merge(_df, how="left", on=merge_key)  # type: ignore
@@ -431,7 +437,6 @@ def extract_t121n_df(t121n_df: pd.DataFrame):
         .rename(columns={"blknum": "split_count"})  # type: ignore
     )
     t121n_df = t121n_df.merge(_vf, how="left", on=merge_key)
-    t121n_df["xfer_logpos"] = t121n_df["sfer_logpos"]
     t121n_df["token_type"] = "erc1155"
     t121n_df["value"] = t121n_df.apply(
         lambda row: row["price"] / row["split_count"]
@@ -446,7 +451,7 @@ def extract_t121n_df(t121n_df: pd.DataFrame):
         axis=1,
     )
     t121n_df["pattern"] = "t12n"
-    t121n_df["_st_day"] = t121n_df["_st"].apply(as_st_day)
+    t121n_df["_st_day"] = as_st_days(t121n_df["_st"])
     t121n_df["trace_address"] = None
     return t121n_df[ORDERBOOK_COLUMNS]
 
@@ -461,40 +466,10 @@ def apply_ether_attributes(df):
     df["fee_value"] = None
 
 
-def apply_xfer_sfer_attributes(df):
-    df["xfer_logpos"] = df.apply(
-        lambda row: row["xfer_logpos"] if row["xfer_count"] > 0 else row["sfer_logpos"],
-        axis=1,
-    )
-    df["token_type"] = df.apply(
-        lambda row: "erc721" if row["xfer_count"] > 0 else "erc1155",
-        axis=1,
-    )
-    df["token_address"] = df.apply(
-        lambda row: row["x_token_address"]
-        if row["xfer_count"] > 0
-        else row["s_token_address"],
-        axis=1,
-    )
-    df["token_id"] = df.apply(
-        lambda row: row["x_token_id"] if row["xfer_count"] > 0 else row["s_token_id"],
-        axis=1,
-    )
-    df["token_value"] = df.apply(
-        lambda row: row["x_token_value"]
-        if row["xfer_count"] > 0
-        else row["s_token_value"],
-        axis=1,
-    )
-    df["from_address"] = df.apply(
-        lambda row: row["x_from_address"]
-        if row["xfer_count"] > 0
-        else row["s_from_address"],
-        axis=1,
-    )
-    df["to_address"] = df.apply(
-        lambda row: row["x_to_address"]
-        if row["xfer_count"] > 0
-        else row["s_to_address"],
-        axis=1,
-    )
+def apply_xfer_attributes(df):
+    df["token_type"] = df["standard"]
+    df["token_address"] = df["x_token_address"]
+    df["token_id"] = df["x_token_id"]
+    df["token_value"] = df["x_token_value"]
+    df["from_address"] = df["x_from_address"]
+    df["to_address"] = df["x_to_address"]
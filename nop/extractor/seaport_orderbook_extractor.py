@@ -1,13 +1,16 @@
 import logging
 import json
-from typing import Dict, List, Set, NamedTuple, Optional, Union
-import pandas as pd
+from typing import TYPE_CHECKING, Dict, List, Set, NamedTuple, Optional, Union
 
 from nop.extractor.extractor import NopExtractor
-from nop.utils import as_st_day, to_normalized_address
+from nop.utils import as_st_days, to_normalized_address
 from nop.eth_decode import eth_decode_log
 from nop.constant import ZERO_ADDR
-from nop.utils import partition_rank
+from nop.utils import rank_merge, query_once, project_columns
+from nop.columns import ORDERBOOK_COLUMNS
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 logger = logging.getLogger(__name__)
@@ -342,14 +345,16 @@ class SeaportOrderbookExtractor(NopExtractor):
     def _known_platform_apps(self) -> Dict[str, str]:
         return Seaport_Apps
 
+    def _required_columns(self) -> Dict[str, List[str]]:
+        return dict(super()._required_columns(), tx=[])
+
     def _calculate(
         self,
-        tx_df: pd.DataFrame,  # transaction
-        ob_df: pd.DataFrame,  # orderbook
-        tf_df: pd.DataFrame,  # token transfer
-        ef_df: pd.DataFrame,  # erc1155 transfer
+        tx_df: "pd.DataFrame",  # transaction
+        ob_df: "pd.DataFrame",  # orderbook
+        xf_df: "pd.DataFrame",  # token and erc1155 transfer
     ):
-        return calculate_seaport_orderbooks(tx_df, ob_df, tf_df, ef_df)
+        return calculate_seaport_orderbooks(tx_df, ob_df, xf_df)
 
     @staticmethod
     def platform():
@@ -363,14 +368,13 @@ S11_PS = ["p1-s1:1r2:1", "p1-s1:1r3:1", "p2-s1:1r2:2", "p2-s1:1r3:2"]
 
 
 def calculate_seaport_orderbooks(
-    tx_df: pd.DataFrame,  # transaction
-    ob_df: pd.DataFrame,  # orderbook
-    tf_df: pd.DataFrame,  # token transfer
-    ef_df: pd.DataFrame,  # erc1155 transfer
+    tx_df: "pd.DataFrame",  # transaction
+    ob_df: "pd.DataFrame",  # orderbook
+    xf_df: "pd.DataFrame",  # token and erc1155 transfer
 ):
     # ob_df.to_json("seaport_orderbooks.json", indent=2, orient="records")
-    # tf_df.to_json("seaport_token_xfers.json", indent=2, orient="records")
-    # ef_df.to_json("seaport_erc1155_xfers.json", indent=2, orient="records")
+    # xf_df.to_json("seaport_xfers.json", indent=2, orient="records")
+    import pandas as pd
 
     tx_df = tx_df
     merge_key = ["blknum", "txpos", "txhash", "_st"]
@@ -380,52 +384,47 @@ def calculate_seaport_orderbooks(
     #   https://etherscan.io/tx/0x4516bf50ac1d037f3b4f9e81af0130c662132ce8723a3557aa1fd0e177e24487
     # Transfer first, then Order:
     #   https://etherscan.io/tx/0x7b3d5c4c25590a35793cdbd046cb1cd4cc11134442f1d22e27a8d64fcc353842
-    erc721_df = (
-        ob_df[ob_df.token_type.str.startswith("erc721")]
-        .merge(tf_df, how="inner", on=merge_key)
-        .query("token_address == x_token_address")
-        .query("token_id == x_token_id")
-        .query("token_value == x_token_value")
-        .rename(
-            columns={
-                "x_from_address": "from_address",
-                "x_to_address": "to_address",
-            }
-        )
+    # erc721(-N) orders are matched with the Transfer events,
+    # and erc1155(-N) orders with the TransferSingle/TransferBatch events
+    ob_df = ob_df.assign(standard=ob_df["token_type"].str.split("-").str[0])
+    is_s11 = ob_df["pattern"].isin(S11_PS)
+
+    columns = ORDERBOOK_COLUMNS + ["x_from_address", "x_to_address"]
+    df = query_once(
+        ob_df[~is_s11].merge(
+            xf_df,
+            how="inner",
+            left_on=merge_key + ["standard", "token_address"],
+            right_on=merge_key + ["standard", "x_token_address"],
+        ),
+        ["token_id == x_token_id", "token_value == x_token_value"],
+        columns=columns,
     )
 
-    erc1155_df = (
-        ob_df[ob_df.token_type.str.startswith("erc1155")]
-        .merge(ef_df, how="inner", on=merge_key)
-        .query("token_address == s_token_address")
-        .query("token_id == s_token_id")
-        .query("token_value == s_token_value")
-        .rename(
-            columns={
-                "s_from_address": "from_address",
-                "s_to_address": "to_address",
-                "sfer_logpos": "xfer_logpos",
-            }
-        )
+    # the k-th order is paired with the k-th Transfer of the same token
+    order_key = ["standard", "token_address", "token_id", "token_value"]
+    xfer_key = ["standard", "x_token_address", "x_token_id", "x_token_value"]
+    df_s11 = rank_merge(
+        ob_df[is_s11],
+        xf_df[xf_df["txhash"].isin(ob_df.loc[is_s11, "txhash"])],
+        left_on=merge_key + order_key,
+        right_on=merge_key + xfer_key,
+        left_sort=["order_logpos", "pack_index"],
+        right_sort=["xfer_logpos"],
     )
+    df_s11 = project_columns(df_s11, columns)
 
-    df = pd.concat([erc721_df, erc1155_df], ignore_index=True)
-
-    df_s11 = df[df["pattern"].isin(S11_PS)]
-    df = df[~df["pattern"].isin(S11_PS)]
-
-    partition_rank(df_s11, ["txhash", "order_logpos"], "_order_rank")
-    partition_rank(df_s11, ["txhash", "xfer_logpos"], "_xfer_rank")
-
-    df_s11 = df_s11.query("_order_rank == _xfer_rank")
-    df_s11 = df_s11.drop(columns=["_order_rank", "_xfer_rank"])
-
-    df = pd.concat([df, df_s11], ignore_index=True)
+    df = pd.concat([df, df_s11], ignore_index=True).rename(
+        columns={
+            "x_from_address": "from_address",
+            "x_to_address": "to_address",
+        }
+    )
     # README: kick out the BRUN events
     # if the Order has only one BURN event, then this order is not included
     df = df[df["to_address"] != ZERO_ADDR]
 
     df["value"] = df["price"] / df["pack_count"]
-    df["_st_day"] = df["_st"].apply(as_st_day)
+    df["_st_day"] = as_st_days(df["_st"])
 
     return df
@@ -1,9 +1,10 @@
 import logging
-from typing import Dict
-import pandas as pd
-from sqlalchemy.engine import Engine
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Set
 
 from nop.extractor.extractor import NopExtractor
+from nop.extractor.context import STANDARD_ERC721
+from nop.utils import to_normalized_addresses
 
 from nop.misc.sudoswap_read_trace_template import READ_TRACE_TEMPLATE
 from nop.misc.sudoswap_method_extractor import (
@@ -12,6 +13,10 @@ from nop.misc.sudoswap_method_extractor import (
     SUDOSWAP_COLUMNS,
 )
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from sqlalchemy.engine import Engine
+
 logger = logging.getLogger(__name__)
 
 SUDOSWAP_CONTRACT = "0x2b2e8cda09bba9660dca5cb6233787738ad68329"
@@ -28,14 +33,29 @@ class SudoswapOrderbookExtractor(NopExtractor):
         return False
 
     __pools = dict()
+    # the per-day trace sub-queries run concurrently, reload the pools once
+    __pools_lock = threading.Lock()
 
-    def get_pools(self, engine: Engine) -> Dict:
+    def get_pools(self, engine: "Engine") -> Dict:
         if len(self.__pools) == 0:
-            self.getset_pools(engine)
+            with self.__pools_lock:
+                # another sub-query may have loaded them while waiting
+                if len(self.__pools) == 0:
+                    self._load_pools(engine)
 
         return self.__pools
 
-    def getset_pools(self, engine: Engine):
+    def getset_pools(self, engine: "Engine", missing: Optional[Set[str]] = None):
+        """Reload the pools, unless the `missing` ones were already reloaded
+        by another sub-query."""
+        with self.__pools_lock:
+            if missing is not None and missing.issubset(self.__pools.keys()):
+                return
+            self._load_pools(engine)
+
+    def _load_pools(self, engine: "Engine"):
+        import pandas as pd
+
         df = pd.read_sql(
             f"SELECT DISTINCT pool_address, token_address, currency FROM {self.chain()}.sudoswap_pools",
             con=engine,
@@ -47,12 +67,14 @@ class SudoswapOrderbookExtractor(NopExtractor):
 
     def _extract_orderbook_from_traces(
         self,
-        engine: Engine,
+        engine: "Engine",
         start_blknum,
         end_blknum,
         start_day,
         end_day,
     ):
+        import pandas as pd
+
         sql = READ_TRACE_TEMPLATE.format(
             st_blknum=start_blknum,
             et_blknum=end_blknum,
@@ -75,15 +97,21 @@ class SudoswapOrderbookExtractor(NopExtractor):
             if len(mf) > 0:
                 of = pd.concat([of, mf[SUDOSWAP_COLUMNS]])
 
+        # README: the decoded trace arguments may be checksummed, while the
+        # pools and transfers are keyed by lower-cased addresses
+        for column in ("from_address", "to_address", "pair"):
+            of[column] = to_normalized_addresses(of[column])
         of = self.fill_pair_with_nft(of, engine)
         of.drop(columns=["pair"], inplace=True)
 
         return of.to_dict("records")
 
-    def fill_pair_with_nft(self, df: pd.DataFrame, engine: Engine) -> pd.DataFrame:
+    def fill_pair_with_nft(
+        self, df: "pd.DataFrame", engine: "Engine"
+    ) -> "pd.DataFrame":
         pools = self.get_pools(engine)
         if not set(df["pair"]).issubset(set(pools.keys())):
-            self.getset_pools(engine)
+            self.getset_pools(engine, set(df["pair"]))
             pools = self.get_pools(engine)
 
         notfound = set(df["pair"]) - set(pools.keys())
@@ -97,12 +125,11 @@ class SudoswapOrderbookExtractor(NopExtractor):
 
     def _calculate(
         self,
-        tx_df: pd.DataFrame,  # transaction
-        ob_df: pd.DataFrame,  # orderbook
-        tf_df: pd.DataFrame,  # token transfer
-        ef_df: pd.DataFrame,  # erc1155 transfer
+        tx_df: "pd.DataFrame",  # transaction
+        ob_df: "pd.DataFrame",  # orderbook
+        xf_df: "pd.DataFrame",  # token and erc1155 transfer
     ):
-        return calculate_sudoswap_orderbooks(tx_df, ob_df, tf_df, ef_df)
+        return calculate_sudoswap_orderbooks(tx_df, ob_df, xf_df)
 
 
 MERGE_KEY = ["blknum", "txpos", "txhash", "_st"]
@@ -117,13 +144,11 @@ RIGHT_ON = MERGE_KEY + [
 
 # 2022.08.10 Sudoswap ONLY supports ERC721
 def calculate_sudoswap_orderbooks(
-    tx_df: pd.DataFrame,
-    ob_df: pd.DataFrame,
-    tf_df: pd.DataFrame,
-    ef_df: pd.DataFrame,
+    tx_df: "pd.DataFrame",
+    ob_df: "pd.DataFrame",
+    xf_df: "pd.DataFrame",
 ):
     tx_df = tx_df
-    ef_df = ef_df
 
     # remove the entity, who's TokenXfer not found
     # see this tx for more informaction
@@ -158,6 +183,7 @@ def calculate_sudoswap_orderbooks(
     #     },
     #   ]
     # }
+    tf_df = xf_df[xf_df["standard"] == STANDARD_ERC721]
     ob_df = ob_df.merge(tf_df, how="inner", left_on=LEFT_ON, right_on=RIGHT_ON)
 
     # TODO: drop the duplicate if the same token-id Transfered more than once?
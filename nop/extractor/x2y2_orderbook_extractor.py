@@ -1,16 +1,19 @@
-from typing import Dict, Set, List, Optional, Union
+from typing import TYPE_CHECKING, Dict, Set, List, Optional, Union
 import logging
 import json
-import pandas as pd
 from copy import copy
 from eth_abi.abi import decode_single
 
 from nop.extractor.extractor import NopExtractor
-from nop.utils import as_st_day, to_normalized_address
+from nop.utils import as_st_day, as_st_days, to_normalized_address, query_once
+from nop.columns import ORDERBOOK_COLUMNS
 
 from nop.constant import ZERO_ADDR
 from nop.eth_decode import eth_decode_log
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 
@@ -225,14 +228,24 @@ class X2Y2OrderbookExtractor(NopExtractor):
     def _known_platform_apps(self) -> Dict[str, str]:
         return X2Y2_Apps
 
+    def _required_columns(self) -> Dict[str, List[str]]:
+        return dict(super()._required_columns(), tx=[])
+
     def _calculate(
         self,
-        tx_df: pd.DataFrame,  # transaction
-        ob_df: pd.DataFrame,  # orderbook
-        tf_df: pd.DataFrame,  # token transfer
-        ef_df: pd.DataFrame,  # erc1155 transfer
+        tx_df: "pd.DataFrame",  # transaction
+        ob_df: "pd.DataFrame",  # orderbook
+        xf_df: "pd.DataFrame",  # token and erc1155 transfer
     ):
-        return calculate_x2y2_orderbooks(tx_df, ob_df, tf_df, ef_df)
+        return calculate_x2y2_orderbooks(tx_df, ob_df, xf_df)
+
+    def _calculate_records(
+        self,
+        txs: Dict[str, Dict],
+        orders: List[Dict],
+        xfers: Dict[str, List[Dict]],
+    ) -> List[Dict]:
+        return calculate_x2y2_records(orders, xfers)
 
     @staticmethod
     def platform():
@@ -240,54 +253,38 @@ class X2Y2OrderbookExtractor(NopExtractor):
 
 
 def calculate_x2y2_orderbooks(
-    tx_df: pd.DataFrame,
-    ob_df: pd.DataFrame,
-    tf_df: pd.DataFrame,
-    ef_df: pd.DataFrame,
+    tx_df: "pd.DataFrame",
+    ob_df: "pd.DataFrame",
+    xf_df: "pd.DataFrame",
 ):
     tx_df = tx_df
     merge_key = ["blknum", "txpos", "txhash", "_st"]
 
-    erc721_df = (
-        ob_df.query("token_type == 'erc721'")
-        .merge(tf_df, how="inner", on=merge_key)  # type: ignore
-        .query("token_address == x_token_address")
-        .query("token_id == x_token_id")  # type: ignore
-        .query("order_logpos > xfer_logpos")
-        .query("prev_order_logpos < xfer_logpos")
-        .rename(
-            columns={
-                "x_from_address": "from_address",
-                "x_to_address": "to_address",
-                "x_token_value": "token_value",
-            }
-        )
-    )
-    erc721_df["token_type"] = "erc721"
-
-    erc1155_df = (
-        ob_df.query("token_type == 'erc1155'")
-        .merge(ef_df, how="inner", on=merge_key)  # type: ignore
-        .query("token_address == s_token_address")
-        .query("token_id == s_token_id")  # type: ignore
-        .query("order_logpos > sfer_logpos")
-        .query("prev_order_logpos < sfer_logpos")
-        .rename(
-            columns={
-                "s_from_address": "from_address",
-                "s_to_address": "to_address",
-                "sfer_logpos": "xfer_logpos",
-                "s_token_value": "token_value",
-            }
-        )
+    # erc721 orders are matched with the Transfer events,
+    # and erc1155 orders with the TransferSingle/TransferBatch events
+    renames = {
+        "x_from_address": "from_address",
+        "x_to_address": "to_address",
+        "x_token_value": "token_value",
+    }
+    df = ob_df.merge(
+        xf_df,
+        how="inner",
+        left_on=merge_key + ["token_type", "token_address"],
+        right_on=merge_key + ["standard", "x_token_address"],
     )
-    erc1155_df["token_type"] = "erc1155"
-
-    df = pd.concat([erc721_df, erc1155_df], ignore_index=True)
-
     # README: kick out the BRUN events
     # if the Order has only one BURN event, then this order is not included
-    df = df[df["to_address"] != ZERO_ADDR]
+    df = query_once(
+        df,
+        [
+            "token_id == x_token_id",
+            "order_logpos > xfer_logpos",
+            "prev_order_logpos < xfer_logpos",
+            f"x_to_address != '{ZERO_ADDR}'",
+        ],
+        columns=ORDERBOOK_COLUMNS + list(renames),
+    ).rename(columns=renames)
     # merge_key = ["txhash", "order_logpos"]
     # _df = (
     #     df.groupby(merge_key)["blknum"]
@@ -308,6 +305,35 @@ def calculate_x2y2_orderbooks(
 
     df["value"] = df["price"] / df["pack_count"]
     df["pattern"] = df["action"].apply(str.lower)
-    df["_st_day"] = df["_st"].apply(as_st_day)
+    df["_st_day"] = as_st_days(df["_st"])
 
     return df
+
+
+def calculate_x2y2_records(
+    orders: List[Dict], xfers: Dict[str, List[Dict]]
+) -> List[Dict]:
+    """The record counterpart of `calculate_x2y2_orderbooks`."""
+    records = []
+    for od in orders:
+        for xf in xfers.get(od["txhash"], []):
+            if (
+                xf["standard"] == od["token_type"]
+                and xf["x_token_address"] == od["token_address"]
+                and xf["x_token_id"] == od["token_id"]
+                and od["prev_order_logpos"] < xf["xfer_logpos"] < od["order_logpos"]
+                and xf["x_to_address"] != ZERO_ADDR
+            ):
+                records.append(
+                    dict(
+                        od,
+                        xfer_logpos=xf["xfer_logpos"],
+                        from_address=xf["x_from_address"],
+                        to_address=xf["x_to_address"],
+                        token_value=xf["x_token_value"],
+                        value=od["price"] / od["pack_count"],
+                        pattern=od["action"].lower(),
+                        _st_day=as_st_day(od["_st"]),
+                    )
+                )
+    return records
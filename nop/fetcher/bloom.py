@@ -0,0 +1,112 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+from eth_utils import keccak
+
+from nop.extractor.extractor import NopExtractor
+
+
+def bloom_mask(item: str) -> int:
+    """The 3 bits an address or topic sets in a 2048-bit logs bloom, as a mask.
+
+    Same as go-ethereum's bloom9: the low 11 bits of the first 3 big-endian
+    uint16 of keccak256(item), counted from the last bit of the bloom.
+    """
+    digest = keccak(hexstr=item)
+    mask = 0
+    for i in (0, 2, 4):
+        mask |= 1 << (int.from_bytes(digest[i : i + 2], "big") & 2047)
+    return mask
+
+
+def _contains(bloom: int, mask: int) -> bool:
+    return bloom & mask == mask
+
+
+def _as_int(number) -> int:
+    # blockchain-etl numbers are ints, JSON-RPC ones hex strings
+    return int(number, 16) if isinstance(number, str) else number
+
+
+class BlockBloomFilter(object):
+    """Tell the blocks that can't contain any orderbook log by their logs bloom.
+
+    A block may contain an order of a platform only if its bloom has one of
+    the platform's addresses and one of its orderbook topics. The trace-based
+    platforms aren't covered, their orders don't show in the logs bloom, with
+    any of them `filter_batch` only drops the logs.
+    """
+
+    def __init__(
+        self,
+        extractors: Optional[List[NopExtractor]] = None,
+        only_known_platform: bool = True,
+    ):
+        if extractors is None:
+            import nop
+
+            extractors = [p() for p in nop.platforms]
+
+        self.platforms = []
+        self.with_trace_platforms = False
+        for extractor in extractors:
+            if extractor.extract_via_log() is not True:
+                self.with_trace_platforms = True
+                continue
+            addresses = None
+            if only_known_platform is True:
+                addresses = [bloom_mask(a) for a in extractor._known_platform_apps()]
+            topics = [bloom_mask(t) for t in extractor._allowed_orderbook_topics()]
+            self.platforms.append((addresses, topics))
+
+    def may_contain(self, logs_bloom: Optional[str]) -> bool:
+        if logs_bloom is None:
+            return True
+        bloom = int(logs_bloom, 16)
+        if bloom == 0:
+            return False
+        for addresses, topics in self.platforms:
+            if addresses is not None and not any(
+                _contains(bloom, m) for m in addresses
+            ):
+                continue
+            if any(_contains(bloom, m) for m in topics):
+                return True
+        return False
+
+    def relevant_blocks(self, blocks: Iterable[Dict]) -> Set[int]:
+        """The numbers of the blocks that may contain an orderbook log, the
+        blocks in blockchain-etl(`logs_bloom`) or JSON-RPC(`logsBloom`) style."""
+        result = set()
+        for block in blocks:
+            logs_bloom = block.get("logs_bloom", block.get("logsBloom"))
+            if self.may_contain(logs_bloom):
+                result.add(_as_int(block["number"]))
+        return result
+
+    def filter_batch(self, batch: Dict) -> Dict:
+        """Drop the blocks, logs, transactions and transfers of the irrelevant
+        blocks from a batch(as `BackfillRunner`'s fetch returns).
+
+        The trace platforms read every block and its transfers, with any of
+        them only the logs are dropped. A batch without `blocks`(the blooms)
+        is returned as is, nothing can be told about its blocks.
+        """
+        if batch.get("blocks") is None:
+            return batch
+
+        blknums = self.relevant_blocks(batch["blocks"])
+        filtered = dict(batch)
+        filtered["logs"] = [
+            e for e in batch.get("logs") or [] if _as_int(e["block_number"]) in blknums
+        ]
+        if self.with_trace_platforms:
+            return filtered
+
+        filtered["blocks"] = [
+            b for b in batch["blocks"] if _as_int(b["number"]) in blknums
+        ]
+        for name in ("tx_df", "tf_df", "ef_df"):
+            df = batch.get(name)
+            if df is not None and not df.empty:
+                filtered[name] = df[df["blknum"].isin(blknums)]
+        return filtered
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+from nop.extractor.extractor import NopExtractor
+from nop.utils import hex_to_dec, to_normalized_address
+
+# README: aiohttp is an optional dependency(`pip install nop[rpc]`), it's only
+# imported when the logs are fetched from a JSON-RPC node
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# the error messages of the nodes/providers when a range returns too many logs
+TOO_MANY_RESULTS = [
+    "too many",
+    "more than",
+    "limit exceeded",
+    "response size exceeded",
+    "query returned more than",
+    "range is too large",
+]
+
+
+class TooManyResults(Exception):
+    pass
+
+
+class JsonRpcError(Exception):
+    pass
+
+
+def orderbook_log_filter(
+    extractors: Optional[List[NopExtractor]] = None,
+    only_known_platform: bool = True,
+) -> Tuple[Optional[List[str]], List[str]]:
+    """The union of the platform addresses and the orderbook topics of the
+    log-based extractors, the addresses are None if not `only_known_platform`.
+    """
+    if extractors is None:
+        import nop
+
+        extractors = [p() for p in nop.platforms]
+
+    addresses: Set[str] = set()
+    topics: Set[str] = set()
+    for extractor in extractors:
+        if extractor.extract_via_log() is not True:
+            continue
+        addresses.update(extractor._known_platform_apps().keys())
+        topics.update(extractor._allowed_orderbook_topics())
+    return (sorted(addresses) if only_known_platform else None), sorted(topics)
+
+
+def split_range(st_blknum: int, et_blknum: int, size: int) -> Iterator[Tuple[int, int]]:
+    for st in range(st_blknum, et_blknum + 1, size):
+        yield st, min(st + size - 1, et_blknum)
+
+
+def normalize_rpc_log(log: Dict) -> Dict:
+    """Convert an `eth_getLogs` log into the blockchain-etl style log."""
+    return dict(
+        address=to_normalized_address(log["address"]),
+        topics=log["topics"],
+        data=log["data"],
+        block_number=hex_to_dec(log["blockNumber"]),
+        block_hash=log.get("blockHash"),
+        transaction_hash=log["transactionHash"],
+        transaction_index=hex_to_dec(log["transactionIndex"]),
+        log_index=hex_to_dec(log["logIndex"]),
+        block_timestamp=hex_to_dec(log.get("blockTimestamp")),
+        removed=log.get("removed", False),
+    )
+
+
+class AsyncLogFetcher(object):
+    """Fetch the orderbook logs of a block range from a JSON-RPC node.
+
+    The addresses and topics are pushed down into `eth_getLogs`, the range is
+    split into `max_range` sized requests, at most `concurrency` in flight over
+    one reused session, and a request the node rejects with "too many results"
+    is halved and retried. The block timestamps are filled with batched
+    `eth_getBlockByNumber` calls, unless the node already returns them.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        addresses: Optional[List[str]] = None,
+        topics: Optional[List[str]] = None,
+        max_range: int = 2000,
+        concurrency: int = 8,
+        timeout: float = 60,
+        block_batch_size: int = 100,
+    ):
+        if topics is None:
+            addresses, topics = orderbook_log_filter()
+        self.url = url
+        self.addresses = addresses
+        self.topics = topics
+        self.max_range = max_range
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.block_batch_size = block_batch_size
+        self.requests = 0
+        self._request_id = 0
+
+    async def _call(self, session: "aiohttp.ClientSession", payload):
+        self.requests += 1
+        async with session.post(self.url, json=payload) as resp:
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+
+    def _payload(self, method: str, params: List) -> Dict:
+        self._request_id += 1
+        return dict(jsonrpc="2.0", id=self._request_id, method=method, params=params)
+
+    async def _get_logs(
+        self, session: "aiohttp.ClientSession", st_blknum: int, et_blknum: int
+    ) -> List[Dict]:
+        params = dict(fromBlock=hex(st_blknum), toBlock=hex(et_blknum))
+        if self.addresses is not None:
+            params["address"] = self.addresses
+        if len(self.topics) > 0:
+            params["topics"] = [self.topics]
+
+        result = await self._call(session, self._payload("eth_getLogs", [params]))
+        error = result.get("error")
+        if error is None:
+            return result["result"]
+
+        message = str(error.get("message", "")).lower()
+        if error.get("code") == -32005 or any(m in message for m in TOO_MANY_RESULTS):
+            if st_blknum == et_blknum:
+                raise TooManyResults(f"block {st_blknum}: {error}")
+            mid = (st_blknum + et_blknum) // 2
+            logger.debug(f"halve [{st_blknum}, {et_blknum}] on {error}")
+            left = await self._get_logs(session, st_blknum, mid)
+            right = await self._get_logs(session, mid + 1, et_blknum)
+            return left + right
+        raise JsonRpcError(f"eth_getLogs [{st_blknum}, {et_blknum}]: {error}")
+
+    async def _get_timestamps(
+        self, session: "aiohttp.ClientSession", blknums: List[int]
+    ) -> Dict[int, int]:
+        timestamps = dict()
+        for idx in range(0, len(blknums), self.block_batch_size):
+            payload = [
+                self._payload("eth_getBlockByNumber", [hex(n), False])
+                for n in blknums[idx : idx + self.block_batch_size]
+            ]
+            for result in await self._call(session, payload):
+                if result.get("error") is not None:
+                    raise JsonRpcError(f"eth_getBlockByNumber: {result['error']}")
+                block = result["result"]
+                timestamps[hex_to_dec(block["number"])] = hex_to_dec(block["timestamp"])
+        return timestamps
+
+    async def fetch(self, st_blknum: int, et_blknum: int) -> List[Dict]:
+        """The logs of [st_blknum, et_blknum], ordered by (block, log index)."""
+        import aiohttp
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as s:
+
+            async def get_logs(st, et):
+                async with semaphore:
+                    return await self._get_logs(s, st, et)
+
+            chunks = await asyncio.gather(
+                *[
+                    get_logs(st, et)
+                    for st, et in split_range(st_blknum, et_blknum, self.max_range)
+                ]
+            )
+            logs = [
+                normalize_rpc_log(log)
+                for chunk in chunks
+                for log in chunk
+                if not log.get("removed", False)
+            ]
+
+            missing = sorted(
+                set(e["block_number"] for e in logs if e["block_timestamp"] is None)
+            )
+            if len(missing) > 0:
+                timestamps = await self._get_timestamps(s, missing)
+                for log in logs:
+                    if log["block_timestamp"] is None:
+                        log["block_timestamp"] = timestamps[log["block_number"]]
+
+        logs.sort(key=lambda e: (e["block_number"], e["log_index"]))
+        return logs
+
+    def fetch_logs(self, st_blknum: int, et_blknum: int) -> List[Dict]:
+        return asyncio.run(self.fetch(st_blknum, et_blknum))
+
+    def fetch_orderbooks(
+        self,
+        st_blknum: int,
+        et_blknum: int,
+        extractors: Optional[List[NopExtractor]] = None,
+    ) -> Dict[str, List[Dict]]:
+        """Fetch the logs and extract them, the orderbooks keyed by platform."""
+        if extractors is None:
+            import nop
+
+            extractors = [p() for p in nop.platforms if p.extract_via_log() is True]
+
+        logs = self.fetch_logs(st_blknum, et_blknum)
+        return {
+            e.platform(): list(e.extract_orderbook_from_logs(logs)) for e in extractors
+        }
@@ -0,0 +1,71 @@
+# README: the orderbooks are COPY-ed into a session-local staging table, then merged
+# into the target on (txhash, order_logpos, xfer_logpos, pack_index), with NULLs
+# compared as equal, so that rerunning the same block range never duplicates rows.
+# The key has no unique index(NULLs never conflict), so the loaders of a table are
+# serialized by a transaction-level advisory lock on its name instead, otherwise two
+# concurrent loaders could both miss a key and insert it twice
+
+CREATE_STAGING_TEMPLATE = r"""
+CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS
+SELECT {columns} FROM {table} WITH NO DATA
+"""
+
+COPY_STAGING_TEMPLATE = r"""
+COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\N')
+"""
+
+LOCK_TABLE_TEMPLATE = r"""
+SELECT pg_advisory_xact_lock(hashtext('{table}'))
+"""
+
+UPDATE_FROM_STAGING_TEMPLATE = r"""
+UPDATE {table} AS t
+SET
+    {assignments},
+    updated_at = CURRENT_TIMESTAMP,
+    deleted_at = NULL
+FROM (
+    SELECT DISTINCT ON ({key}) {columns} FROM {staging}
+) AS s
+WHERE
+    {key_matched}
+"""
+
+INSERT_FROM_STAGING_TEMPLATE = r"""
+INSERT INTO {table} ({columns})
+SELECT DISTINCT ON ({key}) {columns}
+FROM {staging} AS s
+WHERE NOT EXISTS (
+    SELECT 1 FROM {table} AS t WHERE {key_matched}
+)
+"""
+
+TABLE_COLUMNS_TEMPLATE = r"""
+SELECT column_name
+FROM information_schema.columns
+WHERE table_schema = {schema} AND table_name = '{name}'
+"""
+
+# README: a reorg never deletes rows, the orderbooks gone with the replaced
+# blocks are tombstoned with `deleted_at`, and revived by the upsert above if
+# the transaction is mined again
+READ_BLOCKS_TEMPLATE = r"""
+SELECT {columns}
+FROM {table}
+WHERE
+    blknum IN ({blknums})
+    AND deleted_at IS NULL
+"""
+
+TOMBSTONE_FROM_STAGING_TEMPLATE = r"""
+UPDATE {table} AS t
+SET
+    updated_at = CURRENT_TIMESTAMP,
+    deleted_at = CURRENT_TIMESTAMP
+FROM (
+    SELECT DISTINCT {key} FROM {staging}
+) AS s
+WHERE
+    {key_matched}
+    AND t.deleted_at IS NULL
+"""
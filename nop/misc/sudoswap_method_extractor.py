@@ -1,6 +1,14 @@
-import pandas as pd
+import logging
+from typing import TYPE_CHECKING, Tuple
 from eth_abi.abi import decode_single
 
+from nop.utils import hex_to_decs
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
 PACK_GROUP_KEY = ["txhash", "trace_address"]
 SUDOSWAP_COLUMNS = [
     "_st",
@@ -20,13 +28,28 @@ SUDOSWAP_COLUMNS = [
 ]
 
 
-def _safe_explode(df: pd.DataFrame, column: str) -> pd.DataFrame:
+def _safe_explode(df: "pd.DataFrame", column: str) -> "pd.DataFrame":
+    import pandas as pd
+
     df = df.explode(column=column, ignore_index=True)
     df = df[pd.notna(df[column])]
     return df
 
 
-def _extract_orderbook_swapETHForSpecificNFTs(xf: pd.DataFrame) -> pd.DataFrame:
+def _decode_output(xf: "pd.DataFrame") -> Tuple["pd.DataFrame", "pd.Series"]:
+    # the uint256 `output` of the calls, the malformed ones are dropped
+    output, errors = hex_to_decs(xf["output"])
+    if errors > 0:
+        malformed = output.apply(lambda x: isinstance(x, str))
+        logger.warning(
+            f"drop {errors} calls of malformed output, "
+            f"txhash: {xf.loc[malformed, 'txhash'].tolist()}"
+        )
+        xf, output = xf[~malformed].copy(), output[~malformed]
+    return xf, output
+
+
+def _extract_orderbook_swapETHForSpecificNFTs(xf: "pd.DataFrame") -> "pd.DataFrame":
     # {
     #   "inputs": [
     #     {
@@ -46,7 +69,8 @@ def _extract_orderbook_swapETHForSpecificNFTs(xf: pd.DataFrame) -> pd.DataFrame:
     #   "stateMutability": "payable",
     #   "type": "function",
     # }
-    xf["price"] = xf.apply(lambda row: row["value"] - int(row["output"], 16), axis=1)
+    xf, output = _decode_output(xf)
+    xf["price"] = xf["value"] - output
     xf["to_address"] = xf["_out"].apply(lambda x: x["nftRecipient"])
     xf["swapList"] = xf["_out"].apply(lambda x: x["swapList"])
     xf = _safe_explode(xf, "swapList")
@@ -58,7 +82,7 @@ def _extract_orderbook_swapETHForSpecificNFTs(xf: pd.DataFrame) -> pd.DataFrame:
     return xf
 
 
-def _extract_orderbook_swapNFTsForToken(xf: pd.DataFrame) -> pd.DataFrame:
+def _extract_orderbook_swapNFTsForToken(xf: "pd.DataFrame") -> "pd.DataFrame":
     # {
     #   "inputs": [
     #     {
@@ -78,7 +102,8 @@ def _extract_orderbook_swapNFTsForToken(xf: pd.DataFrame) -> pd.DataFrame:
     #   "stateMutability": "nonpayable",
     #   "type": "function",
     # }
-    xf["price"] = xf.apply(lambda row: int(row["output"], 16), axis=1)
+    xf, output = _decode_output(xf)
+    xf["price"] = output
     xf["from_address"] = xf["_out"].apply(lambda x: x["tokenRecipient"])
     xf["swapList"] = xf["_out"].apply(lambda x: x["swapList"])
     xf = _safe_explode(xf, "swapList")
@@ -90,7 +115,9 @@ def _extract_orderbook_swapNFTsForToken(xf: pd.DataFrame) -> pd.DataFrame:
     return xf
 
 
-def _extract_orderbook_robustSwapETHForSpecificNFTs(xf: pd.DataFrame) -> pd.DataFrame:
+def _extract_orderbook_robustSwapETHForSpecificNFTs(
+    xf: "pd.DataFrame",
+) -> "pd.DataFrame":
     # {
     #   "inputs": [
     #     {
@@ -117,7 +144,8 @@ def _extract_orderbook_robustSwapETHForSpecificNFTs(xf: pd.DataFrame) -> pd.Data
     #   "stateMutability": "payable",
     #   "type": "function",
     # }
-    xf["price"] = xf.apply(lambda row: row["value"] - int(row["output"], 16), axis=1)
+    xf, output = _decode_output(xf)
+    xf["price"] = xf["value"] - output
     xf["to_address"] = xf["_out"].apply(lambda x: x["nftRecipient"])
     xf["swapList"] = xf["_out"].apply(lambda x: x["swapList"])
     xf = _safe_explode(xf, "swapList")
@@ -129,7 +157,7 @@ def _extract_orderbook_robustSwapETHForSpecificNFTs(xf: pd.DataFrame) -> pd.Data
     return xf
 
 
-def _extract_orderbook_robustSwapNFTsForToken(xf: pd.DataFrame) -> pd.DataFrame:
+def _extract_orderbook_robustSwapNFTsForToken(xf: "pd.DataFrame") -> "pd.DataFrame":
     # {
     #   "inputs": [
     #     {
@@ -155,7 +183,8 @@ def _extract_orderbook_robustSwapNFTsForToken(xf: pd.DataFrame) -> pd.DataFrame:
     #   "stateMutability": "nonpayable",
     #   "type": "function",
     # }
-    xf["price"] = xf.apply(lambda row: int(row["output"], 16), axis=1)
+    xf, output = _decode_output(xf)
+    xf["price"] = output
     xf["from_address"] = xf["_out"].apply(lambda x: x["tokenRecipient"])
     xf["swapList"] = xf["_out"].apply(lambda x: x["swapList"])
     xf = _safe_explode(xf, "swapList")
@@ -168,8 +197,8 @@ def _extract_orderbook_robustSwapNFTsForToken(xf: pd.DataFrame) -> pd.DataFrame:
 
 
 def _extract_orderbook_robustSwapETHForSpecificNFTsAndNFTsToToken(
-    xf: pd.DataFrame,
-) -> pd.DataFrame:
+    xf: "pd.DataFrame",
+) -> "pd.DataFrame":
     # {
     #   "inputs": [
     #     {
@@ -221,6 +250,8 @@ def _extract_orderbook_robustSwapETHForSpecificNFTsAndNFTsToToken(
     #   "type": "function",
     # }
 
+    import pandas as pd
+
     # Tips:
     # user maybe provider partial arguments, in this case eg:
     #   https://cn.etherscan.com/tx/0xb7fe3c4b0dab6965747addec53913c737831e83667f54515dc8ee4c8ea1cca78
@@ -0,0 +1,114 @@
+import logging
+import sys
+from typing import Dict, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+# README: Postgres' query_canceled(statement_timeout) and out_of_memory
+RETRY_PGCODES = {"57014", "53200"}
+
+
+def is_db_overload(exc: BaseException) -> bool:
+    """Whether `exc` is a statement timeout or out of memory of the database."""
+    # SQLAlchemy is only loaded with the trace platforms, check it lazily
+    sa_exc = sys.modules.get("sqlalchemy.exc")
+    if sa_exc is None or not isinstance(exc, sa_exc.OperationalError):
+        return False
+    return getattr(exc.orig, "pgcode", None) in RETRY_PGCODES
+
+
+class AdaptiveBatchSize(object):
+    """Size the block range of the next batch from the batches observed so far.
+
+    The per-block latency, orders and merge bytes(see `tx_costs`) are tracked
+    as moving averages, the next size is the largest one expected to stay
+    under `target_latency`(seconds), and under `memory_target`(bytes) and
+    `orders_target`(orders per batch) if given. A size
+    grows at most `max_growth` times per batch, but shrinks right away, so a
+    quiet period ramps up gradually and a burst of mints or sweeps is cut at
+    the next batch.
+
+    A batch failed with one of `retry_on`, or with a statement timeout or out
+    of memory of the traces query(see `is_db_overload`), is retried by the
+    runner at half the size.
+    """
+
+    def __init__(
+        self,
+        initial: int = 100,
+        min_size: int = 1,
+        max_size: int = 10000,
+        target_latency: float = 30.0,
+        memory_target: Optional[int] = None,
+        orders_target: Optional[int] = None,
+        smoothing: float = 0.5,
+        max_growth: float = 2.0,
+        retry_on: Tuple[Type[BaseException], ...] = (MemoryError, TimeoutError),
+    ):
+        assert 1 <= min_size <= initial <= max_size
+        assert 0 < smoothing <= 1 and max_growth > 1
+
+        self.size = initial
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.memory_target = memory_target
+        self.orders_target = orders_target
+        self.smoothing = smoothing
+        self.max_growth = max_growth
+        self.retry_on = retry_on
+
+        # moving averages per block
+        self.latency: Optional[float] = None
+        self.orders: Optional[float] = None
+        self.merge_bytes: Optional[float] = None
+
+    def _average(self, prev: Optional[float], value: float) -> float:
+        if prev is None:
+            return value
+        return prev + self.smoothing * (value - prev)
+
+    def _clamp(self, size: float) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def observe(self, blocks: int, elapsed: float, stats: Optional[Dict] = None):
+        """Record a completed batch of `blocks` blocks, returns the next size.
+
+        `stats` is filled by `calculate_platform_batches`, with the `orders`
+        and `merge_bytes` of the batch.
+        """
+        stats = stats or {}
+        self.latency = self._average(self.latency, elapsed / blocks)
+        self.orders = self._average(self.orders, stats.get("orders", 0) / blocks)
+        self.merge_bytes = self._average(
+            self.merge_bytes, stats.get("merge_bytes", 0) / blocks
+        )
+
+        limits = [self.size * self.max_growth]
+        if self.latency > 0:
+            limits.append(self.target_latency / self.latency)
+        if self.memory_target is not None and self.merge_bytes > 0:
+            limits.append(self.memory_target / self.merge_bytes)
+        if self.orders_target is not None and self.orders > 0:
+            limits.append(self.orders_target / self.orders)
+
+        size = self._clamp(min(limits))
+        if size != self.size:
+            logger.info(
+                f"batch size {self.size} -> {size}, per block: "
+                f"{self.latency:.3f}s #{self.orders:.1f} orders "
+                f"{self.merge_bytes:.0f} merge bytes"
+            )
+        self.size = size
+        return size
+
+    def should_retry(self, exc: BaseException) -> bool:
+        return isinstance(exc, self.retry_on) or is_db_overload(exc)
+
+    def backoff(self) -> bool:
+        """Halve the size after a failed batch, False if it's already the minimum."""
+        if self.size <= self.min_size:
+            return False
+        self.size = self._clamp(self.size // 2)
+        logger.info(f"batch failed, back off the batch size to {self.size}")
+        return True
@@ -0,0 +1,306 @@
+import logging
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+from nop.extractor.context import BatchContext, tx_costs
+from nop.extractor.extractor import NopExtractor
+from nop.runner.checkpoint import Checkpoint
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from sqlalchemy.engine import Engine
+
+    from nop.runner.adaptive import AdaptiveBatchSize
+    from nop.storage.result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_extractors(
+    extractors: Optional[List[NopExtractor]], db_engine: Optional["Engine"]
+) -> List[NopExtractor]:
+    """All the platforms by default, the trace platforms need the `db_engine`.
+
+    Without an engine, the default trace platforms are left out with a
+    warning, but passing one explicitly is an error: its blocks would be
+    checkpointed as done without its orderbooks.
+    """
+    if extractors is not None:
+        if db_engine is None:
+            traced = [
+                e.platform() for e in extractors if e.extract_via_log() is not True
+            ]
+            if len(traced) > 0:
+                raise ValueError(f"the trace platforms {traced} need a db_engine")
+        return extractors
+
+    import nop
+
+    extractors = [p() for p in nop.platforms]
+    if db_engine is None:
+        traced = [e.platform() for e in extractors if e.extract_via_log() is not True]
+        if len(traced) > 0:
+            logger.warning(f"no db_engine, skip the trace platforms {traced}")
+        extractors = [e for e in extractors if e.extract_via_log() is True]
+    return extractors
+
+
+def split_block_range(
+    start: int, end: int, chunk_size: int
+) -> Iterator[Tuple[int, int]]:
+    for st in range(start, end + 1, chunk_size):
+        yield st, min(st + chunk_size - 1, end)
+
+
+def calculate_platform_batches(
+    extractors: List[NopExtractor],
+    batch: Dict,
+    db_engine: Optional["Engine"] = None,
+    memory_budget: Optional[int] = None,
+    stats: Optional[Dict] = None,
+) -> List["pd.DataFrame"]:
+    """Extract and calculate the orderbooks of each extractor in one batch.
+
+    `batch` holds the `logs` and the `blocks`(number, timestamp and
+    transaction_count, only for the trace platforms) of the block range, and
+    its `tx_df`, `tf_df` and `ef_df` frames, as `NopExtractor.calculate` takes.
+    The platforms already extracted, e.g. from the traces, may be passed in its
+    `orderbooks`, keyed by platform. Returns one frame per extractor, in the
+    same order.
+
+    If `stats` is given, the extract and calculate seconds, the number of
+    orders and their estimated merge bytes are added to it.
+    """
+    import pandas as pd
+
+    if stats is not None:
+        for key in ("extract", "calculate", "orders", "merge_bytes"):
+            stats.setdefault(key, 0)
+
+    ctx = BatchContext(batch["tx_df"], batch["tf_df"], batch["ef_df"])
+    extracted = batch.get("orderbooks") or {}
+    dfs = []
+    for extractor in extractors:
+        st = perf_counter()
+        orderbooks = extracted.get(extractor.platform())
+        if orderbooks is None:
+            orderbooks = list(
+                extractor.extract_orderbooks(
+                    batch.get("logs", []),
+                    db_engine=db_engine,
+                    block_range=batch.get("blocks"),
+                )
+            )
+        ob_df = pd.DataFrame(orderbooks)
+        if stats is not None:
+            stats["extract"] += perf_counter() - st
+            stats["orders"] += len(ob_df)
+            if not ob_df.empty:
+                stats["merge_bytes"] += float(tx_costs(ctx, ob_df).sum())
+
+        st = perf_counter()
+        dfs.append(extractor.calculate_batch(ctx, ob_df, memory_budget))
+        if stats is not None:
+            stats["calculate"] += perf_counter() - st
+    return dfs
+
+
+def _concat(dfs: List["pd.DataFrame"]) -> "pd.DataFrame":
+    import pandas as pd
+
+    dfs = [df for df in dfs if not df.empty]
+    if len(dfs) == 0:
+        return pd.DataFrame()
+    return pd.concat(dfs, ignore_index=True)
+
+
+def calculate_block_batch(
+    extractors: List[NopExtractor],
+    batch: Dict,
+    db_engine: Optional["Engine"] = None,
+    memory_budget: Optional[int] = None,
+) -> "pd.DataFrame":
+    """Extract and calculate the orderbooks of all the extractors in one batch."""
+    return _concat(
+        calculate_platform_batches(extractors, batch, db_engine, memory_budget)
+    )
+
+
+class BackfillRunner(object):
+    """Backfill the orderbooks of [start, end] chunk by chunk, resumable.
+
+    For each chunk of `chunk_size` blocks, `fetch(st_blknum, et_blknum)` loads
+    the batch(see `calculate_block_batch`), the orderbooks are calculated and
+    handed to `write`, e.g. `ParquetOrderbookWriter.write` or
+    `PostgresOrderbookLoader.load`. Only then the chunk is checkpointed, a
+    restarted runner skips the completed chunks and retries the failed one.
+
+    With a `result_cache`, the platforms whose code didn't change are served
+    from it, and a chunk is only fetched if some platform missed. The cache is
+    keyed by the exact chunk, keep the same `chunk_size` across the runs.
+
+    With a `batch_size`, the chunks are sized by it instead of `chunk_size`,
+    from the latency and the orders of the chunks done so far. The chunks
+    differ from run to run, so it can't be combined with a `result_cache`.
+    """
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        chunk_size: int,
+        checkpoint_path: str,
+        fetch: Callable[[int, int], Dict],
+        write: Callable[["pd.DataFrame"], object],
+        extractors: Optional[List[NopExtractor]] = None,
+        db_engine: Optional["Engine"] = None,
+        memory_budget: Optional[int] = None,
+        result_cache: Optional["ResultCache"] = None,
+        batch_size: Optional["AdaptiveBatchSize"] = None,
+    ):
+        if result_cache is not None and batch_size is not None:
+            raise ValueError(
+                "result_cache is keyed by the exact chunks, "
+                "it never hits with the adaptive batch_size"
+            )
+        extractors = resolve_extractors(extractors, db_engine)
+
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.fetch = fetch
+        self.write = write
+        self.extractors = extractors
+        self.db_engine = db_engine
+        self.memory_budget = memory_budget
+        self.result_cache = result_cache
+        self.batch_size = batch_size
+
+    def pending_chunks(self) -> List[Tuple[int, int]]:
+        """The chunks less their completed blocks, e.g. of a run resumed with
+        another `chunk_size`."""
+        chunks = []
+        for st, et in split_block_range(self.start, self.end, self.chunk_size):
+            while True:
+                chunk = self.next_chunk(st, et - st + 1)
+                if chunk is None or chunk[0] > et:
+                    break
+                chunk = (chunk[0], min(chunk[1], et))
+                chunks.append(chunk)
+                st = chunk[1] + 1
+        return chunks
+
+    def skipped_chunks(self) -> int:
+        if self.batch_size is not None:
+            # the completed ranges are skipped as a whole, count them as the chunks
+            return sum(
+                1
+                for s, e in self.checkpoint.ranges
+                if s <= self.end and e >= self.start
+            )
+        return sum(
+            1
+            for st, et in split_block_range(self.start, self.end, self.chunk_size)
+            if self.checkpoint.is_done(st, et)
+        )
+
+    def next_chunk(self, st_blknum: int, size: int) -> Optional[Tuple[int, int]]:
+        """The next uncompleted chunk of at most `size` blocks from `st_blknum`."""
+        # the checkpoint ranges are sorted and merged
+        for s, e in self.checkpoint.ranges:
+            if s <= st_blknum <= e:
+                st_blknum = e + 1
+        if st_blknum > self.end:
+            return None
+
+        et_blknum = min(st_blknum + size - 1, self.end)
+        for s, _ in self.checkpoint.ranges:
+            if st_blknum < s <= et_blknum:
+                et_blknum = s - 1
+        return st_blknum, et_blknum
+
+    def _run_chunk(self, st: int, et: int, stats: Dict):
+        chunk_time = time()
+        chunk_stats: Dict = {}
+        df = self.calculate_chunk(st, et, chunk_stats)
+        if not df.empty:
+            self.write(df)
+        self.checkpoint.mark_done(st, et)
+
+        elapsed = time() - chunk_time
+        if self.batch_size is not None:
+            self.batch_size.observe(et - st + 1, elapsed, chunk_stats)
+
+        stats["chunks"] += 1
+        stats["rows"] += len(df)
+        logger.info(
+            f"backfill [{st}, {et}] with #{len(df)} orderbooks in {elapsed:.3f}s"
+        )
+
+    def run(self) -> Dict:
+        stats = dict(chunks=0, skipped=0, rows=0, elapsed=0.0)
+        st_time = time()
+        if self.batch_size is not None:
+            self._run_adaptive(stats)
+            stats["elapsed"] = time() - st_time
+            return stats
+
+        chunks = self.pending_chunks()
+        stats["skipped"] = self.skipped_chunks()
+        if stats["skipped"] > 0:
+            logger.info(f"resume backfill, skip {stats['skipped']} completed chunks")
+
+        for st, et in chunks:
+            self._run_chunk(st, et, stats)
+        stats["elapsed"] = time() - st_time
+        return stats
+
+    def _run_adaptive(self, stats: Dict):
+        stats["skipped"] = self.skipped_chunks()
+        st_blknum = self.start
+        while True:
+            chunk = self.next_chunk(st_blknum, self.batch_size.size)
+            if chunk is None:
+                break
+            try:
+                self._run_chunk(chunk[0], chunk[1], stats)
+            except Exception as e:
+                if self.batch_size.should_retry(e) and self.batch_size.backoff():
+                    continue
+                raise
+            st_blknum = chunk[1] + 1
+
+    def calculate_chunk(
+        self, st_blknum: int, et_blknum: int, stats: Optional[Dict] = None
+    ) -> "pd.DataFrame":
+        """Calculate the orderbooks of one chunk, see `calculate_platform_batches`."""
+        if self.result_cache is None:
+            return _concat(
+                calculate_platform_batches(
+                    self.extractors,
+                    self.fetch(st_blknum, et_blknum),
+                    self.db_engine,
+                    self.memory_budget,
+                    stats,
+                )
+            )
+
+        cache = self.result_cache
+        dfs = [cache.get(e, st_blknum, et_blknum) for e in self.extractors]
+        missed = [e for e, df in zip(self.extractors, dfs) if df is None]
+        if len(missed) > 0:
+            calculated = iter(
+                calculate_platform_batches(
+                    missed,
+                    self.fetch(st_blknum, et_blknum),
+                    self.db_engine,
+                    self.memory_budget,
+                    stats,
+                )
+            )
+            for idx, extractor in enumerate(self.extractors):
+                if dfs[idx] is None:
+                    dfs[idx] = next(calculated)
+                    cache.put(extractor, st_blknum, et_blknum, dfs[idx])
+        return _concat(dfs)
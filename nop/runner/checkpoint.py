@@ -0,0 +1,42 @@
+import json
+import os
+from typing import List, Tuple
+
+
+class Checkpoint(object):
+    """The completed [start, end] block ranges of a backfill, persisted as json.
+
+    The ranges are kept merged, a chunk is done only if it's fully covered, so
+    the backfill resumes at the same block even if the chunk size changed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ranges: List[Tuple[int, int]] = []
+        if os.path.exists(path):
+            with open(path) as f:
+                self.ranges = [tuple(r) for r in json.load(f)["done"]]
+
+    def is_done(self, start: int, end: int) -> bool:
+        return any(s <= start and end <= e for s, e in self.ranges)
+
+    def mark_done(self, start: int, end: int):
+        ranges = sorted(self.ranges + [(start, end)])
+        merged = [ranges[0]]
+        for s, e in ranges[1:]:
+            last_s, last_e = merged[-1]
+            if s <= last_e + 1:
+                merged[-1] = (last_s, max(last_e, e))
+            else:
+                merged.append((s, e))
+        self.ranges = merged
+        self._save()
+
+    def _save(self):
+        # write aside then swap, a crash never leaves a truncated checkpoint
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(done=[list(r) for r in self.ranges]), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
@@ -0,0 +1,179 @@
+import bisect
+import logging
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from nop.extractor.context import group_transfer_records
+from nop.extractor.extractor import NopExtractor
+from nop.runner.backfill import resolve_extractors
+from nop.runner.checkpoint import Checkpoint
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# 1ms .. ~16s, doubling
+DEFAULT_BUCKETS = [0.001 * 2**i for i in range(15)]
+
+
+class LatencyHistogram(object):
+    """Count latencies(seconds) into fixed buckets, cheap enough per block.
+
+    A percentile is reported as the upper bound of the bucket it falls into,
+    the latencies over the last bucket are counted as the max seen.
+    """
+
+    def __init__(self, buckets: Optional[List[float]] = None):
+        self.buckets = sorted(buckets or DEFAULT_BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, elapsed: float):
+        self.counts[bisect.bisect_left(self.buckets, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def percentile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank, seen = q / 100 * self.count, 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                if idx < len(self.buckets):
+                    return min(self.buckets[idx], self.max)
+                break
+        return self.max
+
+    def as_dict(self) -> Dict:
+        return dict(
+            count=self.count,
+            mean=self.total / self.count if self.count > 0 else 0.0,
+            p50=self.percentile(50),
+            p99=self.percentile(99),
+            max=self.max,
+        )
+
+
+def calculate_block_records(
+    extractors: List[NopExtractor],
+    block: Dict,
+    db_engine: Optional["Engine"] = None,
+) -> List[Dict]:
+    """Extract and calculate the orderbooks of one block, as records.
+
+    `block` holds the `logs`, and the `txs`, `tf_records` and `ef_records` of
+    the block as lists of dicts, in the columns of the `tx_df`, `tf_df` and
+    `ef_df` frames(and the `blocks` for the trace platforms, see
+    `calculate_platform_batches`). The platforms without a record path(see
+    `NopExtractor.calculate_records`) fall back to `calculate`.
+    """
+    txs = {tx["txhash"]: tx for tx in block.get("txs") or []}
+    xfers = group_transfer_records(block.get("tf_records"), block.get("ef_records"))
+
+    records = []
+    for extractor in extractors:
+        orders = list(
+            extractor.extract_orderbooks(
+                block.get("logs", []),
+                db_engine=db_engine,
+                block_range=block.get("blocks"),
+            )
+        )
+        if len(orders) == 0:
+            continue
+
+        calculated = extractor.calculate_records(txs, orders, xfers)
+        if calculated is None:
+            import pandas as pd
+
+            calculated = extractor.calculate(
+                pd.DataFrame(block.get("txs") or []),
+                pd.DataFrame(orders),
+                pd.DataFrame(block.get("tf_records") or []),
+                pd.DataFrame(block.get("ef_records") or []),
+            ).to_dict("records")
+        records.extend(calculated)
+    return records
+
+
+class LiveTailRunner(object):
+    """Follow the chain head block by block, with a per-block latency histogram.
+
+    `fetch_block(blknum)` returns the block(see `calculate_block_records`), or
+    None if it's not there yet, then it's polled again after `poll_interval`
+    seconds. The orderbook records of each block are handed to `write`, even
+    if empty. With a `checkpoint_path`, a restarted runner continues after the
+    last written block.
+
+    The `fetch`, `calculate`, `write` and `total` histograms are in `latency`.
+    """
+
+    def __init__(
+        self,
+        start: int,
+        fetch_block: Callable[[int], Optional[Dict]],
+        write: Callable[[List[Dict]], object],
+        extractors: Optional[List[NopExtractor]] = None,
+        db_engine: Optional["Engine"] = None,
+        checkpoint_path: Optional[str] = None,
+        poll_interval: float = 0.5,
+    ):
+        extractors = resolve_extractors(extractors, db_engine)
+
+        self.checkpoint = None
+        if checkpoint_path is not None:
+            self.checkpoint = Checkpoint(checkpoint_path)
+            done = [e for s, e in self.checkpoint.ranges if s <= start <= e]
+            if len(done) > 0:
+                start = done[0] + 1
+
+        self.next_blknum = start
+        self.fetch_block = fetch_block
+        self.write = write
+        self.extractors = extractors
+        self.db_engine = db_engine
+        self.poll_interval = poll_interval
+        self.latency = {
+            k: LatencyHistogram() for k in ("fetch", "calculate", "write", "total")
+        }
+
+    def process_block(self) -> Optional[List[Dict]]:
+        """Process the next block, None if it's not there yet."""
+        blknum = self.next_blknum
+
+        st = perf_counter()
+        block = self.fetch_block(blknum)
+        if block is None:
+            return None
+        fetched = perf_counter()
+        records = calculate_block_records(self.extractors, block, self.db_engine)
+        calculated = perf_counter()
+        self.write(records)
+        if self.checkpoint is not None:
+            self.checkpoint.mark_done(blknum, blknum)
+        written = perf_counter()
+
+        self.latency["fetch"].observe(fetched - st)
+        self.latency["calculate"].observe(calculated - fetched)
+        self.latency["write"].observe(written - calculated)
+        self.latency["total"].observe(written - st)
+        self.next_blknum = blknum + 1
+        return records
+
+    def run(self, until: Optional[int] = None):
+        """Follow the head, up to the `until` block(inclusive) if given."""
+        while until is None or self.next_blknum <= until:
+            if self.process_block() is None:
+                sleep(self.poll_interval)
+                continue
+            if self.latency["total"].count % 100 == 0:
+                logger.info(
+                    f"live at block {self.next_blknum - 1}, "
+                    f"latency: {self.latency['total'].as_dict()}"
+                )
+        return {k: v.as_dict() for k, v in self.latency.items()}
@@ -0,0 +1,321 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from nop.extractor.extractor import NopExtractor
+from nop.runner.backfill import (
+    BackfillRunner,
+    calculate_platform_batches,
+    _concat,
+)
+
+logger = logging.getLogger(__name__)
+
+# marks the end of a stage's output
+_DONE = object()
+
+
+class StageStats(object):
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.wait_input = 0.0  # starved, the upstream is slower
+        self.wait_output = 0.0  # blocked by the backpressure of the downstream
+        self._lock = threading.Lock()
+
+    def add_busy(self, elapsed: float):
+        with self._lock:
+            self.items += 1
+            self.busy += elapsed
+
+    def utilization(self, wall: float) -> float:
+        if wall <= 0:
+            return 0.0
+        return self.busy / (wall * self.workers)
+
+    def as_dict(self, wall: float) -> Dict:
+        return dict(
+            items=self.items,
+            busy=self.busy,
+            wait_input=self.wait_input,
+            wait_output=self.wait_output,
+            utilization=self.utilization(wall),
+        )
+
+
+def _calculate_missed(
+    extractors: List[NopExtractor], batch: Dict, memory_budget: Optional[int]
+):
+    # runs in the worker process, the trace platforms were extracted upstream
+    st, stats = perf_counter(), {}
+    dfs = calculate_platform_batches(extractors, batch, None, memory_budget, stats)
+    return dfs, perf_counter() - st, stats
+
+
+class PipelineRunner(BackfillRunner):
+    """A `BackfillRunner` overlapping fetch, calculate and write.
+
+    The fetch and write stages run on their own threads(I/O bound), the
+    extraction and calculation of the log platforms in a pool of `workers`
+    processes(CPU bound, `workers=0` calculates in a thread). The stages are
+    connected by queues of at most `queue_size` chunks, so a slow stage holds
+    back the stages before it instead of piling up batches in memory. The
+    chunks are written and checkpointed in order.
+
+    With a `batch_size`, the fetch stage sizes the next chunk from the fetch
+    and calculate latency of the chunks written so far(lagging the chunks in
+    flight). A chunk failed with a retryable error(see
+    `AdaptiveBatchSize.should_retry`) is redone by the write stage in place,
+    at the backed off size, so the chunks are still written in order.
+
+    `run` returns the per-stage items, busy/wait seconds and utilization.
+    """
+
+    def __init__(self, *args, workers: Optional[int] = None, queue_size=2, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue_size = queue_size
+
+    def _executor(self) -> Executor:
+        if self.workers == 0:
+            return ThreadPoolExecutor(max_workers=1)
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def _put(self, q: queue.Queue, item, stats: StageStats, stop: threading.Event):
+        st = perf_counter()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.wait_output += perf_counter() - st
+
+    def _get(self, q: queue.Queue, stats: StageStats, stop: threading.Event):
+        st = perf_counter()
+        while not stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        else:
+            item = _DONE
+        stats.wait_input += perf_counter() - st
+        return item
+
+    def _iter_chunks(self, chunks):
+        if self.batch_size is None:
+            yield from chunks
+            return
+
+        st_blknum = self.start
+        while True:
+            chunk = self.next_chunk(st_blknum, self.batch_size.size)
+            if chunk is None:
+                return
+            yield chunk
+            st_blknum = chunk[1] + 1
+
+    def _should_retry(self, exc: BaseException) -> bool:
+        return self.batch_size is not None and self.batch_size.should_retry(exc)
+
+    def _fetch_chunk(self, st: int, et: int, missed: List[NopExtractor]) -> Dict:
+        batch = self.fetch(st, et)
+        # the trace platforms read the database, extract them here
+        orderbooks = dict(batch.get("orderbooks") or {})
+        for e in missed:
+            if e.extract_via_log() is not True:
+                orderbooks[e.platform()] = list(
+                    e.extract_orderbooks(
+                        [],
+                        db_engine=self.db_engine,
+                        block_range=batch.get("blocks"),
+                    )
+                )
+        return dict(batch, orderbooks=orderbooks)
+
+    def _fetch_stage(self, chunks, out_q, stats, stop, errors):
+        try:
+            for st, et in self._iter_chunks(chunks):
+                if stop.is_set():
+                    break
+                start = perf_counter()
+                cached = [None] * len(self.extractors)
+                if self.result_cache is not None:
+                    cached = [self.result_cache.get(e, st, et) for e in self.extractors]
+                missed = [e for e, df in zip(self.extractors, cached) if df is None]
+
+                batch = None
+                if len(missed) > 0:
+                    try:
+                        batch = self._fetch_chunk(st, et, missed)
+                    except Exception as e:
+                        if not self._should_retry(e):
+                            raise
+                        # hand it down, it's redone in order by the write stage
+                        batch = e
+                elapsed = perf_counter() - start
+                stats.add_busy(elapsed)
+                self._put(out_q, (st, et, elapsed, cached, missed, batch), stats, stop)
+        except BaseException as e:
+            # end the stream, the chunks already queued are still written
+            errors.append(e)
+        finally:
+            self._put(out_q, _DONE, stats, stop)
+
+    def _submit_stage(self, executor, in_q, out_q, stats, stop, errors):
+        # submit in order, the futures queue bounds the chunks in flight
+        try:
+            while True:
+                item = self._get(in_q, stats, stop)
+                if item is _DONE:
+                    break
+                st, et, elapsed, cached, missed, batch = item
+                future = None
+                if isinstance(batch, BaseException):
+                    future = batch
+                elif len(missed) > 0:
+                    future = executor.submit(
+                        _calculate_missed, missed, batch, self.memory_budget
+                    )
+                self._put(out_q, (st, et, elapsed, cached, missed, future), stats, stop)
+        except BaseException as e:
+            # end the stream, the chunks already queued are still written
+            errors.append(e)
+        finally:
+            self._put(out_q, _DONE, stats, stop)
+
+    def _write_stage(self, in_q, calc_stats, write_stats, stop, errors, result):
+        try:
+            while True:
+                item = self._get(in_q, write_stats, stop)
+                if item is _DONE:
+                    break
+                st, et, elapsed, cached, missed, future = item
+
+                if isinstance(future, BaseException):
+                    self._redo_smaller(st, et, future, result)
+                    continue
+
+                dfs, chunk_stats = list(cached), {}
+                if future is not None:
+                    wait_st = perf_counter()
+                    try:
+                        calculated, calc_elapsed, chunk_stats = future.result()
+                    except Exception as e:
+                        if not self._should_retry(e):
+                            raise
+                        self._redo_smaller(st, et, e, result)
+                        continue
+                    write_stats.wait_input += perf_counter() - wait_st
+                    calc_stats.add_busy(calc_elapsed)
+                    elapsed += calc_elapsed
+                    calculated = iter(calculated)
+                    for idx, extractor in enumerate(self.extractors):
+                        if dfs[idx] is None:
+                            dfs[idx] = next(calculated)
+                            if self.result_cache is not None:
+                                self.result_cache.put(extractor, st, et, dfs[idx])
+
+                start = perf_counter()
+                df = _concat(dfs)
+                if not df.empty:
+                    self.write(df)
+                self.checkpoint.mark_done(st, et)
+                write_stats.add_busy(perf_counter() - start)
+                if self.batch_size is not None:
+                    self.batch_size.observe(et - st + 1, elapsed, chunk_stats)
+
+                result["chunks"] += 1
+                result["rows"] += len(df)
+                logger.info(f"pipeline [{st}, {et}] with #{len(df)} orderbooks")
+        except BaseException as e:
+            # nothing could be written any more, stop the upstream stages
+            errors.append(e)
+            stop.set()
+
+    def _redo_smaller(self, st: int, et: int, error: BaseException, result: Dict):
+        # redo [st, et] right here, in chunks of the backed off size
+        while st <= et:
+            if not self.batch_size.backoff():
+                raise error
+            try:
+                while st <= et:
+                    sub_et = min(st + self.batch_size.size - 1, et)
+                    self._run_chunk(st, sub_et, result)
+                    st = sub_et + 1
+            except Exception as e:
+                if not self._should_retry(e):
+                    raise
+                error = e
+
+    def run(self) -> Dict:
+        # with a batch_size, the chunks are sized on the fly by _iter_chunks
+        chunks = self.pending_chunks() if self.batch_size is None else []
+        result = dict(chunks=0, skipped=self.skipped_chunks(), rows=0, elapsed=0.0)
+
+        fetched_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        futures_q: queue.Queue = queue.Queue(maxsize=max(self.workers, 1))
+        stats = dict(
+            fetch=StageStats("fetch"),
+            submit=StageStats("submit"),
+            calculate=StageStats("calculate", max(self.workers, 1)),
+            write=StageStats("write"),
+        )
+        stop, errors = threading.Event(), []
+
+        wall_st = perf_counter()
+        with self._executor() as executor:
+            threads = [
+                threading.Thread(
+                    target=self._fetch_stage,
+                    args=(chunks, fetched_q, stats["fetch"], stop, errors),
+                ),
+                threading.Thread(
+                    target=self._submit_stage,
+                    args=(
+                        executor,
+                        fetched_q,
+                        futures_q,
+                        stats["submit"],
+                        stop,
+                        errors,
+                    ),
+                ),
+                threading.Thread(
+                    target=self._write_stage,
+                    args=(
+                        futures_q,
+                        stats["calculate"],
+                        stats["write"],
+                        stop,
+                        errors,
+                        result,
+                    ),
+                ),
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        wall = perf_counter() - wall_st
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        result["elapsed"] = wall
+        result["stages"] = {k: v.as_dict(wall) for k, v in stats.items()}
+        for name, stage in result["stages"].items():
+            logger.info(
+                f"stage {name}: #{stage['items']} utilization {stage['utilization']:.0%}"
+                f" busy {stage['busy']:.3f}s wait input {stage['wait_input']:.3f}s"
+                f" output {stage['wait_output']:.3f}s"
+            )
+        return result
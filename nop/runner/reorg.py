@@ -0,0 +1,122 @@
+import logging
+import numbers
+from time import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from nop.columns import ORDERBOOK_COLUMNS, ORDERBOOK_UNIQUE_COLUMNS
+from nop.extractor.extractor import NopExtractor
+from nop.runner.backfill import resolve_extractors
+from nop.runner.live import calculate_block_records
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from sqlalchemy.engine import Engine
+
+    from nop.storage.postgres import PostgresOrderbookLoader
+
+logger = logging.getLogger(__name__)
+
+
+def _keys(df: "pd.DataFrame") -> "pd.DataFrame":
+    # the stored and the calculated frames may differ in the dtypes of the keys
+    keys = df[ORDERBOOK_UNIQUE_COLUMNS].astype(
+        {c: "Int64" for c in ORDERBOOK_UNIQUE_COLUMNS if c != "txhash"}
+    )
+    return keys.drop_duplicates()
+
+
+def tombstone_keys(old_df: "pd.DataFrame", new_df: "pd.DataFrame") -> "pd.DataFrame":
+    """The keys of the stored orderbooks not calculated again after a reorg."""
+    if old_df.empty:
+        return _keys(old_df.reindex(columns=ORDERBOOK_UNIQUE_COLUMNS))
+    if new_df.empty:
+        return _keys(old_df)
+
+    df = _keys(old_df).merge(
+        _keys(new_df), how="left", on=ORDERBOOK_UNIQUE_COLUMNS, indicator=True
+    )
+    return df[df["_merge"] == "left_only"][ORDERBOOK_UNIQUE_COLUMNS]
+
+
+class ReorgHandler(object):
+    """Recompute the orderbooks of the blocks replaced by a reorg.
+
+    Every platform matches the orders with the transfers of the same
+    transaction, so only the transactions of the replaced blocks are affected:
+    the new blocks are calculated alone with `calculate_block_records`,
+    `fetch_block(blknum)` returns the canonical block as `LiveTailRunner`
+    takes it. The orderbooks of the new blocks are upserted, and the stored
+    ones not calculated again(their transaction was dropped, or its logs
+    changed) are tombstoned with `deleted_at`.
+
+    A replaced block given with its old hash is skipped if the fetched block
+    still has that `hash`, e.g. a repeated or stale reorg notice, so the
+    canonical orderbooks are never tombstoned by it.
+    """
+
+    def __init__(
+        self,
+        loader: "PostgresOrderbookLoader",
+        fetch_block: Callable[[int], Dict],
+        extractors: Optional[List[NopExtractor]] = None,
+        db_engine: Optional["Engine"] = None,
+    ):
+        extractors = resolve_extractors(extractors, db_engine)
+
+        self.loader = loader
+        self.fetch_block = fetch_block
+        self.extractors = extractors
+        self.db_engine = db_engine
+
+    def recompute(
+        self, blknums: Iterable[int], old_hashes: Optional[Dict[int, str]] = None
+    ) -> Tuple["pd.DataFrame", "pd.DataFrame", List[int]]:
+        """Returns the tombstone keys and the replacement orderbooks of the blocks,
+        and the blocks replaced indeed(not still of their `old_hashes`)."""
+        import pandas as pd
+
+        old_hashes = old_hashes or {}
+        replaced, records = [], []
+        for blknum in sorted(set(blknums)):
+            block = self.fetch_block(blknum)
+            old_hash = old_hashes.get(blknum)
+            if (
+                old_hash is not None
+                and (block.get("hash") or "").lower() == old_hash.lower()
+            ):
+                logger.info(f"block {blknum} is still {old_hash}, skip it")
+                continue
+            replaced.append(blknum)
+            records.extend(
+                calculate_block_records(self.extractors, block, self.db_engine)
+            )
+        new_df = pd.DataFrame(records, columns=ORDERBOOK_COLUMNS)
+        if len(replaced) == 0:
+            return tombstone_keys(new_df, new_df), new_df, replaced
+        old_df = self.loader.read_blocks(replaced)
+        return tombstone_keys(old_df, new_df), new_df, replaced
+
+    def handle(self, replaced: Iterable[Union[int, Tuple[int, str]]]) -> Dict:
+        """Handle the replaced blocks, as numbers or (number, old hash) pairs."""
+        st = time()
+        replaced = [
+            (int(r), None) if isinstance(r, numbers.Integral) else (int(r[0]), r[1])
+            for r in replaced
+        ]
+        blknums = set(blknum for blknum, _ in replaced)
+        old_hashes = {blknum: h for blknum, h in replaced if h is not None}
+        tombstones, replacements, recomputed = self.recompute(blknums, old_hashes)
+
+        # upsert first, the rows shared by both are never missing in between
+        loaded = self.loader.load(replacements)
+        deleted = self.loader.tombstone(tombstones)
+
+        stats = dict(
+            blocks=len(recomputed),
+            stale=len(blknums) - len(recomputed),
+            replacements=loaded.rows,
+            tombstones=deleted,
+            elapsed=time() - st,
+        )
+        logger.info(f"reorg of blocks {replaced}: {stats}")
+        return stats
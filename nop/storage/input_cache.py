@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+    from nop.extractor.extractor import NopExtractor
+
+# the tables of a block batch, as `BackfillRunner`'s fetch returns
+TABLES = ["logs", "blocks", "tx_df", "tf_df", "ef_df"]
+RECORD_TABLES = ["logs", "blocks"]
+
+INT_COLUMNS_METADATA = b"nop.int_columns"
+LIST_COLUMNS_METADATA = b"nop.list_columns"
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def to_arrow_table(df: "pd.DataFrame") -> "pa.Table":
+    import pyarrow as pa
+
+    # README: the uint256 columns are python ints, which don't fit any Arrow type,
+    # keep them as strings and restore them by the names in the metadata
+    int_columns, list_columns = [], []
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        values = df[column].dropna()
+        if len(values) > 0 and all(_is_int(v) for v in values):
+            int_columns.append(column)
+            df = df.assign(**{column: df[column].map(str, na_action="ignore")})
+        elif len(values) > 0 and isinstance(values.iloc[0], list):
+            list_columns.append(column)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[INT_COLUMNS_METADATA] = json.dumps(int_columns).encode()
+    metadata[LIST_COLUMNS_METADATA] = json.dumps(list_columns).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def from_arrow_table(table: "pa.Table") -> "pd.DataFrame":
+    metadata = table.schema.metadata or {}
+    df = table.to_pandas()
+    for column in json.loads(metadata.get(INT_COLUMNS_METADATA, b"[]")):
+        df[column] = df[column].map(int, na_action="ignore").astype(object)
+    for column in json.loads(metadata.get(LIST_COLUMNS_METADATA, b"[]")):
+        df[column] = df[column].map(list, na_action="ignore")
+    return df
+
+
+class InputCache(object):
+    """A local Parquet cache of the raw inputs, keyed by (chain, block range).
+
+    Each entry holds the `logs`, `blocks`, `tx_df`, `tf_df` and `ef_df` of a
+    block range, zstd compressed. When the cache grows over `max_bytes`, the
+    least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = 10 * 2**30,
+        chain: str = "ethereum",
+        compression: str = "zstd",
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chain = chain
+        self.compression = compression
+
+    def _entry_path(self, st_blknum: int, et_blknum: int) -> str:
+        return os.path.join(self.root, self.chain, f"{st_blknum}-{et_blknum}")
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        dirname = os.path.join(self.root, self.chain)
+        if not os.path.isdir(dirname):
+            return []
+        result = []
+        for name in os.listdir(dirname):
+            if name.startswith("."):
+                continue
+            st, et = name.split("-")
+            result.append((int(st), int(et)))
+        return sorted(result)
+
+    def get(self, st_blknum: int, et_blknum: int) -> Optional[Dict]:
+        import pyarrow.parquet as pq
+
+        path = self._entry_path(st_blknum, et_blknum)
+        if not os.path.isdir(path):
+            return None
+
+        batch = {}
+        for name in TABLES:
+            file = os.path.join(path, f"{name}.parquet")
+            if not os.path.exists(file):
+                batch[name] = None
+                continue
+            df = from_arrow_table(pq.read_table(file, memory_map=True))
+            batch[name] = df.to_dict("records") if name in RECORD_TABLES else df
+        # the mtime of the entry tracks its last use
+        os.utime(path)
+        return batch
+
+    def put(self, st_blknum: int, et_blknum: int, batch: Dict):
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        path = self._entry_path(st_blknum, et_blknum)
+        tmp = os.path.join(os.path.dirname(path), "." + os.path.basename(path))
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in TABLES:
+            data = batch.get(name)
+            if data is None:
+                continue
+            df = pd.DataFrame(data) if name in RECORD_TABLES else data
+            pq.write_table(
+                to_arrow_table(df),
+                os.path.join(tmp, f"{name}.parquet"),
+                compression=self.compression,
+            )
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        self.evict()
+
+    def size(self) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+        return total
+
+    def evict(self) -> int:
+        """Remove the least recently used entries until under `max_bytes`."""
+        entries = []
+        for st, et in self.ranges():
+            path = self._entry_path(st, et)
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def cached_fetch(
+        self, fetch: Callable[[int, int], Dict]
+    ) -> Callable[[int, int], Dict]:
+        """Wrap a fetch function, a cache miss is fetched and then cached."""
+
+        def _fetch(st_blknum: int, et_blknum: int) -> Dict:
+            batch = self.get(st_blknum, et_blknum)
+            if batch is None:
+                batch = fetch(st_blknum, et_blknum)
+                self.put(st_blknum, et_blknum, batch)
+            return batch
+
+        return _fetch
+
+    def replay(
+        self,
+        extractors: List["NopExtractor"],
+        st_blknum: Optional[int] = None,
+        et_blknum: Optional[int] = None,
+        memory_budget: Optional[int] = None,
+    ) -> Iterator[Tuple[int, int, "pd.DataFrame"]]:
+        """Recalculate the cached ranges within [st_blknum, et_blknum] offline.
+
+        Only the log-based platforms can be replayed, the trace platforms read
+        their inputs from the database.
+        """
+        from nop.runner.backfill import calculate_block_batch
+
+        extractors = [e for e in extractors if e.extract_via_log() is True]
+        for st, et in self.ranges():
+            if st_blknum is not None and st < st_blknum:
+                continue
+            if et_blknum is not None and et > et_blknum:
+                continue
+            batch = self.get(st, et)
+            yield st, et, calculate_block_batch(
+                extractors, batch, memory_budget=memory_budget
+            )
@@ -0,0 +1,227 @@
+import os
+import time
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from nop.columns import (
+    ORDERBOOK_COLUMNS,
+    ORDERBOOK_INT_COLUMNS,
+    ORDERBOOK_UINT256_COLUMNS,
+    ORDERBOOK_UNIQUE_COLUMNS,
+)
+
+# README: pyarrow is an optional dependency(`pip install nop[parquet]`), it's only
+# imported when the orderbooks are written to or read from Parquet
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+PARTITION_COLUMNS = ["_st_day", "platform"]
+
+SORT_COLUMNS = ["blknum", "txpos", "order_logpos", "xfer_logpos", "pack_index"]
+
+FILE_COLUMNS = [c for c in ORDERBOOK_COLUMNS if c not in PARTITION_COLUMNS]
+
+
+def orderbook_schema() -> "pa.Schema":
+    """The fixed schema of the Parquet files, without the partition columns."""
+    import pyarrow as pa
+
+    # README: uint256 needs up to 78 decimal digits, more than Arrow's decimal256(76),
+    # so they are kept exact as base-10 strings, the same text as Postgres' NUMERIC
+    def field_type(column):
+        if column in ORDERBOOK_INT_COLUMNS:
+            return pa.int64()
+        return pa.string()
+
+    return pa.schema([(c, field_type(c)) for c in FILE_COLUMNS])
+
+
+def _is_null(value) -> bool:
+    return value is None or value != value
+
+
+def _to_uint256_str(value) -> Optional[str]:
+    if _is_null(value):
+        return None
+    if isinstance(value, str):
+        return str(int(value, 16)) if value.startswith("0x") else value
+    return str(int(value))
+
+
+def to_table(df: "pd.DataFrame") -> "pa.Table":
+    import pyarrow as pa
+
+    schema = orderbook_schema()
+    arrays = []
+    for field in schema:
+        values = df[field.name] if field.name in df.columns else None
+        if values is None:
+            arrays.append(pa.nulls(len(df), type=field.type))
+        elif field.name in ORDERBOOK_UINT256_COLUMNS:
+            arrays.append(pa.array([_to_uint256_str(v) for v in values], pa.string()))
+        elif field.name in ORDERBOOK_INT_COLUMNS:
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        else:
+            arrays.append(
+                pa.array([None if _is_null(v) else str(v) for v in values], pa.string())
+            )
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def partition_path(root: str, st_day, platform: str) -> str:
+    return os.path.join(root, f"_st_day={st_day}", f"platform={platform}")
+
+
+def part_name(seq: Optional[int] = None) -> str:
+    # README: the files sort by their name in write order, a later write of the
+    # same orderbook wins in `compact` and `read_orderbooks`
+    if seq is None:
+        seq = time.time_ns()
+    return f"part-{seq:020d}-{uuid.uuid4().hex[:8]}.parquet"
+
+
+def _part_seq(name: str) -> int:
+    # the files named before the sequence(part-<uuid>) count as the oldest
+    parts = name.split("-")
+    if len(parts) < 3 or not parts[1].isdigit():
+        return 0
+    return int(parts[1])
+
+
+class ParquetOrderbookWriter(object):
+    """Write the calculated orderbooks into a Parquet dataset.
+
+    The dataset is hive-partitioned by `_st_day` and `platform`, each `write`
+    appends one new file per partition, `compact` merges a partition's files
+    into one, sorted and de-duplicated on (txhash, order_logpos, xfer_logpos,
+    pack_index), keeping the last written. Don't compact a partition while
+    it's being written.
+    """
+
+    def __init__(self, root: str, compression: str = "zstd"):
+        self.root = root
+        self.compression = compression
+
+    def write(self, df: "pd.DataFrame") -> List[str]:
+        import pyarrow.parquet as pq
+
+        if df is None or df.empty:
+            return []
+
+        paths = []
+        keys = df[PARTITION_COLUMNS].astype(str)
+        for (st_day, platform), part_df in df.groupby(
+            [keys["_st_day"], keys["platform"]], sort=True
+        ):
+            dirname = partition_path(self.root, st_day, platform)
+            os.makedirs(dirname, exist_ok=True)
+            path = os.path.join(dirname, part_name())
+            self._write_table(to_table(part_df), path, pq)
+            paths.append(path)
+        return paths
+
+    def partitions(self) -> List[Dict[str, str]]:
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for day_dir in sorted(os.listdir(self.root)):
+            if not day_dir.startswith("_st_day="):
+                continue
+            for platform_dir in sorted(os.listdir(os.path.join(self.root, day_dir))):
+                if platform_dir.startswith("platform="):
+                    result.append(
+                        dict(
+                            _st_day=day_dir[len("_st_day=") :],
+                            platform=platform_dir[len("platform=") :],
+                        )
+                    )
+        return result
+
+    def compact(self, st_day=None, platform: Optional[str] = None) -> int:
+        """Compact the matched partitions, returns the number of files removed."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        removed = 0
+        for part in self.partitions():
+            if st_day is not None and part["_st_day"] != str(st_day):
+                continue
+            if platform is not None and part["platform"] != platform:
+                continue
+
+            dirname = partition_path(self.root, part["_st_day"], part["platform"])
+            # in write order
+            files = sorted(
+                (
+                    os.path.join(dirname, f)
+                    for f in os.listdir(dirname)
+                    if f.startswith("part-") and f.endswith(".parquet")
+                ),
+                key=lambda f: (_part_seq(os.path.basename(f)), f),
+            )
+            if len(files) <= 1:
+                continue
+
+            table = pa.concat_tables(pq.read_table(f) for f in files)
+            df = (
+                table.to_pandas()
+                .drop_duplicates(subset=ORDERBOOK_UNIQUE_COLUMNS, keep="last")
+                .sort_values(by=SORT_COLUMNS, kind="stable")
+            )
+            table = pa.Table.from_pandas(
+                df, schema=orderbook_schema(), preserve_index=False
+            )
+
+            # README: the compacted file takes the place of the last one in the
+            # write order, until the merged files are removed(e.g. a crash in
+            # between) the rows are duplicated, `read_orderbooks` drops them
+            seq = _part_seq(os.path.basename(files[-1]))
+            path = os.path.join(dirname, part_name(seq))
+            self._write_table(table, path, pq)
+            for f in files:
+                os.remove(f)
+            removed += len(files)
+        return removed
+
+    def _write_table(self, table: "pa.Table", path: str, pq):
+        # hidden while being written, the readers skip dot-files
+        dirname, basename = os.path.split(path)
+        tmp = os.path.join(dirname, f".{basename}.tmp")
+        pq.write_table(table, tmp, compression=self.compression)
+        os.replace(tmp, path)
+
+
+def read_orderbooks(root: str, filters=None) -> "pd.DataFrame":
+    """Read the dataset back into `ORDERBOOK_COLUMNS`, `filters` as pyarrow's.
+
+    An orderbook written more than once, in partitions not compacted yet, is
+    read as its last written version.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(
+        pa.schema([(c, pa.string()) for c in PARTITION_COLUMNS]), flavor="hive"
+    )
+    # README: the default ignored prefixes include "_", which is `_st_day=`'s
+    dataset = ds.dataset(
+        root,
+        format="parquet",
+        partitioning=partitioning,
+        ignore_prefixes=["."],
+    )
+    table = dataset.to_table(
+        columns=dataset.schema.names + ["__filename"], filter=filters
+    )
+    df = table.to_pandas()
+    seqs = df["__filename"].map(lambda f: _part_seq(os.path.basename(f)))
+    df = (
+        df.assign(__seq=seqs)
+        .sort_values(by="__seq", kind="stable")
+        .drop_duplicates(
+            subset=PARTITION_COLUMNS + ORDERBOOK_UNIQUE_COLUMNS, keep="last"
+        )
+        .sort_index()
+    )
+    return df[ORDERBOOK_COLUMNS].reset_index(drop=True)
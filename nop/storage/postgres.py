@@ -0,0 +1,191 @@
+import io
+import logging
+from time import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Union
+
+from nop.columns import (
+    ORDERBOOK_COLUMNS,
+    ORDERBOOK_INT_COLUMNS,
+    ORDERBOOK_UNIQUE_COLUMNS,
+)
+from nop.misc.orderbook_upsert_template import (
+    CREATE_STAGING_TEMPLATE,
+    COPY_STAGING_TEMPLATE,
+    UPDATE_FROM_STAGING_TEMPLATE,
+    INSERT_FROM_STAGING_TEMPLATE,
+    LOCK_TABLE_TEMPLATE,
+    READ_BLOCKS_TEMPLATE,
+    TABLE_COLUMNS_TEMPLATE,
+    TOMBSTONE_FROM_STAGING_TEMPLATE,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = "_nop_orderbooks_staging"
+
+
+class LoadStats(object):
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return (
+            f"LoadStats(rows={self.rows}, inserted={self.inserted}, "
+            f"updated={self.updated}, elapsed={self.elapsed:.3f}s, "
+            f"rows/sec={self.rows_per_sec:.0f})"
+        )
+
+
+def to_csv_buffer(df: "pd.DataFrame", columns: List[str]) -> io.StringIO:
+    """Encode the orderbooks as COPY csv, NULL as `\\N`(an empty field stays "")."""
+    df = df[columns].astype({c: "Int64" for c in ORDERBOOK_INT_COLUMNS if c in columns})
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False, na_rep="\\N")
+    buf.seek(0)
+    return buf
+
+
+class PostgresOrderbookLoader(object):
+    """Load the calculated orderbooks into Postgres, idempotently.
+
+    Each batch of `batch_rows` is COPY-ed into a staging table, then the rows
+    matched on (txhash, order_logpos, xfer_logpos, pack_index) are updated and
+    the others inserted, in one transaction per batch. The batches of one table
+    are serialized by an advisory lock, so concurrent loaders never insert the
+    same key twice.
+
+    `tombstone` marks the rows of the given keys as deleted(`deleted_at`),
+    loading the same keys again revives them.
+    """
+
+    def __init__(
+        self,
+        engine: "Engine",
+        table: str = "ethereum.v2_nft_orderbooks",
+        batch_rows: int = 100000,
+    ):
+        self.engine = engine
+        self.table = table
+        self.batch_rows = batch_rows
+        self._columns: Optional[List[str]] = None
+
+    def columns(self) -> List[str]:
+        # only the ORDERBOOK_COLUMNS the target table actually has
+        if self._columns is None:
+            schema, name = "current_schema()", self.table
+            if "." in self.table:
+                schema, name = self.table.split(".", 1)
+                schema = f"'{schema}'"
+            sql = TABLE_COLUMNS_TEMPLATE.format(schema=schema, name=name)
+            with self.engine.connect() as conn:
+                existed = set(r[0] for r in conn.execute(sql).fetchall())
+            self._columns = [c for c in ORDERBOOK_COLUMNS if c in existed]
+        return self._columns
+
+    def load(self, dfs: Union["pd.DataFrame", Iterable["pd.DataFrame"]]) -> LoadStats:
+        import pandas as pd
+
+        if isinstance(dfs, pd.DataFrame):
+            dfs = [dfs]
+
+        stats = LoadStats()
+        st = time()
+        for df in dfs:
+            for offset in range(0, len(df), self.batch_rows):
+                batch = df.iloc[offset : offset + self.batch_rows]
+                inserted, updated = self._load_batch(batch)
+                stats.rows += len(batch)
+                stats.inserted += inserted
+                stats.updated += updated
+        stats.elapsed = time() - st
+        logger.info(f"load into {self.table}: {stats}")
+        return stats
+
+    def _params(self, columns: List[str]) -> Dict[str, str]:
+        key = ORDERBOOK_UNIQUE_COLUMNS
+        return dict(
+            table=self.table,
+            staging=STAGING_TABLE,
+            columns=", ".join(columns),
+            key=", ".join(key),
+            # txhash is NOT NULL, keep it an equality so its index can be used
+            key_matched=" AND ".join(
+                f"t.{c} = s.{c}"
+                if c == "txhash"
+                else f"t.{c} IS NOT DISTINCT FROM s.{c}"
+                for c in key
+            ),
+            assignments=", ".join(f"{c} = s.{c}" for c in columns if c not in key),
+        )
+
+    def read_blocks(self, blknums: Iterable[int]) -> "pd.DataFrame":
+        """The keys of the live(not deleted) orderbooks in the given blocks."""
+        import pandas as pd
+
+        columns = ["blknum"] + ORDERBOOK_UNIQUE_COLUMNS
+        sql = READ_BLOCKS_TEMPLATE.format(
+            table=self.table,
+            columns=", ".join(columns),
+            blknums=", ".join(str(int(b)) for b in blknums),
+        )
+        return pd.read_sql(sql, con=self.engine)
+
+    def tombstone(self, df: "pd.DataFrame") -> int:
+        """Mark the orderbooks of the keys in `df` as deleted, returns the rows."""
+        if df.empty:
+            return 0
+
+        params = self._params(ORDERBOOK_UNIQUE_COLUMNS)
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(CREATE_STAGING_TEMPLATE.format(**params))
+            cursor.copy_expert(
+                COPY_STAGING_TEMPLATE.format(**params),
+                to_csv_buffer(df, ORDERBOOK_UNIQUE_COLUMNS),
+            )
+            cursor.execute(LOCK_TABLE_TEMPLATE.format(**params))
+            cursor.execute(TOMBSTONE_FROM_STAGING_TEMPLATE.format(**params))
+            deleted = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        logger.info(f"tombstone #{deleted} orderbooks in {self.table}")
+        return deleted
+
+    def _load_batch(self, df: "pd.DataFrame"):
+        columns = self.columns()
+        params = self._params(columns)
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(CREATE_STAGING_TEMPLATE.format(**params))
+            cursor.copy_expert(
+                COPY_STAGING_TEMPLATE.format(**params), to_csv_buffer(df, columns)
+            )
+            cursor.execute(LOCK_TABLE_TEMPLATE.format(**params))
+            cursor.execute(UPDATE_FROM_STAGING_TEMPLATE.format(**params))
+            updated = cursor.rowcount
+            cursor.execute(INSERT_FROM_STAGING_TEMPLATE.format(**params))
+            inserted = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return inserted, updated
@@ -0,0 +1,108 @@
+import ast
+import hashlib
+import importlib
+import inspect
+import os
+from typing import TYPE_CHECKING, List, Optional
+
+from nop.storage.input_cache import to_arrow_table, from_arrow_table
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from nop.extractor.extractor import NopExtractor
+
+# shared by every platform's calculation, a change here invalidates them all
+SHARED_MODULES = [
+    "nop.columns",
+    "nop.constant",
+    "nop.utils",
+    "nop.eth_decode",
+    "nop.extractor.extractor",
+    "nop.extractor.context",
+]
+
+
+def _nop_imports(name: str) -> List[str]:
+    tree = ast.parse(inspect.getsource(importlib.import_module(name)))
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+        elif isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+    return [n for n in names if n.startswith("nop.")]
+
+
+def _nop_modules(name: str) -> List[str]:
+    # the nop modules the platform module imports from, transitively, e.g. the
+    # Sudoswap templates and method extractors under nop.misc
+    seen, todo = set(), [name]
+    while len(todo) > 0:
+        name = todo.pop()
+        if name not in seen:
+            seen.add(name)
+            todo.extend(_nop_imports(name))
+    return sorted(seen)
+
+
+def code_version(extractor: "NopExtractor") -> str:
+    """Hash of the source of the platform module(with its ABI constants), the
+    nop modules it imports and the shared calculation modules."""
+    names = sorted(set(_nop_modules(type(extractor).__module__) + SHARED_MODULES))
+
+    sha = hashlib.sha256()
+    for name in names:
+        sha.update(name.encode())
+        sha.update(inspect.getsource(importlib.import_module(name)).encode())
+    return sha.hexdigest()[:16]
+
+
+class ResultCache(object):
+    """A local cache of `calculate` outputs, keyed by (platform, block range,
+    code version), so a platform whose code is unchanged is served from disk.
+    """
+
+    def __init__(self, root: str, compression: str = "zstd"):
+        self.root = root
+        self.compression = compression
+        self._versions = {}
+
+    def version(self, extractor: "NopExtractor") -> str:
+        cls = type(extractor)
+        if cls not in self._versions:
+            self._versions[cls] = code_version(extractor)
+        return self._versions[cls]
+
+    def _path(self, extractor: "NopExtractor", st_blknum: int, et_blknum: int):
+        return os.path.join(
+            self.root,
+            extractor.platform(),
+            self.version(extractor),
+            f"{st_blknum}-{et_blknum}.parquet",
+        )
+
+    def get(
+        self, extractor: "NopExtractor", st_blknum: int, et_blknum: int
+    ) -> Optional["pd.DataFrame"]:
+        import pyarrow.parquet as pq
+
+        path = self._path(extractor, st_blknum, et_blknum)
+        if not os.path.exists(path):
+            return None
+        return from_arrow_table(pq.read_table(path))
+
+    def put(
+        self,
+        extractor: "NopExtractor",
+        st_blknum: int,
+        et_blknum: int,
+        df: "pd.DataFrame",
+    ):
+        import pyarrow.parquet as pq
+
+        path = self._path(extractor, st_blknum, et_blknum)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = os.path.join(os.path.dirname(path), "." + os.path.basename(path))
+        pq.write_table(to_arrow_table(df), tmp, compression=self.compression)
+        os.replace(tmp, path)
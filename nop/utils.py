@@ -1,7 +1,11 @@
-from datetime import datetime
-from typing import Optional, Union, List
+import logging
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Optional, Union, List, Iterable, Tuple
 
-import pandas as pd
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
 
 
 def hex_to_dec(hex_string: Optional[str]) -> Optional[Union[str, int]]:
@@ -10,12 +14,73 @@ def hex_to_dec(hex_string: Optional[str]) -> Optional[Union[str, int]]:
     try:
         return int(hex_string, 16)
     except ValueError:
-        print("Not a hex string %s" % hex_string)
+        logger.debug("Not a hex string %s", hex_string)
         return hex_string
 
 
+def _like(values, out: List):
+    # README: hand a Series back for a Series, aligned on the same index
+    if hasattr(values, "index") and hasattr(values, "str"):
+        import pandas as pd
+
+        return pd.Series(out, index=values.index, name=values.name, dtype=object)
+    return out
+
+
+def hex_to_decs(hex_strings: Iterable[Optional[str]]) -> Tuple[List, int]:
+    """Array-level `hex_to_dec`, returns the values and the number of errors.
+
+    Values are parsed into python ints(no overflow for uint256), None stays
+    None and a bad input is kept as is and counted, instead of printed.
+    """
+    if not hasattr(hex_strings, "str"):
+        hex_strings = list(hex_strings)
+    try:
+        return _like(hex_strings, [int(x, 16) for x in hex_strings]), 0
+    except (ValueError, TypeError):
+        pass
+
+    out, errors = [], 0
+    for x in hex_strings:
+        if x is None:
+            out.append(None)
+            continue
+        try:
+            out.append(int(x, 16))
+        except (ValueError, TypeError):
+            out.append(x)
+            errors += 1
+    return _like(hex_strings, out), errors
+
+
+EPOCH_DAY = date(1970, 1, 1)
+
+
 def as_st_day(st: int) -> str:
-    return datetime.utcfromtimestamp(st).strftime("%Y-%m-%d")
+    return (EPOCH_DAY + timedelta(days=int(st) // 86400)).isoformat()
+
+
+def as_st_days(st: "pd.Series", dtype: str = "str") -> "pd.Series":
+    """Vectorized `as_st_day` on a column of unix timestamps.
+
+    dtype is one of "str"(YYYY-MM-DD strings), "category"(categorical of
+    those strings) or "date"(datetime64 truncated to the day).
+    """
+    import numpy as np
+    import pandas as pd
+
+    days = st.astype("int64") // 86400
+    if dtype == "date":
+        return pd.Series(days.values.astype("datetime64[D]"), index=st.index)
+
+    # only format each distinct day once, a batch spans a handful of them
+    codes, uniques = pd.factorize(days.values)
+    labels = np.datetime_as_string(uniques.astype("datetime64[D]")).astype(object)
+    if dtype == "category":
+        return pd.Series(pd.Categorical.from_codes(codes, labels), index=st.index)
+    elif dtype == "str":
+        return pd.Series(labels.take(codes), index=st.index)
+    raise ValueError(f"unsupported dtype: {dtype}")
 
 
 def to_normalized_address(address: Optional[str]) -> Optional[str]:
@@ -24,6 +89,14 @@ def to_normalized_address(address: Optional[str]) -> Optional[str]:
     return address.lower()
 
 
+def to_normalized_addresses(addresses: Iterable[Optional[str]]):
+    """Array-level `to_normalized_address`, non-string values are kept as is."""
+    if hasattr(addresses, "str"):
+        lowered = addresses.str.lower()
+        return lowered.where(lowered.notna(), addresses)
+    return [x.lower() if isinstance(x, str) else x for x in addresses]
+
+
 def chunk_string(string, length):
     return (string[0 + i : length + i] for i in range(0, len(string), length))
 
@@ -46,6 +119,17 @@ def word_to_address(param):
         return to_normalized_address(param)
 
 
+def words_to_addresses(words: Iterable[Optional[str]]):
+    """Array-level `word_to_address`, takes the last 20 bytes of each word."""
+    if hasattr(words, "str"):
+        lowered = words.str[-40:].radd("0x").where(words.str.len() >= 40, words)
+        return to_normalized_addresses(lowered)
+    return [
+        x if x is None else ("0x" + x[-40:] if len(x) >= 40 else x).lower()
+        for x in words
+    ]
+
+
 def isnamedtupleinstance(x):
     _type = type(x)
     bases = _type.__bases__
@@ -71,11 +155,68 @@ def unpack(obj):
 
 
 def partition_rank(
-    df: pd.DataFrame, group_by: List, rank_column="_rank"
-) -> pd.DataFrame:
+    df: "pd.DataFrame", group_by: List, rank_column="_rank"
+) -> "pd.DataFrame":
     df[rank_column] = df.groupby(group_by).cumcount()
-    df_rank: pd.DataFrame = df.groupby(group_by).agg({rank_column: [min, max, "count"]})
+    df_rank: "pd.DataFrame" = df.groupby(group_by).agg(
+        {rank_column: [min, max, "count"]}
+    )
     df_rank.columns = ["_".join(c) for c in df_rank.columns]  # type: ignore
     df_rank.reset_index(inplace=True)
 
     return df.merge(df_rank, on=group_by)
+
+
+def rank_merge(
+    left_df: "pd.DataFrame",
+    right_df: "pd.DataFrame",
+    left_on: List,
+    right_on: List,
+    left_sort: List,
+    right_sort: List,
+    rank_column="_rank",
+) -> "pd.DataFrame":
+    """Pair the k-th left row with the k-th right row of the same key.
+
+    Both sides are ranked inside their key group (ordered by left_sort and
+    right_sort), and joined on key + rank, so a group of N left rows and M
+    right rows yields min(N, M) rows instead of the N*M cross product.
+    """
+    left_df = left_df.sort_values(by=left_sort, kind="stable")
+    right_df = right_df.sort_values(by=right_sort, kind="stable")
+    left_df = left_df.assign(
+        **{rank_column: left_df.groupby(left_on, sort=False).cumcount()}
+    )
+    right_df = right_df.assign(
+        **{rank_column: right_df.groupby(right_on, sort=False).cumcount()}
+    )
+
+    df = left_df.merge(
+        right_df,
+        how="inner",
+        left_on=left_on + [rank_column],
+        right_on=right_on + [rank_column],
+    )
+    return df.drop(columns=[rank_column])
+
+
+def project_columns(df: "pd.DataFrame", columns: List[str]) -> "pd.DataFrame":
+    columns = [c for c in columns if c in df.columns]
+    if len(columns) == len(df.columns):
+        return df
+    return df[columns]
+
+
+def query_once(
+    df: "pd.DataFrame", conditions: List[str], columns: Optional[List[str]] = None
+) -> "pd.DataFrame":
+    """Filter on all the conditions at once, as `df.query(c1).query(c2)...` does.
+
+    The conditions are and-ed into one expression, evaluated into a single
+    mask(with numexpr if installed) and applied once, optionally keeping only
+    the `columns` that exist in df.
+    """
+    mask = df.eval(" & ".join(f"({c})" for c in conditions))
+    if columns is None:
+        return df.loc[mask]
+    return project_columns(df.loc[mask], columns)
@@ -66,4 +66,12 @@ setup(
     ],
     python_requires=">=3.6,<4",
     install_requires=load_requirements("Pipfile"),
+    entry_points={
+        "console_scripts": ["nop=nop.cli:main"],
+    },
+    extras_require={
+        "parquet": ["pyarrow"],
+        "postgres": ["psycopg2-binary"],
+        "rpc": ["aiohttp"],
+    },
 )
@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+TOKEN_ID = 2**200
+TXHASH = "0x" + "1" * 64
+MAKER = "0x575570f62c90a61763b1e93cf0da62ed810dbda2"
+TAKER = "0xca6f3defbc6041299837725f6430f33b0f24e5c0"
+COLLECTION = "0x5db2394a5abcbb7ee33d09d1d027d0215a76afce"
+
+
+def word(x):
+    return "0x" + x.rjust(64, "0")
+
+
+def make_looksrare_batch():
+    log = {
+        "address": "0x59728544b08ab483533076417fbbb2fd0b17ce3a",
+        "topics": [
+            "0x68cd251d4d267c6e2034ff0088b990352b97b2002c0476587d0c4da889c11330",
+            word(TAKER[2:]),
+            word(MAKER[2:]),
+            word("56244bb70cbd3ea9dc8007399f61dfc065190031"),
+        ],
+        "data": "0x"
+        + "".join(
+            w[2:]
+            for w in [
+                word("ab"),
+                word("1"),
+                word("c02aaa39b223fe8d0a0e5c4f27ead9083c756cc2"),
+                word(COLLECTION[2:]),
+                word("%x" % TOKEN_ID),
+                word("1"),
+                word("58d15e176280000"),
+            ]
+        ),
+        "transaction_hash": TXHASH,
+        "transaction_index": 1,
+        "log_index": 2,
+        "block_number": 15000000,
+        "block_timestamp": 1655000000,
+    }
+    base = dict(_st=1655000000, blknum=15000000, txhash=TXHASH, txpos=1)
+    tx_df = pd.DataFrame([dict(base, value=0, to_address=COLLECTION)])
+    tf_df = pd.DataFrame(
+        [
+            dict(
+                base,
+                logpos=1,
+                token_address=COLLECTION,
+                from_address=MAKER,
+                to_address=TAKER,
+                value=TOKEN_ID,
+            )
+        ]
+    )
+    return dict(logs=[log], tx_df=tx_df, tf_df=tf_df, ef_df=None)
+
+
+@pytest.fixture
+def looksrare_order():
+    """The LooksRare order in `looksrare_batch`, a token id over uint64."""
+    return dict(
+        token_id=TOKEN_ID,
+        txhash=TXHASH,
+        maker=MAKER,
+        taker=TAKER,
+        collection=COLLECTION,
+    )
+
+
+@pytest.fixture
+def looksrare_batch():
+    """One LooksRare TakerAsk log with its transaction and Transfer, as a
+    `BackfillRunner` fetch returns."""
+    return make_looksrare_batch()
+
+
+@pytest.fixture
+def looksrare_block():
+    """Build a block of `n_txs` copies of the LooksRare order, one per
+    transaction, as `LiveTailRunner` fetches it."""
+
+    def make(n_txs):
+        batch = make_looksrare_batch()
+        log = batch["logs"][0]
+        tx = batch["tx_df"].to_dict("records")[0]
+        xf = batch["tf_df"].to_dict("records")[0]
+
+        block = dict(logs=[], txs=[], tf_records=[], ef_records=[])
+        for txpos in range(n_txs):
+            txhash = "0x%064x" % txpos
+            block["logs"].append(
+                dict(log, transaction_hash=txhash, transaction_index=txpos)
+            )
+            block["txs"].append(dict(tx, txhash=txhash, txpos=txpos))
+            block["tf_records"].append(dict(xf, txhash=txhash, txpos=txpos))
+        return block
+
+    return make
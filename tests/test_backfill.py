@@ -0,0 +1,134 @@
+import json
+
+import pandas as pd
+import pytest
+
+from nop.extractor import SudoswapOrderbookExtractor
+from nop.runner.adaptive import AdaptiveBatchSize
+from nop.runner.live import LiveTailRunner
+from nop.runner.reorg import ReorgHandler
+from nop.runner.backfill import BackfillRunner, split_block_range
+from nop.runner.checkpoint import Checkpoint
+
+
+def empty_batch(st_blknum, et_blknum):
+    return dict(logs=[], tx_df=pd.DataFrame(), tf_df=pd.DataFrame(), ef_df=None)
+
+
+class TestBackfill:
+    def test_split_block_range(self):
+        assert list(split_block_range(10, 24, 5)) == [(10, 14), (15, 19), (20, 24)]
+        assert list(split_block_range(10, 12, 5)) == [(10, 12)]
+
+    def test_trace_platforms_without_engine(self, tmp_path, caplog):
+        path = str(tmp_path / "checkpoint.json")
+        # the defaults leave the trace platforms out, with a warning
+        runner = BackfillRunner(10, 59, 10, path, empty_batch, print)
+        assert all(e.extract_via_log() is True for e in runner.extractors)
+        assert "skip the trace platforms ['sudoswap']" in caplog.text
+
+        # an explicit one is never skipped silently
+        extractors = [SudoswapOrderbookExtractor()]
+        with pytest.raises(ValueError):
+            BackfillRunner(10, 59, 10, path, empty_batch, print, extractors=extractors)
+        with pytest.raises(ValueError):
+            LiveTailRunner(10, lambda n: None, print, extractors=extractors)
+        with pytest.raises(ValueError):
+            ReorgHandler(None, lambda n: None, extractors=extractors)
+
+    def test_checkpoint(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        ckpt = Checkpoint(path)
+        ckpt.mark_done(10, 19)
+        ckpt.mark_done(30, 39)
+        ckpt.mark_done(20, 29)
+        assert json.load(open(path)) == dict(done=[[10, 39]])
+
+        ckpt = Checkpoint(path)
+        assert ckpt.is_done(15, 25)
+        assert not ckpt.is_done(35, 45)
+
+    def test_resume(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        fetched = []
+
+        def crash_at_30(st_blknum, et_blknum):
+            if st_blknum == 30:
+                raise RuntimeError("node is gone")
+            fetched.append(st_blknum)
+            return empty_batch(st_blknum, et_blknum)
+
+        runner = BackfillRunner(10, 59, 10, path, crash_at_30, print, extractors=[])
+        with pytest.raises(RuntimeError):
+            runner.run()
+        assert fetched == [10, 20]
+
+        def fetch(st_blknum, et_blknum):
+            fetched.append(st_blknum)
+            return empty_batch(st_blknum, et_blknum)
+
+        runner = BackfillRunner(10, 59, 10, path, fetch, print, extractors=[])
+        assert runner.pending_chunks() == [(30, 39), (40, 49), (50, 59)]
+        stats = runner.run()
+        assert fetched == [10, 20, 30, 40, 50]
+        assert (stats["chunks"], stats["skipped"]) == (3, 2)
+        assert runner.pending_chunks() == []
+
+    def test_resume_with_another_chunk_size(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        Checkpoint(path).mark_done(10, 34)
+
+        runner = BackfillRunner(10, 59, 20, path, empty_batch, print, extractors=[])
+        # only the blocks not done yet, never the first half of (30, 49) again
+        assert runner.pending_chunks() == [(35, 49), (50, 59)]
+        assert runner.run()["skipped"] == 1
+
+    def test_adaptive_batch_size(self):
+        sizer = AdaptiveBatchSize(
+            initial=10, max_size=1000, target_latency=10.0, memory_target=10000
+        )
+        # quiet blocks: grows, at most doubling per batch
+        assert sizer.observe(10, 0.1) == 20
+        assert sizer.observe(20, 0.2) == 40
+        # a sweep: cut under the memory target at once
+        assert sizer.observe(40, 0.4, dict(orders=400, merge_bytes=400000)) < 40
+        assert sizer.observe(sizer.size, 10.0 * sizer.size) == 1
+
+        # the orders per batch, only with an orders_target
+        sizer = AdaptiveBatchSize(initial=100, max_size=1000)
+        assert sizer.observe(100, 0.1, dict(orders=1000)) == 200
+        sizer = AdaptiveBatchSize(initial=100, max_size=1000, orders_target=500)
+        assert sizer.observe(100, 0.1, dict(orders=1000)) == 50
+
+    def test_should_retry(self):
+        from sqlalchemy.exc import OperationalError
+
+        class PgError(Exception):
+            def __init__(self, pgcode):
+                self.pgcode = pgcode
+
+        sizer = AdaptiveBatchSize()
+        assert sizer.should_retry(MemoryError())
+        assert sizer.should_retry(OperationalError("SELECT", {}, PgError("57014")))
+        assert not sizer.should_retry(OperationalError("SELECT", {}, PgError("08006")))
+        assert not sizer.should_retry(RuntimeError())
+
+    def test_adaptive_run(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        Checkpoint(path).mark_done(30, 39)
+        fetched = []
+
+        def fetch(st_blknum, et_blknum):
+            if et_blknum - st_blknum + 1 > 8:
+                raise MemoryError()
+            fetched.append((st_blknum, et_blknum))
+            return empty_batch(st_blknum, et_blknum)
+
+        sizer = AdaptiveBatchSize(initial=4, max_size=16)
+        runner = BackfillRunner(
+            10, 59, None, path, fetch, print, extractors=[], batch_size=sizer
+        )
+        stats = runner.run()
+        assert fetched == [(10, 13), (14, 21), (22, 29), (40, 47), (48, 55), (56, 59)]
+        assert stats["chunks"] == 6
+        assert Checkpoint(path).ranges == [(10, 59)]
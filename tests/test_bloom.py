@@ -0,0 +1,86 @@
+import pandas as pd
+
+from nop.extractor import LooksrareOrderbookExtractor, SudoswapOrderbookExtractor
+from nop.fetcher.bloom import BlockBloomFilter, bloom_mask
+
+
+def logs_bloom(*items):
+    bloom = 0
+    for item in items:
+        bloom |= bloom_mask(item)
+    return "0x%0512x" % bloom
+
+
+class TestBloom:
+    def test_filter_batch(self, looksrare_batch):
+        log = looksrare_batch["logs"][0]
+        other = "0x" + "e" * 40
+        blocks = [
+            # the LooksRare order
+            dict(number=1, logs_bloom=logs_bloom(log["address"], *log["topics"])),
+            # the same topics, but emitted by another contract
+            dict(number=2, logs_bloom=logs_bloom(other, *log["topics"])),
+            # LooksRare without an order, e.g. a cancel
+            dict(number=3, logs_bloom=logs_bloom(log["address"], "0x" + "1" * 64)),
+            dict(number=4, logs_bloom="0x" + "0" * 512),
+            dict(number=5),
+        ]
+        bloom_filter = BlockBloomFilter([LooksrareOrderbookExtractor()])
+        assert bloom_filter.relevant_blocks(blocks) == {1, 5}
+
+        batch = dict(
+            blocks=blocks,
+            logs=[dict(log, block_number=n) for n in (1, 2, 3)],
+            tx_df=pd.DataFrame(dict(blknum=[1, 2, 3, 4, 5])),
+            tf_df=pd.DataFrame(dict(blknum=[1, 1, 4])),
+            ef_df=None,
+        )
+        filtered = bloom_filter.filter_batch(batch)
+        assert [b["number"] for b in filtered["blocks"]] == [1, 5]
+        assert [e["block_number"] for e in filtered["logs"]] == [1]
+        assert filtered["tx_df"]["blknum"].tolist() == [1, 5]
+        assert filtered["tf_df"]["blknum"].tolist() == [1, 1]
+        assert filtered["ef_df"] is None
+
+        # without the platform addresses, any block with the topics may match
+        bloom_filter = BlockBloomFilter(
+            [LooksrareOrderbookExtractor()], only_known_platform=False
+        )
+        assert bloom_filter.relevant_blocks(blocks) == {1, 2, 5}
+
+    def test_filter_batch_rpc_style(self, looksrare_batch):
+        log = looksrare_batch["logs"][0]
+        blocks = [
+            dict(number="0x10", logsBloom=logs_bloom(log["address"], *log["topics"])),
+            dict(number="0x11", logsBloom="0x" + "0" * 512),
+        ]
+        batch = dict(
+            blocks=blocks,
+            logs=[dict(log, block_number=n) for n in ("0x10", "0x11")],
+            tx_df=pd.DataFrame(dict(blknum=[16, 17])),
+            tf_df=None,
+            ef_df=None,
+        )
+        bloom_filter = BlockBloomFilter([LooksrareOrderbookExtractor()])
+        assert bloom_filter.relevant_blocks(blocks) == {16}
+        filtered = bloom_filter.filter_batch(batch)
+        assert [b["number"] for b in filtered["blocks"]] == ["0x10"]
+        assert [e["block_number"] for e in filtered["logs"]] == ["0x10"]
+        assert filtered["tx_df"]["blknum"].tolist() == [16]
+
+        # the trace platforms need every block and transaction
+        bloom_filter = BlockBloomFilter(
+            [LooksrareOrderbookExtractor(), SudoswapOrderbookExtractor()]
+        )
+        filtered = bloom_filter.filter_batch(batch)
+        assert filtered["blocks"] == blocks
+        assert [e["block_number"] for e in filtered["logs"]] == ["0x10"]
+        assert filtered["tx_df"]["blknum"].tolist() == [16, 17]
+
+    def test_filter_batch_without_blocks(self, looksrare_batch):
+        # a log-only fetch has no blooms, keep the whole batch
+        bloom_filter = BlockBloomFilter([LooksrareOrderbookExtractor()])
+        filtered = bloom_filter.filter_batch(looksrare_batch)
+        assert filtered["logs"] == looksrare_batch["logs"]
+        assert filtered["tx_df"] is looksrare_batch["tx_df"]
+        assert filtered["tf_df"] is looksrare_batch["tf_df"]
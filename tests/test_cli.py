@@ -0,0 +1,74 @@
+import io
+import json
+import os
+
+import pandas as pd
+
+from nop.cli import parse_args, run
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_jsonl(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+class TestCli:
+    def test_logs(self, tmp_path, looksrare_batch, looksrare_order):
+        batch = looksrare_batch
+        write_jsonl(tmp_path / "logs.jsonl", batch["logs"])
+        batch["tx_df"].to_csv(tmp_path / "txs.csv", index=False)
+        # the uint256 token id is read back from CSV as a python int
+        batch["tf_df"].to_csv(tmp_path / "token_xfers.csv", index=False)
+
+        args = parse_args(
+            [
+                "--logs",
+                str(tmp_path / "logs.jsonl"),
+                "--txs",
+                str(tmp_path / "txs.csv"),
+                "--token-xfers",
+                str(tmp_path / "token_xfers.csv"),
+                "-o",
+                str(tmp_path / "out.jsonl"),
+            ]
+        )
+        out = io.StringIO()
+        df = run(args, out=out)
+
+        assert df["token_id"].tolist() == [looksrare_order["token_id"]]
+        assert df["platform"].tolist() == [batch["logs"][0]["address"]]
+        assert "1 logs" in out.getvalue()
+        lines = open(tmp_path / "out.jsonl").read().splitlines()
+        assert json.loads(lines[0])["token_id"] == looksrare_order["token_id"]
+        assert json.loads(lines[0])["order_logpos"] == 2
+
+    def test_orderbooks(self, tmp_path):
+        ob_path = f"{TEST_DIR}/testdata/seaport_orderbooks.json"
+        tx_df = pd.DataFrame(json.load(open(ob_path)))[
+            ["_st", "blknum", "txhash", "txpos"]
+        ].drop_duplicates()
+        write_jsonl(
+            tmp_path / "txs.jsonl",
+            tx_df.assign(value=0, to_address=None).to_dict("records"),
+        )
+
+        args = parse_args(
+            [
+                "--orderbooks",
+                ob_path,
+                "--txs",
+                str(tmp_path / "txs.jsonl"),
+                "--token-xfers",
+                f"{TEST_DIR}/testdata/seaport_token_xfers.json",
+                "--erc1155-xfers",
+                f"{TEST_DIR}/testdata/seaport_erc1155_xfers.json",
+                "-p",
+                "seaport",
+            ]
+        )
+        df = run(args, out=io.StringIO())
+        assert len(df) > 0
+        assert set(df["token_type"]) <= {"erc721", "erc1155"}
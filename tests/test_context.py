@@ -0,0 +1,62 @@
+import pandas as pd
+from nop.extractor.context import BatchContext, split_by_tx, with_order_window
+
+
+class TestContext:
+    def test_order_window(self):
+        ob_df = pd.DataFrame(
+            [
+                # the second order of tx 0xa was packed with two items
+                dict(blknum=1, txpos=0, txhash="0xa", order_logpos=9, pack_index=0),
+                dict(blknum=1, txpos=0, txhash="0xa", order_logpos=9, pack_index=1),
+                dict(blknum=1, txpos=0, txhash="0xa", order_logpos=3, pack_index=0),
+                dict(blknum=1, txpos=1, txhash="0xb", order_logpos=5, pack_index=0),
+            ]
+        )
+        df = with_order_window(ob_df)
+
+        assert len(df) == len(ob_df)
+        assert "prev_order_logpos" not in ob_df.columns
+        assert df["prev_order_logpos"].tolist() == [3, 3, -1, -1]
+        assert df["next_order_logpos"].tolist() == [2**32, 2**32, 9, 2**32]
+        assert df["tx_order_rank"].tolist() == [1, 1, 0, 0]
+        assert df["tx_order_count"].tolist() == [2, 2, 2, 1]
+
+    def test_split_by_tx(self):
+        def tx(txhash, txpos):
+            return dict(
+                _st=1, blknum=1, txhash=txhash, txpos=txpos, to_address="0x", value=0
+            )
+
+        def tf(txhash, txpos, logpos):
+            return dict(
+                _st=1,
+                blknum=1,
+                txhash=txhash,
+                txpos=txpos,
+                logpos=logpos,
+                token_address="0xt",
+                from_address="0xf",
+                to_address="0xt",
+                value=logpos,
+            )
+
+        tx_df = pd.DataFrame([tx("0xa", 0), tx("0xb", 1), tx("0xc", 2)])
+        # tx 0xb is a sweep, its orders x transfers dominate the cost
+        tf_df = pd.DataFrame(
+            [tf("0xa", 0, 1)] + [tf("0xb", 1, i) for i in range(20)] + [tf("0xc", 2, 1)]
+        )
+        ob_df = pd.DataFrame(
+            [dict(blknum=1, txpos=2, txhash="0xc", order_logpos=2)]
+            + [dict(blknum=1, txpos=1, txhash="0xb", order_logpos=i) for i in range(20)]
+            + [dict(blknum=1, txpos=0, txhash="0xa", order_logpos=2)]
+        )
+        ctx = BatchContext(tx_df, tf_df, None)
+
+        assert split_by_tx(ctx, ob_df, 2**40) == [["0xa", "0xb", "0xc"]]
+        assert split_by_tx(ctx, ob_df, 1) == [["0xa"], ["0xb"], ["0xc"]]
+        assert split_by_tx(ctx, ob_df, 20000) == [["0xa"], ["0xb"], ["0xc"]]
+
+        sub = ctx.select(["0xb"])
+        assert sub.tx_df["txhash"].tolist() == ["0xb"]
+        assert len(sub.xf_df) == 20 and len(ctx.xf_df) == 22
@@ -1,4 +1,4 @@
-from nop.eth_decode import eth_decode_input
+from nop.eth_decode import eth_decode_input, compile_unpacker, decode_inputs
 
 
 class TestEthDecode:
@@ -55,3 +55,51 @@ class TestEthDecode:
             "nftRecipient": "0xca6f3defbc6041299837725f6430f33b0f24e5c0",
             "deadline": 1659488792,
         }
+
+        # another ABI of the same selector isn't served from the cache
+        renamed = dict(
+            abi_json,
+            inputs=abi_json["inputs"][:3]
+            + [dict(abi_json["inputs"][3], name="expiry")],
+        )
+        assert eth_decode_input(renamed, data)[1]["expiry"] == 1659488792
+        assert eth_decode_input(abi_json, data)[1] == parameter
+
+        assert decode_inputs(abi_json, [data, data]) == [parameter, parameter]
+        columns = decode_inputs(abi_json, [data, data], columns=True)
+        assert columns["deadline"] == [1659488792, 1659488792]
+        assert columns["swapList"] == [parameter["swapList"]] * 2
+        assert decode_inputs(abi_json, [], columns=True)["ethRecipient"] == []
+        # an equal ABI in another dict shares the decoder
+        assert decode_inputs(dict(abi_json), [data]) == [parameter]
+
+    def test_compile_unpacker(self):
+        inputs = [
+            {
+                "components": [
+                    {
+                        "components": [
+                            {"name": "pair", "type": "address"},
+                            {"name": "nftIds", "type": "uint256[]"},
+                        ],
+                        "name": "swapInfo",
+                        "type": "tuple",
+                    },
+                    {"name": "maxCost", "type": "uint256"},
+                ],
+                "name": "trades",
+                "type": "tuple[]",
+            },
+            {"name": "hashes", "type": "bytes32[]"},
+        ]
+        decoded = ([(("0xab", (1, 2)), 3)], (b"\x01\x02",))
+
+        unpack = compile_unpacker(inputs)
+        assert unpack is compile_unpacker(inputs)
+        assert unpack(decoded) == {
+            "trades": [{"swapInfo": {"pair": "0xab", "nftIds": (1, 2)}, "maxCost": 3}],
+            "hashes": ["0102"],
+        }
+        assert compile_unpacker(inputs, columns=True)([decoded, decoded]) == {
+            k: [v, v] for k, v in unpack(decoded).items()
+        }
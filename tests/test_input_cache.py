@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from nop.extractor import LooksrareOrderbookExtractor  # noqa: E402
+from nop.storage.input_cache import InputCache  # noqa: E402
+
+
+class TestInputCache:
+    def test_cached_fetch_and_replay(self, tmp_path, looksrare_batch, looksrare_order):
+        cache = InputCache(str(tmp_path))
+        fetched = []
+
+        def fetch(st_blknum, et_blknum):
+            fetched.append((st_blknum, et_blknum))
+            return looksrare_batch
+
+        fetch = cache.cached_fetch(fetch)
+        batch = fetch(15000000, 15000099)
+        cached = fetch(15000000, 15000099)
+        assert fetched == [(15000000, 15000099)]
+        assert cache.ranges() == [(15000000, 15000099)]
+
+        assert cached["logs"] == batch["logs"]
+        assert cached["tf_df"]["value"].tolist() == [looksrare_order["token_id"]]
+        assert cached["ef_df"] is None
+
+        extractor = LooksrareOrderbookExtractor()
+        (st, et, df), *_ = list(cache.replay([extractor]))
+        assert (st, et) == (15000000, 15000099)
+        assert df["token_id"].tolist() == [looksrare_order["token_id"]]
+        assert df["maker"].tolist() == [looksrare_order["maker"]]
+
+    def test_evict(self, tmp_path, looksrare_batch):
+        cache = InputCache(str(tmp_path), max_bytes=2**40)
+        for idx, st in enumerate((100, 200, 300)):
+            cache.put(st, st + 99, looksrare_batch)
+            path = tmp_path / "ethereum" / f"{st}-{st + 99}"
+            os.utime(path, (1000 + idx, 1000 + idx))
+        cache.get(100, 199)
+
+        cache.max_bytes = cache.size() - 1
+        assert cache.evict() == 1
+        # the least recently used one is gone
+        assert cache.ranges() == [(100, 199), (300, 399)]
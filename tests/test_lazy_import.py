@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = {"pandas", "numpy", "pyarrow", "sqlalchemy"}
+
+# run in a fresh interpreter, the pytest process already has pandas loaded
+SCRIPT = r"""
+import sys
+import json
+from time import perf_counter
+
+log = json.load(sys.stdin)
+
+st = perf_counter()
+import nop
+from nop.extractor import LooksrareOrderbookExtractor
+import_time = perf_counter() - st
+
+st = perf_counter()
+orderbooks = list(LooksrareOrderbookExtractor().extract_orderbook_from_logs([log]))
+extract_time = perf_counter() - st
+
+print(
+    json.dumps(
+        dict(
+            orderbooks=orderbooks,
+            modules=sorted(set(m.split(".")[0] for m in sys.modules)),
+            platforms=len(nop.platforms),
+            import_time=import_time,
+            extract_time=extract_time,
+        )
+    )
+)
+"""
+
+
+class TestLazyImport:
+    def test_log_path_without_heavy_dependencies(
+        self, looksrare_batch, looksrare_order
+    ):
+        out = subprocess.check_output(
+            [sys.executable, "-W", "ignore", "-c", SCRIPT],
+            cwd=ROOT_DIR,
+            env=dict(os.environ, PYTHONPATH=ROOT_DIR),
+            input=json.dumps(looksrare_batch["logs"][0]).encode(),
+        )
+        result = json.loads(out)
+        print(
+            "import nop: {:.3f}s, extract the first log: {:.3f}s".format(
+                result["import_time"], result["extract_time"]
+            )
+        )
+
+        assert result["platforms"] == 5
+        assert "nop" in result["modules"]
+        assert HEAVY_MODULES.isdisjoint(result["modules"])
+
+        (order,) = result["orderbooks"]
+        assert order["token_id"] == looksrare_order["token_id"]
+        assert order["maker"] == looksrare_order["maker"]
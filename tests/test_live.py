@@ -0,0 +1,64 @@
+from nop.columns import ORDERBOOK_COLUMNS
+from nop.extractor import LooksrareOrderbookExtractor
+from nop.runner.live import LatencyHistogram, LiveTailRunner, calculate_block_records
+
+
+class TestLive:
+    def test_latency_histogram(self):
+        hist = LatencyHistogram(buckets=[0.01, 0.1, 1])
+        for elapsed in [0.005] * 98 + [0.05, 2.0]:
+            hist.observe(elapsed)
+        assert hist.percentile(50) == 0.01
+        assert hist.percentile(99) == 0.1
+        assert hist.percentile(100) == 2.0
+        assert hist.as_dict()["count"] == 100
+
+    def test_records_match_calculate(self, looksrare_block, looksrare_order):
+        import pandas as pd
+
+        extractor = LooksrareOrderbookExtractor()
+        block = looksrare_block(3)
+        records = calculate_block_records([extractor], block)
+        df = extractor.calculate(
+            pd.DataFrame(block["txs"]),
+            pd.DataFrame(extractor.extract_orderbooks(block["logs"])),
+            pd.DataFrame(block["tf_records"]),
+            None,
+        )
+        assert len(records) == 3 and list(records[0]) == ORDERBOOK_COLUMNS
+        assert [r["token_id"] for r in records] == [looksrare_order["token_id"]] * 3
+        assert [r["txhash"] for r in records] == df["txhash"].tolist()
+        assert [r["xfer_logpos"] for r in records] == df["xfer_logpos"].tolist()
+
+    def test_p99_block_latency(self, tmp_path, looksrare_block):
+        block = looksrare_block(50)
+        written = []
+
+        def fetch_block(blknum):
+            return block if blknum < 15000200 else None
+
+        runner = LiveTailRunner(
+            15000000,
+            fetch_block,
+            written.append,
+            extractors=[LooksrareOrderbookExtractor()],
+            checkpoint_path=str(tmp_path / "live.json"),
+        )
+        latency = runner.run(until=15000199)
+        print("per block(50 orders) latency:", latency["calculate"])
+
+        assert len(written) == 200 and all(len(w) == 50 for w in written)
+        assert latency["total"]["count"] == 200
+        assert latency["calculate"]["p99"] < 0.5
+
+        # resume after the last written block
+        runner = LiveTailRunner(15000000, fetch_block, print, extractors=[])
+        assert runner.next_blknum == 15000000
+        runner = LiveTailRunner(
+            15000000,
+            fetch_block,
+            print,
+            extractors=[],
+            checkpoint_path=str(tmp_path / "live.json"),
+        )
+        assert runner.next_blknum == 15000200
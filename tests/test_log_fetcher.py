@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+from nop.extractor import LooksrareOrderbookExtractor  # noqa: E402
+from nop.fetcher.log_fetcher import AsyncLogFetcher  # noqa: E402
+
+MAX_RESULTS = 3
+
+
+def rpc_log(log, blknum, logpos):
+    return dict(
+        address=log["address"].upper().replace("0X", "0x"),
+        topics=log["topics"],
+        data=log["data"],
+        blockNumber=hex(blknum),
+        blockHash="0x" + "b" * 64,
+        transactionHash="0x%064x" % (blknum * 100 + logpos),
+        transactionIndex="0x1",
+        logIndex=hex(logpos),
+        removed=False,
+    )
+
+
+class FakeNode:
+    def __init__(self, logs):
+        self.logs = logs
+        self.filters = []
+
+    def call(self, request):
+        method, params = request["method"], request["params"]
+        if method == "eth_getBlockByNumber":
+            blknum = int(params[0], 16)
+            result = dict(number=params[0], timestamp=hex(1655000000 + blknum))
+        elif method == "eth_getLogs":
+            params = params[0]
+            self.filters.append(params)
+            st, et = int(params["fromBlock"], 16), int(params["toBlock"], 16)
+            result = [
+                log
+                for log in self.logs
+                if st <= int(log["blockNumber"], 16) <= et
+                and log["address"].lower() in params["address"]
+                and log["topics"][0] in params["topics"][0]
+            ]
+            if len(result) > MAX_RESULTS:
+                error = dict(code=-32005, message="query returned more than 3 results")
+                return dict(jsonrpc="2.0", id=request["id"], error=error)
+        return dict(jsonrpc="2.0", id=request["id"], result=result)
+
+    async def handle(self, request):
+        body = await request.json()
+        if isinstance(body, list):
+            return web.json_response([self.call(r) for r in body])
+        return web.json_response(self.call(body))
+
+
+async def fetch_from_fake_node(node, st_blknum, et_blknum):
+    app = web.Application()
+    app.router.add_post("/", node.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        fetcher = AsyncLogFetcher(f"http://127.0.0.1:{port}/", max_range=50)
+        return fetcher, await fetcher.fetch(st_blknum, et_blknum)
+    finally:
+        await runner.cleanup()
+
+
+class TestLogFetcher:
+    def test_fetch(self, looksrare_batch, looksrare_order):
+        log = looksrare_batch["logs"][0]
+        unrelated = dict(log, topics=["0x" + "f" * 64] + log["topics"][1:])
+        # 6 orders in the range, more than the node returns per request
+        logs = [rpc_log(log, 110, i) for i in range(3)]
+        logs += [rpc_log(log, blknum, 0) for blknum in (101, 120, 149)]
+        logs += [rpc_log(unrelated, 111, 0)]
+
+        node = FakeNode(logs)
+        fetcher, got = asyncio.run(fetch_from_fake_node(node, 100, 149))
+
+        assert len(got) == 6
+        assert [(e["block_number"], e["log_index"]) for e in got][:3] == [
+            (101, 0),
+            (110, 0),
+            (110, 1),
+        ]
+        assert got[0]["block_timestamp"] == 1655000000 + 101
+        assert got[0]["address"] == log["address"]
+        # the range was halved until the requests returned at most 3 logs
+        assert len(node.filters) > 1
+        assert all(len(f["topics"][0]) == 5 for f in node.filters)
+
+        orderbooks = list(
+            LooksrareOrderbookExtractor().extract_orderbook_from_logs(got)
+        )
+        assert len(orderbooks) == 6
+        assert orderbooks[0]["token_id"] == looksrare_order["token_id"]
@@ -0,0 +1,64 @@
+import pytest
+import pandas as pd
+
+from nop.columns import ORDERBOOK_COLUMNS
+
+pytest.importorskip("pyarrow")
+
+from nop.storage.parquet import ParquetOrderbookWriter, read_orderbooks  # noqa: E402
+
+MAX_UINT256 = 2**256 - 1
+
+
+def orderbook(txhash, st_day, platform, token_id, xfer_logpos=1):
+    od = {c: None for c in ORDERBOOK_COLUMNS}
+    od.update(
+        _st=1655000000,
+        _st_day=st_day,
+        blknum=15000000,
+        txhash=txhash,
+        txpos=1,
+        xfer_logpos=xfer_logpos,
+        order_logpos=2,
+        token_id=token_id,
+        price=10**18,
+        pack_index=0,
+        pack_count=1,
+        platform=platform,
+    )
+    return od
+
+
+class TestParquet:
+    def test_write_compact_read(self, tmp_path):
+        df = pd.DataFrame(
+            [
+                orderbook("0xa", "2022-06-12", "0xp1", MAX_UINT256),
+                orderbook("0xb", "2022-06-12", "0xp2", 1),
+                orderbook("0xc", "2022-06-13", "0xp1", 2, xfer_logpos=None),
+            ]
+        )
+        writer = ParquetOrderbookWriter(str(tmp_path))
+        assert len(writer.write(df)) == 3
+        # a recalculated 0xa
+        assert len(writer.write(df.iloc[:1].assign(price=2 * 10**18))) == 1
+
+        # the rerun of 0xa is read as its last version, before and after compacted
+        for compacted in (None, 2, 0):
+            if compacted is not None:
+                assert writer.compact() == compacted
+            got = read_orderbooks(str(tmp_path))
+            assert list(got.columns) == ORDERBOOK_COLUMNS
+            assert sorted(got["txhash"]) == ["0xa", "0xb", "0xc"]
+            assert str(MAX_UINT256) in got["token_id"].tolist()
+            assert got.set_index("txhash").loc["0xa", "price"] == str(2 * 10**18)
+
+    def test_compact_keeps_the_last_write(self, tmp_path):
+        writer = ParquetOrderbookWriter(str(tmp_path))
+        # the random part of the names sorts the other way round
+        for price in range(20):
+            df = pd.DataFrame([orderbook("0xa", "2022-06-12", "0xp1", 1)])
+            writer.write(df.assign(price=price))
+        assert writer.compact() == 20
+        got = read_orderbooks(str(tmp_path))
+        assert got["price"].tolist() == ["19"]
@@ -0,0 +1,92 @@
+import pytest
+
+from nop.extractor import LooksrareOrderbookExtractor
+from nop.runner.adaptive import AdaptiveBatchSize
+from nop.runner.pipeline import PipelineRunner
+
+
+class TestPipeline:
+    @pytest.mark.parametrize("workers", [0, 2])
+    def test_run(self, tmp_path, workers, looksrare_batch, looksrare_order):
+        path = str(tmp_path / "checkpoint.json")
+        fetched, written = [], []
+
+        def fetch(st_blknum, et_blknum):
+            fetched.append(st_blknum)
+            return looksrare_batch
+
+        runner = PipelineRunner(
+            10,
+            59,
+            10,
+            path,
+            fetch,
+            written.append,
+            extractors=[LooksrareOrderbookExtractor()],
+            workers=workers,
+            queue_size=1,
+        )
+        stats = runner.run()
+        assert fetched == [10, 20, 30, 40, 50]
+        assert (stats["chunks"], stats["skipped"], stats["rows"]) == (5, 0, 5)
+        assert [df["token_id"].tolist() for df in written] == [
+            [looksrare_order["token_id"]]
+        ] * 5
+        assert set(stats["stages"]) == {"fetch", "submit", "calculate", "write"}
+        assert stats["stages"]["calculate"]["items"] == 5
+        assert 0 <= stats["stages"]["write"]["utilization"] <= 1
+        assert runner.pending_chunks() == []
+
+    def test_fetch_error(self, tmp_path, looksrare_batch):
+        path = str(tmp_path / "checkpoint.json")
+
+        def fetch(st_blknum, et_blknum):
+            if st_blknum == 30:
+                raise RuntimeError("node is gone")
+            return looksrare_batch
+
+        runner = PipelineRunner(
+            10,
+            59,
+            10,
+            path,
+            fetch,
+            lambda df: None,
+            extractors=[LooksrareOrderbookExtractor()],
+            workers=0,
+        )
+        with pytest.raises(RuntimeError):
+            runner.run()
+        # the chunks before the failure are still written in order
+        assert runner.checkpoint.ranges == [(10, 29)]
+
+    def test_retry_smaller(self, tmp_path, looksrare_batch):
+        path = str(tmp_path / "checkpoint.json")
+        fetched = []
+
+        def fetch(st_blknum, et_blknum):
+            if et_blknum - st_blknum + 1 > 8:
+                raise MemoryError()
+            fetched.append((st_blknum, et_blknum))
+            return looksrare_batch
+
+        sizer = AdaptiveBatchSize(initial=16, max_size=16)
+        runner = PipelineRunner(
+            10,
+            59,
+            None,
+            path,
+            fetch,
+            lambda df: None,
+            extractors=[LooksrareOrderbookExtractor()],
+            workers=0,
+            batch_size=sizer,
+        )
+        stats = runner.run()
+        # the failed chunks are redone at the smaller size, each block once
+        assert (10, 17) in fetched
+        assert all(et - st + 1 <= 8 for st, et in fetched)
+        blknums = [n for st, et in fetched for n in range(st, et + 1)]
+        assert sorted(blknums) == list(range(10, 60))
+        assert stats["chunks"] == len(fetched)
+        assert runner.checkpoint.ranges == [(10, 59)]
@@ -0,0 +1,157 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from nop.columns import ORDERBOOK_COLUMNS
+from nop.storage.postgres import PostgresOrderbookLoader
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, sql):
+        self.conn.executed.append(sql)
+        self.rowcount = 1 if sql.lstrip().startswith("UPDATE") else 2
+
+    def copy_expert(self, sql, buf):
+        self.conn.executed.append(sql)
+        self.conn.copied.append(buf.read())
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed, self.copied, self.commits = [], [], 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def execute(self, sql):
+        self.executed.append(sql)
+        return self
+
+    def fetchall(self):
+        return [(c,) for c in ORDERBOOK_COLUMNS]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeEngine:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def raw_connection(self):
+        return self.conn
+
+    def connect(self):
+        return self.conn
+
+
+class TestPostgresLoader:
+    def test_load(self):
+        engine = FakeEngine()
+        loader = PostgresOrderbookLoader(engine, batch_rows=2)
+        # the table has no trace_address column
+        loader._columns = [c for c in ORDERBOOK_COLUMNS if c != "trace_address"]
+
+        df = pd.DataFrame(
+            [
+                dict(txhash="0xa", order_logpos=1, xfer_logpos=2.0, token_id=2**255),
+                dict(txhash="0xa", order_logpos=1, xfer_logpos=None, token_id=1),
+                dict(txhash="0xb", order_logpos=3, xfer_logpos=4.0, token_type=""),
+            ],
+            columns=ORDERBOOK_COLUMNS,
+        )
+        stats = loader.load(df)
+
+        assert (stats.rows, stats.updated, stats.inserted) == (3, 2, 4)
+        assert engine.conn.commits == 2
+
+        rows = "".join(engine.conn.copied).splitlines()
+        assert len(rows) == 3
+        # integers are not written as floats, NULLs as \N, empty strings as is
+        assert ",0xa,\\N,2,1,\\N,\\N,{},".format(2**255) in rows[0]
+        assert ",0xa,\\N,\\N,1,\\N,\\N,1," in rows[1]
+        assert ",0xb,\\N,4,3,,\\N,\\N," in rows[2]
+        assert "NULL '\\N'" in engine.conn.executed[1]
+
+        # the batches of the table are serialized
+        lock = "pg_advisory_xact_lock(hashtext('ethereum.v2_nft_orderbooks'))"
+        assert lock in engine.conn.executed[2]
+
+        update = next(s for s in engine.conn.executed if "UPDATE" in s)
+        assert "t.txhash = s.txhash" in update
+        assert "t.xfer_logpos IS NOT DISTINCT FROM s.xfer_logpos" in update
+        assert "trace_address" not in update
+
+    def test_columns(self):
+        engine = FakeEngine()
+        assert PostgresOrderbookLoader(engine).columns() == ORDERBOOK_COLUMNS
+        assert "table_schema = 'ethereum'" in engine.conn.executed[-1]
+
+        # an unqualified table is looked up in the search path
+        assert PostgresOrderbookLoader(engine, "orderbooks").columns()
+        assert "table_schema = current_schema()" in engine.conn.executed[-1]
+        assert "table_name = 'orderbooks'" in engine.conn.executed[-1]
+
+    def test_tombstone(self):
+        engine = FakeEngine()
+        loader = PostgresOrderbookLoader(engine)
+        df = pd.DataFrame(
+            [dict(txhash="0xa", order_logpos=1, xfer_logpos=2, pack_index=0)]
+        )
+        assert loader.tombstone(df) == 1
+        assert engine.conn.copied == ["0xa,1,2,0\n"]
+        assert "pg_advisory_xact_lock" in engine.conn.executed[-2]
+
+        update = engine.conn.executed[-1]
+        assert "deleted_at = CURRENT_TIMESTAMP" in update
+        assert "t.deleted_at IS NULL" in update
+
+    @pytest.mark.skipif(
+        "NOP_TEST_PG_URL" not in os.environ, reason="needs NOP_TEST_PG_URL"
+    )
+    def test_concurrent_load(self):
+        from sqlalchemy import create_engine
+
+        engine = create_engine(os.environ["NOP_TEST_PG_URL"])
+        table = "_nop_test_orderbooks"
+        with engine.begin() as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(
+                f"CREATE TABLE {table} (txhash TEXT NOT NULL, order_logpos BIGINT, "
+                "xfer_logpos BIGINT, pack_index BIGINT, token_type TEXT, "
+                "updated_at TIMESTAMP, deleted_at TIMESTAMP)"
+            )
+
+        df = pd.DataFrame(
+            [
+                dict(txhash=f"0x{i}", order_logpos=1, pack_index=0, token_type="")
+                for i in range(100)
+            ],
+            columns=ORDERBOOK_COLUMNS,
+        )
+        loaders = [PostgresOrderbookLoader(engine, table, batch_rows=10)] * 4
+        with ThreadPoolExecutor(len(loaders)) as executor:
+            list(executor.map(lambda loader: loader.load(df), loaders))
+
+        rows = pd.read_sql(f"SELECT * FROM {table}", con=engine)
+        assert len(rows) == 100
+        assert rows["xfer_logpos"].isna().all()
+        assert (rows["token_type"] == "").all()
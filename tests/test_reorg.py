@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from nop.columns import ORDERBOOK_UNIQUE_COLUMNS
+from nop.extractor import LooksrareOrderbookExtractor
+from nop.runner.live import calculate_block_records
+from nop.runner.reorg import ReorgHandler, tombstone_keys
+from nop.storage.postgres import LoadStats
+
+
+class FakeLoader:
+    def __init__(self, stored):
+        self.stored = stored
+        self.loaded, self.tombstoned = [], []
+
+    def read_blocks(self, blknums):
+        return self.stored[self.stored["blknum"].isin(blknums)]
+
+    def load(self, df):
+        self.loaded.append(df)
+        stats = LoadStats()
+        stats.rows = len(df)
+        return stats
+
+    def tombstone(self, df):
+        self.tombstoned.append(df)
+        return len(df)
+
+
+class TestReorg:
+    def test_tombstone_keys(self):
+        old_df = pd.DataFrame(
+            [
+                dict(txhash="0xa", order_logpos=1, xfer_logpos=None, pack_index=0),
+                dict(txhash="0xa", order_logpos=3, xfer_logpos=2, pack_index=0),
+            ]
+        )
+        new_df = pd.DataFrame(
+            [dict(txhash="0xa", order_logpos=1, xfer_logpos=None, pack_index=0)]
+        )
+        keys = tombstone_keys(old_df, new_df)
+        assert keys.to_dict("records") == [
+            dict(txhash="0xa", order_logpos=3, xfer_logpos=2, pack_index=0)
+        ]
+        assert tombstone_keys(old_df.iloc[:0], new_df).empty
+
+    def test_handle(self, looksrare_block):
+        # the old block had 3 orders, the new one keeps the first 2 transactions
+        old_block, new_block = looksrare_block(3), looksrare_block(2)
+        extractor = LooksrareOrderbookExtractor()
+        stored = pd.DataFrame(calculate_block_records([extractor], old_block))
+
+        def fetch_block(blknum):
+            return new_block if blknum == 15000000 else dict(logs=[])
+
+        loader = FakeLoader(stored)
+        handler = ReorgHandler(loader, fetch_block, extractors=[extractor])
+        stats = handler.handle([(15000000, "0x" + "b" * 64), 15000001])
+        assert (stats["blocks"], stats["replacements"], stats["tombstones"]) == (
+            2,
+            2,
+            1,
+        )
+        assert loader.tombstoned[0][ORDERBOOK_UNIQUE_COLUMNS].to_dict("records") == [
+            dict(txhash="0x%064x" % 2, order_logpos=2, xfer_logpos=1, pack_index=0)
+        ]
+
+    def test_stale_notice(self, looksrare_block):
+        block = dict(looksrare_block(3), hash="0x" + "a" * 64)
+        extractor = LooksrareOrderbookExtractor()
+        stored = pd.DataFrame(calculate_block_records([extractor], block))
+
+        loader = FakeLoader(stored)
+        handler = ReorgHandler(loader, lambda n: block, extractors=[extractor])
+        # the block is still of the notified hash, nothing is tombstoned
+        stats = handler.handle([(np.int64(15000000), "0x" + "A" * 64)])
+        assert (stats["blocks"], stats["stale"], stats["tombstones"]) == (0, 1, 0)
+
+        # numpy block numbers, e.g. from a DataFrame, are recomputed
+        stats = handler.handle([np.int64(15000000)])
+        assert (stats["blocks"], stats["replacements"], stats["tombstones"]) == (
+            1,
+            3,
+            0,
+        )
@@ -0,0 +1,65 @@
+import pytest
+
+from nop.extractor import (
+    LooksrareOrderbookExtractor,
+    SudoswapOrderbookExtractor,
+    X2Y2OrderbookExtractor,
+)
+from nop.runner.adaptive import AdaptiveBatchSize
+from nop.runner.backfill import BackfillRunner
+from nop.storage.result_cache import ResultCache, code_version, _nop_modules
+
+
+class TestResultCache:
+    def test_code_version(self):
+        assert code_version(X2Y2OrderbookExtractor()) == code_version(
+            X2Y2OrderbookExtractor()
+        )
+        assert code_version(X2Y2OrderbookExtractor()) != code_version(
+            LooksrareOrderbookExtractor()
+        )
+        # the modules imported only for their constants are covered too
+        assert "nop.misc.sudoswap_read_trace_template" in _nop_modules(
+            SudoswapOrderbookExtractor.__module__
+        )
+
+    def test_backfill_from_cache(self, tmp_path, looksrare_batch, looksrare_order):
+        pytest.importorskip("pyarrow")
+        fetched, written = [], []
+
+        def fetch(st_blknum, et_blknum):
+            fetched.append(st_blknum)
+            return looksrare_batch
+
+        def run(checkpoint):
+            BackfillRunner(
+                15000000,
+                15000099,
+                100,
+                str(tmp_path / checkpoint),
+                fetch,
+                written.append,
+                extractors=[LooksrareOrderbookExtractor()],
+                result_cache=ResultCache(str(tmp_path / "results")),
+            ).run()
+
+        run("first.json")
+        run("second.json")
+        assert fetched == [15000000]
+        assert len(written) == 2
+        assert written[1]["token_id"].tolist() == [looksrare_order["token_id"]]
+        assert written[1].equals(written[0])
+
+    def test_reject_adaptive_batch_size(self, tmp_path):
+        with pytest.raises(ValueError):
+            BackfillRunner(
+                0,
+                99,
+                None,
+                str(tmp_path / "checkpoint.json"),
+                print,
+                print,
+                extractors=[],
+                result_cache=ResultCache(str(tmp_path / "results")),
+                batch_size=AdaptiveBatchSize(),
+            )
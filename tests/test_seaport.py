@@ -1,6 +1,7 @@
 import os
 import pandas as pd
 import json
+from nop.extractor.context import stack_transfers
 from nop.extractor.seaport_orderbook_extractor import calculate_seaport_orderbooks
 
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -17,5 +18,24 @@ class TestSeaport:
         ef_df = pd.DataFrame(
             json.load(open(f"{TEST_DIR}/testdata/seaport_erc1155_xfers.json"))
         )
+        xf_df = stack_transfers(tf_df, ef_df)
 
-        calculate_seaport_orderbooks(None, ob_df, tf_df, ef_df)  # type: ignore
+        calculate_seaport_orderbooks(None, ob_df, xf_df)  # type: ignore
+
+    def test_s11_aggregator(self):
+        ob_df = pd.DataFrame(
+            json.load(open(f"{TEST_DIR}/testdata/seaport_s11_orderbooks.json"))
+        )
+        xf_df = pd.DataFrame(
+            json.load(open(f"{TEST_DIR}/testdata/seaport_s11_xfers.json"))
+        )
+
+        df = calculate_seaport_orderbooks(None, ob_df, xf_df)  # type: ignore
+
+        # N orders + N Xfers of the same token => N Orderbooks
+        assert len(df) == len(ob_df)
+        assert not df.duplicated(subset=["txhash", "xfer_logpos"]).any()
+        # the k-th order is paired with the k-th transfer
+        df = df.sort_values(by=["txhash", "order_logpos"])
+        assert (df["order_logpos"] - df["xfer_logpos"]).tolist() == [1] * 8 + [2] * 3
+        assert (df["from_address"] == df["maker"]).all()
@@ -0,0 +1,64 @@
+import threading
+from time import sleep
+
+import pandas as pd
+
+from nop.extractor import SudoswapOrderbookExtractor
+
+from nop.misc.sudoswap_method_extractor import (
+    _extract_orderbook_swapETHForSpecificNFTs,
+    _extract_orderbook_swapNFTsForToken,
+)
+
+PAIR = "0x575570f62c90a61763b1e93cf0da62ed810dbda2"
+RECIPIENT = "0xca6f3defbc6041299837725f6430f33b0f24e5c0"
+
+
+def calls(outputs):
+    swap = dict(pair=PAIR, nftIds=(1377,))
+    out = dict(swapList=[swap], nftRecipient=RECIPIENT, tokenRecipient=RECIPIENT)
+    return pd.DataFrame(
+        [
+            dict(txhash="0x%064x" % i, value=10**18, output=output, _out=out)
+            for i, output in enumerate(outputs)
+        ]
+    )
+
+
+class TestSudoswap:
+    def test_malformed_output(self, caplog):
+        outputs = ["0x" + "%064x" % 10**17, "0xnot-a-uint256"]
+
+        df = _extract_orderbook_swapETHForSpecificNFTs(calls(outputs))
+        assert df["price"].tolist() == [9 * 10**17]
+        assert df["token_id"].tolist() == [1377]
+
+        df = _extract_orderbook_swapNFTsForToken(calls(outputs))
+        assert df["price"].tolist() == [10**17]
+        assert "drop 1 calls of malformed output" in caplog.text
+        assert "0x%064x" % 1 in caplog.text
+
+    def test_load_pools_once(self):
+        loads = []
+
+        class Extractor(SudoswapOrderbookExtractor):
+            def _load_pools(self, engine):
+                loads.append(engine)
+                sleep(0.05)
+                self._SudoswapOrderbookExtractor__pools = {PAIR: (RECIPIENT, None)}
+
+        extractor = Extractor()
+        threads = [
+            threading.Thread(target=extractor.get_pools, args=(None,)) for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(loads) == 1
+
+        # the missing pools are loaded already, no reload
+        extractor.getset_pools(None, {PAIR})
+        assert len(loads) == 1
+        extractor.getset_pools(None, {RECIPIENT})
+        assert len(loads) == 2
@@ -0,0 +1,78 @@
+import threading
+from time import sleep
+
+from nop.extractor.extractor import NopExtractor, split_trace_ranges
+
+DAY = 86400
+# 2022-08-01 00:00:00 UTC
+ST = 1659312000
+
+
+def blocks(n_days, per_day):
+    return [
+        dict(
+            number=day * per_day + i, timestamp=ST + day * DAY + i, transaction_count=1
+        )
+        for day in range(n_days)
+        for i in range(per_day)
+    ]
+
+
+class FakeTraceExtractor(NopExtractor):
+    trace_concurrency = 2
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running, self.max_running = 0, 0
+
+    @staticmethod
+    def extract_via_log() -> bool:
+        return False
+
+    def _extract_orderbook_from_traces(
+        self, db_engine, st_blknum, et_blknum, st_day, et_day
+    ):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        # the later sub-ranges finish first
+        sleep(0.01 * (10 - st_blknum // 10))
+        with self.lock:
+            self.running -= 1
+        return [
+            dict(blknum=st_blknum, st_day=st_day),
+            dict(blknum=et_blknum, st_day=et_day),
+        ]
+
+
+class TestTraceRanges:
+    def test_split_trace_ranges(self):
+        assert split_trace_ranges(blocks(2, 10)) == [
+            (0, 9, "2022-08-01", "2022-08-01"),
+            (10, 19, "2022-08-02", "2022-08-02"),
+        ]
+        assert split_trace_ranges(blocks(1, 10), 4) == [
+            (0, 3, "2022-08-01", "2022-08-01"),
+            (4, 7, "2022-08-01", "2022-08-01"),
+            (8, 9, "2022-08-01", "2022-08-01"),
+        ]
+
+    def test_fan_out_in_order(self):
+        extractor = FakeTraceExtractor()
+        orderbooks = extractor.extract_orderbooks(
+            [], db_engine=object(), block_range=blocks(5, 10)
+        )
+        assert [od["blknum"] for od in orderbooks] == [
+            0,
+            9,
+            10,
+            19,
+            20,
+            29,
+            30,
+            39,
+            40,
+            49,
+        ]
+        assert orderbooks[-1]["st_day"] == "2022-08-05"
+        assert extractor.max_running == 2
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from nop.extractor import LooksrareOrderbookExtractor
+from nop.utils import (
+    hex_to_dec,
+    hex_to_decs,
+    word_to_address,
+    words_to_addresses,
+    to_normalized_address,
+    to_normalized_addresses,
+)
+
+WORDS = [
+    "0x000000000000000000000000Ca6f3defbc6041299837725f6430f33b0f24e5c0",
+    "0x0000000000000000000000000000000000000000000000000000000000001e35",
+    None,
+    "0xAB",
+]
+HEXES = ["0x1e35", "0x" + "f" * 64, None, "not-a-hex", "0x"]
+
+
+class TestUtils:
+    def test_hex_to_decs(self):
+        values, errors = hex_to_decs(HEXES)
+        assert values == [hex_to_dec(x) for x in HEXES]
+        assert values[1] == 2**256 - 1
+        assert errors == 2
+
+        series, errors = hex_to_decs(pd.Series(HEXES[:2], index=[7, 9]))
+        assert series.index.tolist() == [7, 9]
+        assert series.tolist() == values[:2]
+        assert errors == 0
+
+    def test_words_to_addresses(self):
+        expected = [word_to_address(x) for x in WORDS]
+        assert words_to_addresses(WORDS) == expected
+        assert words_to_addresses(iter(WORDS)) == expected
+        assert words_to_addresses(pd.Series(WORDS)).tolist() == expected
+
+    def test_to_normalized_addresses(self):
+        addresses = ["0xAbC", None, 1, "0xabc"]
+        expected = [to_normalized_address(x) for x in addresses]
+        assert to_normalized_addresses(addresses) == expected
+        assert to_normalized_addresses(pd.Series(addresses)).tolist() == expected
+
+    def test_malformed_uint_words(self, caplog, looksrare_batch):
+        log = dict(looksrare_batch["logs"][0])
+        # the last data word is the price
+        log["data"] = log["data"][:-64] + "z" * 64
+
+        (order,) = LooksrareOrderbookExtractor().extract_orderbooks([log])
+        assert order["price"] == "0x" + "z" * 64
+        assert "1 malformed uint words in log 2" in caplog.text